@@ -0,0 +1,162 @@
+#!/usr/bin/env python
+
+"""
+64-bit XBee address type.
+Addresses are interned (a single object per address, for the most recently used ones), hashable and compare as
+integers, so they can be used as cheap dictionary keys; binary and hex forms are computed once and cached in the object.
+"""
+
+import threading
+
+
+# authorship info
+__author__      = "Francesco Vallegra"
+__copyright__   = "Copyright 2017, MIT-SUTD"
+__license__     = "MIT"
+
+
+class _LRU:
+    """
+    Thread-safe mapping keeping (at least) the size most recently used entries, in two generations: entries are added to
+    the young one, which becomes the old one when full (the previous old one being forgotten); old entries used again
+    are moved back to the young one. Lookups of young entries are a single dictionary access, without locking.
+    """
+
+    def __init__(self, size):
+        self.size = size
+        self._young = dict()
+        self._old = dict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._young) + len(self._old)
+
+    def get(self, key):
+        value = self._young.get(key)
+        if value is None:
+            with self._lock:
+                value = self._old.get(key)
+                if value is not None:
+                    self._put(key, value)
+        return value
+
+    def setdefault(self, key, value):
+        """
+        :return: the value already stored for key, or value (stored), as dict.setdefault()
+        """
+        with self._lock:
+            stored = self._young.get(key)
+            if stored is None:
+                stored = self._old.get(key)
+            if stored is None:
+                stored = value
+            self._put(key, stored)
+            return stored
+
+    def _put(self, key, value):
+        # with self._lock held
+        self._young[key] = value
+        if len(self._young) >= self.size:
+            self._old = self._young
+            self._young = dict()
+
+
+# ===============================================================================
+#   Address class
+# ===============================================================================
+class XBeeAddress(int):
+    """
+    64-bit XBee address (SH + SL), as an integer with cached forms:
+    - bytes: 8 bytes, big endian (as in DigiMesh frames)
+    - hex: 16 chars lower case hex string
+    - high, low: 8 chars lower case hex strings of the high (SH) and low (SL) 32 bits
+
+    Can be created from another XBeeAddress, an int, 8 bytes, or a hex string (16 chars, or high and low 8 chars).
+    Only the addresses used most recently (at least MAX_INTERNED) are interned, so addresses seen once (e.g. corrupted frames) do
+    not stay in memory: an address forgotten and seen again is a new (equal) object.
+    """
+
+    MAX_INTERNED = 4096
+
+    # interned addresses, by integer value and by input forms
+    _interned = _LRU(MAX_INTERNED)
+    _byHex = _LRU(MAX_INTERNED)
+    _byBytes = _LRU(MAX_INTERNED)
+
+    def __new__(cls, value, low=None):
+        if low is not None:
+            return cls.fromHex(value, low)
+        if isinstance(value, XBeeAddress):
+            return value
+        if isinstance(value, (bytes, bytearray, memoryview)):
+            return cls.fromBytes(value)
+        if isinstance(value, str):
+            return cls.fromHex(value)
+        return cls._intern(int(value))
+
+    @classmethod
+    def _intern(cls, value):
+        addr = cls._interned.get(value)
+        if addr is not None:
+            return addr
+
+        if not 0 <= value <= 0xFFFFFFFFFFFFFFFF:
+            raise ValueError('XBee address {0} exceeding 64bit variable!'.format(value))
+
+        addr = int.__new__(cls, value)
+        addr.bytes = value.to_bytes(8, 'big')
+        addr.hex = addr.bytes.hex()
+        addr.high = addr.hex[:8]
+        addr.low = addr.hex[8:]
+
+        # make sure only one object exists per address, even if created concurrently
+        return cls._interned.setdefault(value, addr)
+
+    @classmethod
+    def fromHex(cls, high, low=None):
+        """
+        :param high: high address as 8 chars hex string, or full address as 16 chars hex string if low is not given
+        :param low: low address as 8 chars hex string
+        :return: XBeeAddress
+        """
+        key = high if low is None else high + low
+        addr = cls._byHex.get(key)
+        if addr is not None:
+            return addr
+
+        if len(key) != 16:
+            raise ValueError("XBee address '{0}' should be 8 bytes (16 hex string)!".format(key))
+
+        return cls._byHex.setdefault(key, cls._intern(int(key, 16)))
+
+    @classmethod
+    def fromBytes(cls, data):
+        """
+        :param data: 8 bytes (big endian), e.g. a slice of a received frame
+        :return: XBeeAddress
+        """
+        key = bytes(data)
+        addr = cls._byBytes.get(key)
+        if addr is not None:
+            return addr
+
+        if len(key) != 8:
+            raise ValueError('XBee address {0} should be 8 bytes!'.format(key))
+
+        return cls._byBytes.setdefault(key, cls._intern(int.from_bytes(key, 'big')))
+
+    def isBroadcast(self):
+        return self == BROADCAST
+
+    def __str__(self):
+        return self.hex
+
+    def __repr__(self):
+        return "XBeeAddress('{0}')".format(self.hex)
+
+    def __reduce__(self):
+        return XBeeAddress, (int(self), )
+
+
+# broadcast address
+BROADCAST = XBeeAddress(0xFFFF)
@@ -0,0 +1,176 @@
+#!/usr/bin/env python
+
+"""
+asyncio variant of XBee_module (Unix only).
+
+The serial port is read by an asyncio.Protocol attached to its file descriptor, and received bytes go through the same
+frame parsing as readSerial(). Requests return asyncio futures resolved by the matching reply: 0x8B transmit status
+for transmissions, 0x88/0x97 response for local/remote AT commands.
+
+    XB = await XBee_async.create(port='/dev/ttyUSB0')
+    status = await XB.sendDataToRemote('0013a200', '40e44b94', 'hello')
+    reply = await XB.getRemoteRegistry('0013a200', '40e44b94', 'NI')
+"""
+
+import asyncio
+import functools
+import time
+
+from XBee_API import XBee_module
+
+
+# authorship info
+__author__      = "Francesco Vallegra"
+__copyright__   = "Copyright 2017, MIT-SUTD"
+__license__     = "MIT"
+
+
+# ===============================================================================
+#   Protocol
+# ===============================================================================
+class XB_Protocol(asyncio.Protocol):
+    """
+    Pass the bytes read from the serial to the XBee object
+    """
+
+    def __init__(self, XB):
+        self.XB = XB
+
+    def data_received(self, data):
+        self.XB._dataReceived(data)
+
+    def connection_lost(self, exc):
+        self.XB._connectionLost(exc)
+
+
+# ===============================================================================
+#   asyncio XBee class
+# ===============================================================================
+class XBee_async(XBee_module):
+    """
+    XBee_module driven by an asyncio event loop. Create it with: XB = await XBee_async.create(...)
+
+    Send methods (setLocalRegistry, getLocalRegistry, setRemoteRegistry, getRemoteRegistry, sendDataToRemote,
+    broadcastData) return an asyncio future resolving to the reply (XBee_msg object), or to None if the request could
+    not be sent. Received messages which are not replies go to the callbacks (see addCallback()) or can be awaited
+    with receive().
+    """
+
+    def _initState(self, ID=0x7FFF, AP=0x02, CE=0x00, NO=0x04):
+        XBee_module._initState(self, ID=ID, AP=AP, CE=CE, NO=NO)
+
+        self._loop = None
+        self._transport = None
+        self._pipe = None
+        self._queue = None
+        self._expireTimer = None
+
+    @classmethod
+    async def create(cls, port=None, baud=9600, ID=0x7FFF, AP=0x02, CE=0x00, NO=0x04, rawLogFormat='text'):
+        """
+        Initialize the XBee (in a worker thread, as command mode is blocking) and attach it to the running event loop.
+        Parameters as for XBee_module.
+
+        :return: XBee_async object
+        """
+        loop = asyncio.get_running_loop()
+        XB = await loop.run_in_executor(None, functools.partial(cls, port, baud, ID, AP, CE, NO, rawLogFormat))
+        await XB._connect(loop)
+        return XB
+
+    async def _connect(self, loop):
+        self._loop = loop
+        self._queue = asyncio.Queue()
+
+        # the protocol reads from a (non-blocking) file object sharing the serial file descriptor
+        self._pipe = open(self.serial_port.fileno(), 'rb', buffering=0, closefd=False)
+        self._transport, _ = await loop.connect_read_pipe(lambda: XB_Protocol(self), self._pipe)
+
+    def close(self):
+        if self._expireTimer is not None:
+            self._expireTimer.cancel()
+            self._expireTimer = None
+        if self._transport is not None:
+            self._transport.close()
+            self._transport = None
+
+        XBee_module.close(self)
+
+    # ===============================================================================
+    #   Requests
+    def setLocalRegistry(self, command, value, frame_ID=None, timeout=None):
+        return self._awaitable(XBee_module.setLocalRegistry(self, command, value, frame_ID, timeout), timeout)
+
+    def getLocalRegistry(self, command, frame_ID=None, timeout=None):
+        return self._awaitable(XBee_module.getLocalRegistry(self, command, frame_ID, timeout), timeout)
+
+    def setRemoteRegistry(self, destH, destL, command, value, frame_ID=None, timeout=None):
+        return self._awaitable(XBee_module.setRemoteRegistry(self, destH, destL, command, value, frame_ID, timeout),
+                               timeout)
+
+    def getRemoteRegistry(self, destH, destL, command, frame_ID=None, timeout=None):
+        return self._awaitable(XBee_module.getRemoteRegistry(self, destH, destL, command, frame_ID, timeout), timeout)
+
+    def sendDataToRemote(self, destH, destL, data, frame_ID=None, option=0x00, reserved='fffe', timeout=None,
+                         priority=None):
+        return self._awaitable(XBee_module.sendDataToRemote(self, destH, destL, data, frame_ID, option, reserved,
+                                                            timeout, priority), timeout)
+
+    def _awaitable(self, XBmsg, timeout):
+        """
+        :param XBmsg: request sent (see XBee_module._request()), with the future of its reply in XBmsg.reply
+        :param timeout: max time [s] to wait for the reply, after which the future raises TimeoutError
+        :return: asyncio future of the reply
+        """
+        if XBmsg is None or XBmsg.reply is None:
+            future = self._loop.create_future()
+            future.set_result(None)
+            return future
+
+        # make sure the request expires on time, even if nothing is received
+        self._scheduleExpire()
+
+        return asyncio.wrap_future(XBmsg.reply, loop=self._loop)
+
+    def _scheduleExpire(self):
+        deadline = self.requests.nextDeadline()
+        if deadline is None:
+            return
+        if self._expireTimer is not None:
+            if self._expireTimer.when() - self._loop.time() <= deadline - time.monotonic():
+                # already scheduled in time
+                return
+            self._expireTimer.cancel()
+        self._expireTimer = self._loop.call_later(max(0., deadline - time.monotonic()), self._expire)
+
+    def _expire(self):
+        self._expireTimer = None
+        self.requests.expire()
+        self._scheduleExpire()
+
+    # ===============================================================================
+    #   Receiving
+    async def receive(self):
+        """
+        :return: next received message not being a reply nor handled by any callback
+        """
+        return await self._queue.get()
+
+    def _queueMsg(self, XBmsg):
+        self._queue.put_nowait(XBmsg)
+
+    def _dataReceived(self, data):
+        msgs = self._processRx(data)
+
+        if self.params['AP'] == '00':
+            self._dispatch(msgs)
+            return
+
+        # replies already resolved their request
+        replies = self.RxReplies
+        self._dispatch([XBmsg for XBmsg in msgs if XBmsg not in replies])
+
+    def _connectionLost(self, exc):
+        if exc is not None:
+            print('ERR: serial connection lost: {0}'.format(exc))
+        self.requests.cancelAll()
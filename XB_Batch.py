@@ -0,0 +1,239 @@
+#!/usr/bin/env python
+
+"""
+Parallel decoding of large recordings, for offline analysis: the recording (binary capture, see XB_Capture, or raw
+stream as read from the serial) is split into chunks at frame boundaries, each chunk is decoded by a process of a pool
+(so decoding runs on all the cores), and the results are merged in order.
+
+Results are columnar: one array per field, with one entry per frame, which is far more compact than keeping the
+XBee_msg objects (and can be given as is to numpy.frombuffer()):
+- 'time_ns'         : timestamp [ns since epoch] (0 for raw streams)
+- 'direction'       : XB_Capture.IN or XB_Capture.OUT (IN for raw streams)
+- 'frameType'       : frame type
+- 'valid'           : 1 if the frame was decoded correctly
+- 'source'          : 64-bit address of the sender (0x90, 0x91, 0x97), source of the route (0x8D), or node described
+                      (ND/FN replies); 0 if none
+- 'rssi'            : RSSI [-dBm] of the node described by ND/FN replies, or value of DB replies; -1 if none
+- 'payloadOffset'   : offset of the data of the frame (as XBmsg.data) in 'payloads'
+- 'payloadLength'   : length of the data of the frame
+
+plus 'payloads', all the data of the frames as a single bytearray.
+"""
+
+from array import array
+import concurrent.futures
+import mmap
+import os
+
+from XB_Address import XBeeAddress
+from XB_Capture import XB_CaptureReader, isCapture, iterRecords, IN
+from XB_Parser import XB_FrameParser, nextFrameStart
+from XB_Topology import _discoveryInfo
+
+
+# authorship info
+__author__      = "Francesco Vallegra"
+__copyright__   = "Copyright 2017, MIT-SUTD"
+__license__     = "MIT"
+
+
+# columns and their array type codes
+COLUMNS = (('time_ns', 'q'),
+           ('direction', 'B'),
+           ('frameType', 'B'),
+           ('valid', 'B'),
+           ('source', 'Q'),
+           ('rssi', 'h'),
+           ('payloadOffset', 'Q'),
+           ('payloadLength', 'H'))
+
+
+def newColumns():
+    """
+    :return: dictionary of empty columns (and payloads)
+    """
+    columns = dict((name, array(code)) for name, code in COLUMNS)
+    columns['payloads'] = bytearray()
+    return columns
+
+
+# ===============================================================================
+#   Batch decoding
+# ===============================================================================
+def decodeFile(path, workers=None, chunkSize=None, AP=0x02, maxLength=512):
+    """
+    Decode a whole recording using a pool of processes
+
+    :param path: binary capture (see XB_Capture) or raw stream
+    :param workers: number of processes (default the number of cores)
+    :param chunkSize: approximate size [bytes] of the chunks decoded by each process (default so that each process
+            gets about 4 chunks, at least 64kB)
+    :param AP: API mode of a raw stream (captures hold unescaped frames)
+    :param maxLength: frames of a raw stream declaring a longer length are considered corrupted
+    :return: dictionary of columns (see above)
+    """
+    if workers is None:
+        workers = os.cpu_count() or 1
+
+    capture = isCapture(path)
+    bounds = splitCapture(path, workers, chunkSize) if capture else splitStream(path, workers, chunkSize, AP,
+                                                                                 maxLength)
+
+    columns = newColumns()
+    if len(bounds) < 2:
+        return columns
+
+    jobs = [(path, capture, start, end, AP, maxLength) for start, end in zip(bounds, bounds[1:])]
+    if workers == 1 or len(jobs) == 1:
+        results = map(_decodeJob, jobs)
+        merge(columns, results)
+    else:
+        with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as pool:
+            # results come in the order of the chunks
+            merge(columns, pool.map(_decodeJob, jobs))
+
+    return columns
+
+
+def merge(columns, results):
+    """
+    Append the columns of each chunk (in order) to columns
+    """
+    for result in results:
+        base = len(columns['payloads'])
+        for name, _ in COLUMNS:
+            if name == 'payloadOffset' and base:
+                columns[name].extend(offset + base for offset in result[name])
+            else:
+                columns[name].extend(result[name])
+        columns['payloads'] += result['payloads']
+
+
+def _chunkSize(size, workers, chunkSize):
+    if chunkSize is None:
+        chunkSize = max(64 * 1024, size // (4 * workers) + 1)
+    return chunkSize
+
+
+def splitCapture(path, workers=1, chunkSize=None):
+    """
+    Split a binary capture at record boundaries, as given by its index (built by scanning the capture if missing)
+
+    :return: list of the offsets where each chunk starts, then the size of the file
+    """
+    size = os.path.getsize(path)
+    chunkSize = _chunkSize(size, workers, chunkSize)
+
+    reader = XB_CaptureReader(path)
+    # the offset of the first record
+    bounds = [reader.offsetOf(0)]
+    for offset in reader.indexOffsets():
+        if offset - bounds[-1] >= chunkSize and offset < size:
+            bounds.append(offset)
+    bounds.append(size)
+    return bounds
+
+
+def splitStream(path, workers=1, chunkSize=None, AP=0x02, maxLength=512):
+    """
+    Split a raw stream at frame boundaries (see XB_Parser.nextFrameStart())
+
+    :return: list of the offsets where each chunk starts, then the size of the file
+    """
+    size = os.path.getsize(path)
+    if not size:
+        return list()
+    chunkSize = _chunkSize(size, workers, chunkSize)
+
+    with open(path, 'rb') as fileID:
+        data = mmap.mmap(fileID.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            bounds = [0]
+            while bounds[-1] + chunkSize < size:
+                start = nextFrameStart(data, bounds[-1] + chunkSize, AP == 0x02, maxLength)
+                if start >= size:
+                    break
+                bounds.append(start)
+        finally:
+            data.close()
+
+    bounds.append(size)
+    return bounds
+
+
+def _decodeJob(job):
+    return decodeChunk(*job)
+
+
+def decodeChunk(path, capture, start, end, AP=0x02, maxLength=512):
+    """
+    Decode the frames of a chunk of a recording (run by each process of the pool)
+
+    :param capture: True if a binary capture, False if a raw stream
+    :param start: offset of the chunk (at a frame or record boundary)
+    :param end: offset of the next chunk
+    :return: dictionary of columns (payload offsets within this chunk)
+    """
+    # imported here, so the process pool does not need to load the whole API before it is used
+    from XBee_API import APIop, APIopOUT
+
+    columns = newColumns()
+    XBparams = {'AP': '%02x' % AP, 'SL': ''}
+
+    with open(path, 'rb') as fileID:
+        data = mmap.mmap(fileID.fileno(), 0, access=mmap.ACCESS_READ)
+        view = memoryview(data)
+        try:
+            if capture:
+                records = iterRecords(view, start, end)
+            else:
+                parser = XB_FrameParser(escaped=AP == 0x02, maxLength=maxLength)
+                records = ((IN, 0, frame) for frame in parser.feed(view[start:end]))
+
+            for direction, time_ns, frame in records:
+                _decodeFrame(columns, XBparams, APIop if direction == IN else APIopOUT, direction, time_ns, frame)
+        finally:
+            records = frame = None
+            view.release()
+            data.close()
+
+    return columns
+
+
+def _decodeFrame(columns, XBparams, table, direction, time_ns, frame):
+    frame = bytearray(frame)
+    frameType = frame[3] if len(frame) > 3 else 0
+
+    XBmsg = None
+    decoder = table.get(frameType)
+    if decoder is not None:
+        if direction == IN:
+            XBmsg = decoder[1](XBparams, frame, unescaped=True)
+        else:
+            XBmsg = decoder[1].fromFrame(XBparams, frame)
+
+    source = None
+    rssi = -1
+    payload = b''
+    if XBmsg is not None and XBmsg.valid:
+        payload = XBmsg.data
+        if frameType == 0x8D:
+            source = XBmsg.srcAddr
+        elif frameType in (0x88, 0x97) and XBmsg.ATcmd in ('ND', 'FN'):
+            source, _, found = _discoveryInfo(payload)
+            if found is not None:
+                rssi = found
+        else:
+            source = getattr(XBmsg, 'sourceAddr', None)
+            if frameType in (0x88, 0x97) and XBmsg.ATcmd == 'DB' and payload:
+                rssi = payload[-1]
+
+    columns['time_ns'].append(time_ns)
+    columns['direction'].append(direction)
+    columns['frameType'].append(frameType)
+    columns['valid'].append(XBmsg is not None and XBmsg.valid)
+    columns['source'].append(source if isinstance(source, XBeeAddress) else 0)
+    columns['rssi'].append(rssi)
+    columns['payloadOffset'].append(len(columns['payloads']))
+    columns['payloadLength'].append(len(payload))
+    columns['payloads'] += payload
@@ -0,0 +1,308 @@
+#!/usr/bin/env python
+
+"""
+Compact binary capture of the DigiMesh frames sent to / received from the XBee, with a reader to replay them offline.
+
+Capture file (all integers big endian):
+- file header: magic 'XBCAP' + version (1 byte)
+- records: direction (1 byte: 0 IN, 1 OUT) + timestamp in ns since epoch (8 bytes) + frame length (2 bytes),
+  followed by the full unescaped frame (start delimiter, length, frame-specific data and checksum)
+
+Index file (capture file + '.idx'), for seeking without scanning the whole capture:
+- file header: magic 'XBIDX' + version (1 byte)
+- entries, one every indexEvery records: record number (8 bytes) + timestamp (8 bytes) + file offset (8 bytes)
+"""
+
+import bisect
+import os
+import struct
+import threading
+
+
+# authorship info
+__author__      = "Francesco Vallegra"
+__copyright__   = "Copyright 2017, MIT-SUTD"
+__license__     = "MIT"
+
+
+# frame direction
+IN = 0
+OUT = 1
+
+VERSION = 1
+
+_FILE_HEADER = struct.Struct('>5sB')
+_RECORD = struct.Struct('>BQH')
+_INDEX = struct.Struct('>QQQ')
+
+_MAGIC = b'XBCAP'
+_INDEX_MAGIC = b'XBIDX'
+
+
+def isCapture(path):
+    """
+    :return: True if the file is a binary capture (by its magic)
+    """
+    with open(path, 'rb') as fileID:
+        return fileID.read(len(_MAGIC)) == _MAGIC
+
+
+def iterRecords(buffer, offset=_FILE_HEADER.size, end=None):
+    """
+    Parse the records of a whole capture held in memory (e.g. memory-mapped), without copying the frames
+
+    :param buffer: content of the capture file, as bytes, mmap or memoryview
+    :param offset: offset of the first record to parse (e.g. from the index)
+    :param end: offset where to stop (records starting before it are parsed whole), default the end of the buffer
+    :return: generator of (direction, time_ns, frame), frame as memoryview on buffer
+    """
+    view = memoryview(buffer)
+    size = len(view)
+    if end is None:
+        end = size
+    while offset < end and offset + _RECORD.size <= size:
+        direction, time_ns, length = _RECORD.unpack_from(view, offset)
+        offset += _RECORD.size
+        if offset + length > size:
+            # truncated record (e.g. capture still being written)
+            return
+        yield direction, time_ns, view[offset:offset + length]
+        offset += length
+
+
+def _lastIndexEntry(path):
+    """
+    :param path: index file
+    :return: last entry of the index, as (record number, time_ns, offset), or None if no (valid) index
+    """
+    try:
+        with open(path, 'rb') as fileID:
+            if fileID.read(len(_INDEX_MAGIC)) != _INDEX_MAGIC:
+                return None
+            entries = (fileID.seek(0, os.SEEK_END) - _FILE_HEADER.size) // _INDEX.size
+            if entries <= 0:
+                return None
+            fileID.seek(_FILE_HEADER.size + (entries - 1) * _INDEX.size)
+            return _INDEX.unpack(fileID.read(_INDEX.size))
+    except (IOError, OSError, struct.error):
+        return None
+
+
+# ===============================================================================
+#   Capture writer
+# ===============================================================================
+class XB_CaptureWriter:
+    """
+    Append frames to a binary capture file (and its index). Safe to use from several threads.
+    """
+
+    def __init__(self, path, indexEvery=256, bufferSize=64 * 1024, flushInterval=1.):
+        """
+        :param path: capture file (appended if already existing)
+        :param indexEvery: number of records between two index entries
+        :param bufferSize: size of the write buffer
+        :param flushInterval: max time [s] the frames written stay in the buffer (so at most flushInterval of frames is
+                lost on a crash); None to flush only when the buffer is full
+        """
+        self.path = path
+        self.indexEvery = indexEvery
+        self.flushInterval = flushInterval
+        self.records = 0
+
+        self._lock = threading.Lock()
+        self._flushTimer = None
+
+        newFile = not os.path.exists(path) or os.path.getsize(path) == 0
+        if not newFile:
+            # continue numbering records from the existing file
+            self.records = self._countRecords(path)
+
+        self._file = open(path, 'ab', buffering=bufferSize)
+        newIndex = not os.path.exists(path + '.idx') or os.path.getsize(path + '.idx') == 0
+        self._index = open(path + '.idx', 'ab')
+
+        if newFile:
+            self._file.write(_FILE_HEADER.pack(_MAGIC, VERSION))
+            self._index.truncate(0)
+        if newFile or newIndex:
+            self._index.write(_FILE_HEADER.pack(_INDEX_MAGIC, VERSION))
+
+    @staticmethod
+    def _countRecords(path):
+        """
+        :return: number of records of an existing capture, scanning only the records after the last index entry
+        """
+        number = 0
+        offset = _FILE_HEADER.size
+        entry = _lastIndexEntry(path + '.idx')
+        if entry is not None and entry[2] <= os.path.getsize(path):
+            number, _, offset = entry
+        return number + sum(1 for _ in XB_CaptureReader(path)._scan(offset))
+
+    def write(self, frame, direction, time_ns):
+        """
+        :param frame: full unescaped frame
+        :param direction: IN or OUT
+        :param time_ns: timestamp of the frame in ns since epoch
+        """
+        with self._lock:
+            if self.records % self.indexEvery == 0:
+                self._index.write(_INDEX.pack(self.records, time_ns, self._file.tell()))
+
+            self._file.write(_RECORD.pack(direction, time_ns, len(frame)))
+            self._file.write(frame)
+            self.records += 1
+
+            if self.flushInterval is not None and self._flushTimer is None:
+                # written to the file within flushInterval, even if no other frame follows
+                self._flushTimer = threading.Timer(self.flushInterval, self.flush)
+                self._flushTimer.daemon = True
+                self._flushTimer.start()
+
+    def flush(self):
+        with self._lock:
+            self._flushTimer = None
+            if self._file.closed:
+                return
+            self._file.flush()
+            self._index.flush()
+
+    def close(self):
+        with self._lock:
+            if self._flushTimer is not None:
+                self._flushTimer.cancel()
+                self._flushTimer = None
+            self._file.close()
+            self._index.close()
+
+
+# ===============================================================================
+#   Capture reader
+# ===============================================================================
+class XB_CaptureReader:
+    """
+    Read back a binary capture, as raw records or as XBee_msg objects
+    """
+
+    def __init__(self, path):
+        self.path = path
+
+        with open(path, 'rb') as fileID:
+            magic, version = _FILE_HEADER.unpack(fileID.read(_FILE_HEADER.size))
+        if magic != _MAGIC:
+            raise ValueError("'{0}' is not an XBee capture file".format(path))
+        if version > VERSION:
+            raise ValueError("capture version {0} not supported".format(version))
+
+        self._indexTime = None
+        self._indexOffset = None
+
+    def _loadIndex(self):
+        """
+        Load the index (or build it by scanning the capture, if missing)
+        """
+        self._indexTime = list()
+        self._indexOffset = list()
+
+        try:
+            with open(self.path + '.idx', 'rb') as fileID:
+                data = fileID.read()
+            if data[:len(_INDEX_MAGIC)] != _INDEX_MAGIC:
+                raise IOError
+            for _, time_ns, offset in _INDEX.iter_unpack(data[_FILE_HEADER.size:]):
+                self._indexTime.append(time_ns)
+                self._indexOffset.append(offset)
+        except (IOError, OSError, struct.error):
+            self._indexTime = list()
+            self._indexOffset = list()
+            for offset, (_, time_ns, _) in self._scan(_FILE_HEADER.size):
+                self._indexTime.append(time_ns)
+                self._indexOffset.append(offset)
+
+    def offsetOf(self, time_ns):
+        """
+        :return: file offset from where to read to get all records from time_ns on (approximated by the index)
+        """
+        if self._indexTime is None:
+            self._loadIndex()
+
+        i = bisect.bisect_right(self._indexTime, time_ns) - 1
+        if i < 0:
+            return _FILE_HEADER.size
+        return self._indexOffset[i]
+
+    def indexOffsets(self):
+        """
+        :return: list of the file offsets in the index (each at the start of a record), e.g. to split the capture
+        """
+        if self._indexOffset is None:
+            self._loadIndex()
+        return list(self._indexOffset)
+
+    def _scan(self, offset):
+        """
+        :return: generator of (offset, (direction, time_ns, frame)) starting from offset
+        """
+        with open(self.path, 'rb', buffering=256 * 1024) as fileID:
+            fileID.seek(offset)
+            while True:
+                head = fileID.read(_RECORD.size)
+                if len(head) < _RECORD.size:
+                    return
+                direction, time_ns, length = _RECORD.unpack(head)
+                frame = fileID.read(length)
+                if len(frame) < length:
+                    # truncated record (e.g. capture still being written)
+                    return
+                yield offset, (direction, time_ns, frame)
+                offset += _RECORD.size + length
+
+    def records(self, start_ns=None, stop_ns=None):
+        """
+        :param start_ns: if given, skip records before this timestamp (seeking by the index)
+        :param stop_ns: if given, stop at the first record after this timestamp
+        :return: generator of (direction, time_ns, frame), frame as bytes
+        """
+        offset = _FILE_HEADER.size
+        if start_ns is not None:
+            offset = self.offsetOf(start_ns)
+
+        for _, record in self._scan(offset):
+            if start_ns is not None and record[1] < start_ns:
+                continue
+            if stop_ns is not None and record[1] > stop_ns:
+                return
+            yield record
+
+    def messages(self, XBparams=None, start_ns=None, stop_ns=None):
+        """
+        Decode the records into XBee_msg objects, by the frame type as in XBee_API.APIop (incoming frames) or
+        XBee_API.APIopOUT (outgoing frames). The objects get the timestamp of the record.
+
+        :param XBparams: XBee parameters to be used for decoding (e.g. 'AP', 'SL')
+        :return: generator of (direction, XBee_msg), skipping frame types not coded
+        """
+        # imported here, so the capture can be written without loading the whole API
+        from XBee_API import APIop, APIopOUT
+
+        if XBparams is None:
+            XBparams = {'AP': '02', 'SL': ''}
+
+        for direction, time_ns, frame in self.records(start_ns, stop_ns):
+            if direction == IN:
+                table = APIop
+            else:
+                table = APIopOUT
+
+            try:
+                decoder = table[frame[3]][1]
+            except (KeyError, IndexError):
+                continue
+
+            if direction == IN:
+                msg = decoder(XBparams, bytearray(frame), unescaped=True)
+            else:
+                msg = decoder.fromFrame(XBparams, bytearray(frame))
+            msg.time_ns = time_ns
+
+            yield direction, msg
@@ -0,0 +1,81 @@
+#!/usr/bin/env python
+
+"""
+Escape sequence codec for DigiMesh API mode 2.
+Reserved bytes are located and replaced by C-level bytes methods (find / replace) instead of looping on each byte, with
+a no-op fast path when the frame contains no reserved byte at all (the most common case).
+"""
+
+
+# authorship info
+__author__      = "Francesco Vallegra"
+__copyright__   = "Copyright 2017, MIT-SUTD"
+__license__     = "MIT"
+
+
+# reserved bytes which need to be escaped (start delimiter, escape, XON, XOFF)
+RESERVED = b'\x7E\x7D\x11\x13'
+
+# above this number of escape sequences, unescaping by a fixed chain of replace() beats removing them one by one
+_FEW_ESCAPES = 2
+
+
+def escape(frame):
+    """
+    Escape reserved characters to ensure accurate message transmission and reception.
+    The first byte (start delimiter) is never escaped.
+
+    :param frame: full frame as bytearray (or bytes)
+    :return: escaped frame as new bytearray, or frame itself if there is nothing to escape
+    """
+    # only replace the reserved bytes found (escape byte first, so not to escape the escape sequences just added)
+    escaped = frame
+    if 0x7D in frame:
+        escaped = escaped.replace(b'\x7D', b'\x7D\x5D')
+    if frame.find(b'\x7E', 1) >= 0:
+        escaped = escaped.replace(b'\x7E', b'\x7D\x5E')
+    if 0x11 in frame:
+        escaped = escaped.replace(b'\x11', b'\x7D\x31')
+    if 0x13 in frame:
+        escaped = escaped.replace(b'\x13', b'\x7D\x33')
+
+    if escaped is frame:
+        return frame
+    if type(escaped) is not bytearray:
+        escaped = bytearray(escaped)
+
+    # the start delimiter has been escaped as well: put it back as is
+    if escaped[0] == 0x7D:
+        del escaped[0]
+        escaped[0] = frame[0]
+    return escaped
+
+
+def unescape(frame):
+    """
+    Retrieve unescaped message from escaped message in order to understand intended message
+
+    :param frame: escaped frame as bytearray (or bytes)
+    :return: unescaped frame as new bytearray
+    """
+    if 0x7D not in frame:
+        return bytearray(frame)
+
+    if frame.count(b'\x7D') > _FEW_ESCAPES:
+        # the escape byte must be restored last, so not to create new escape sequences
+        unescaped = frame.replace(b'\x7D\x5E', b'\x7E').replace(b'\x7D\x31', b'\x11').replace(b'\x7D\x33', b'\x13')
+        # an escape byte not followed by an escaped reserved byte (malformed frame) is left to the loop below
+        if unescaped.count(b'\x7D') == unescaped.count(b'\x7D\x5D'):
+            return bytearray(unescaped.replace(b'\x7D\x5D', b'\x7D'))
+
+    # remove the escape bytes one by one
+    unescaped = bytearray(frame)
+    i = unescaped.find(b'\x7D')
+    while i >= 0:
+        del unescaped[i]
+        if i == len(unescaped):
+            # trailing escape byte with nothing after it is dropped
+            break
+        unescaped[i] ^= 0x20
+        i = unescaped.find(b'\x7D', i + 1)
+    return unescaped
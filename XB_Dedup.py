@@ -0,0 +1,106 @@
+#!/usr/bin/env python
+
+"""
+Duplicate suppression for received RF packets: DigiMesh broadcasts and retries can deliver the same payload several
+times. Packets are identified by source address and payload hash (or by any other key, e.g. an application sequence
+number), and a packet with the same key as one received within the time window is a duplicate.
+Enable it with: XB.dedup = XB_Dedup()
+"""
+
+from collections import OrderedDict
+import threading
+import time
+
+
+# authorship info
+__author__      = "Francesco Vallegra"
+__copyright__   = "Copyright 2017, MIT-SUTD"
+__license__     = "MIT"
+
+
+def payloadKey(XBmsg):
+    """
+    Default key of a received packet: source address and hash of the payload
+    """
+    return XBmsg.sourceAddr, hash(bytes(XBmsg.data))
+
+
+class XB_Dedup:
+    """
+    Thread-safe, bounded cache of the keys seen within a time window. Lookups and insertions are O(1); keys are
+    forgotten when older than ttl or, if more than size keys are stored, oldest first.
+    """
+
+    def __init__(self, size=4096, ttl=5., key=payloadKey):
+        """
+        :param size: max number of keys remembered
+        :param ttl: time window [s]: a key is a duplicate if seen less than ttl seconds before (since first seen). If
+                None, keys are only forgotten when more than size
+        :param key: function giving the key of a received packet (XB_RF_IN or XB_RFexpl_IN object), e.g. to use an
+                application sequence number: lambda XBmsg: (XBmsg.sourceAddr, XBmsg.data[0])
+        """
+        self.size = size
+        self.ttl = ttl
+        self.key = key
+
+        # statistics
+        self.stats = {'checked': 0,
+                      'duplicates': 0,
+                      'expired': 0,
+                      'evicted': 0}
+
+        self._lock = threading.Lock()
+        # time first seen, by key (in order of time)
+        self._seen = OrderedDict()
+
+    def __len__(self):
+        return len(self._seen)
+
+    def clear(self):
+        with self._lock:
+            self._seen.clear()
+
+    def isDuplicate(self, XBmsg):
+        """
+        :param XBmsg: received packet (XB_RF_IN or XB_RFexpl_IN object)
+        :return: True if the same packet was already received within the time window
+        """
+        return self.seen(self.key(XBmsg), XBmsg.time_ns / 1e9)
+
+    def seen(self, key, now=None):
+        """
+        Check a key, remembering it if new
+
+        :param key: any hashable
+        :param now: time of the check (default time.time())
+        :return: True if the key was already seen within the time window
+        """
+        if now is None:
+            now = time.time()
+
+        with self._lock:
+            self.stats['checked'] += 1
+
+            first = self._seen.get(key)
+            if first is not None:
+                if self.ttl is None or now - first <= self.ttl:
+                    self.stats['duplicates'] += 1
+                    return True
+                # seen too long ago: as new (the time window is not extended by duplicates)
+                del self._seen[key]
+                self.stats['expired'] += 1
+
+            self._seen[key] = now
+
+            # forget the keys out of the time window, then the oldest ones if too many
+            while self.ttl is not None:
+                oldest = next(iter(self._seen))
+                if now - self._seen[oldest] <= self.ttl:
+                    break
+                del self._seen[oldest]
+                self.stats['expired'] += 1
+            while len(self._seen) > self.size:
+                self._seen.popitem(last=False)
+                self.stats['evicted'] += 1
+
+        return False
@@ -0,0 +1,485 @@
+#!/usr/bin/env python
+
+"""
+Emulated XBee (DigiMesh) on a pseudo-terminal, for testing XBee_module without any radio (Linux/Unix only).
+
+The emulator owns the master side of a pty and XBee_module opens the slave side (emulator.port) as a normal serial
+port. It answers:
+- command mode: '+++' (received alone, as after the guard time) -> 'OK\r', then ATxx (read), ATxx<hex> (set), ATWR,
+  ATAC, ATCN (exit)
+- API frames: 0x08 (-> 0x88, including ND/FN from the emulated remote nodes), 0x17 (-> 0x97), 0x10 and 0x11 (-> 0x8B)
+and generates streams of incoming traffic (0x90, 0x8B, 0x8D, 0x91) at given rates.
+"""
+
+import os
+import random
+import select
+import struct
+import threading
+import time
+import tty
+
+from XB_Address import XBeeAddress, BROADCAST
+from XB_Parser import XB_FrameParser
+import XB_Codec
+
+
+# authorship info
+__author__      = "Francesco Vallegra"
+__copyright__   = "Copyright 2017, MIT-SUTD"
+__license__     = "MIT"
+
+
+# default registries of an emulated XBee (values as integers, NI as string), with their size in bytes
+_REGISTRIES = {'ID': (0x7FFF, 2),
+               'CE': (0x00, 1),
+               'BH': (0x00, 1),
+               'SH': (0x0013A200, 4),
+               'SL': (0x00000000, 4),
+               'DH': (0x00000000, 4),
+               'DL': (0x0000FFFF, 4),
+               'AP': (0x00, 1),
+               'NO': (0x00, 1),
+               'BD': (0x03, 1),
+               'GT': (0x03E8, 2),
+               'CT': (0x0064, 2),
+               'NP': (0x0049, 2),
+               'NI': (' ', 0)}
+
+# frame types of the generated traffic
+TRAFFIC_TYPES = (0x8B, 0x8D, 0x90, 0x91)
+
+_HEADER = struct.Struct('>BH')
+_RX = struct.Struct('>B8s2sB')                  # 0x90: type, source, reserved, options
+_RX_EXPL = struct.Struct('>B8s2sBB2s2sB')       # 0x91: type, source, reserved, EPs, cluster, profile, options
+_TX_STATUS = struct.Struct('>BB2sBBB')          # 0x8B: type, frame ID, reserved, tries, status, discovery
+_ROUTE_INFO = struct.Struct('>BBBIBBB8s8s8s8s')  # 0x8D: type, event, length, time, ACK timeouts, TX blocks, reserved,
+                                                #       destination, source, responder, receiver addresses
+
+
+# ===============================================================================
+#   Emulated node
+# ===============================================================================
+class XB_EmulatedNode:
+    """
+    Registries of an emulated XBee (either the local one, or a remote one in the emulated network)
+    """
+
+    def __init__(self, address, registries=None, rssi=0x28):
+        """
+        :param address: 64-bit address (XBeeAddress, int, bytes or hex string)
+        :param registries: values to change from the defaults (e.g. {'NI': 'node1', 'CE': 2})
+        :param rssi: RSSI [-dBm] of the link with the local XBee
+        """
+        self.address = XBeeAddress(address)
+        self.rssi = rssi
+
+        self.registries = dict((reg, value) for reg, (value, _) in _REGISTRIES.items())
+        self.registries['SH'] = int(self.address) >> 32
+        self.registries['SL'] = int(self.address) & 0xFFFFFFFF
+        if registries is not None:
+            self.registries.update(registries)
+
+        # values written to (emulated) flash
+        self.saved = dict(self.registries)
+
+    def get(self, reg):
+        """
+        :return: value of the registry as bytes (as given in API frames), or None if unknown
+        """
+        if reg not in self.registries:
+            return None
+
+        value = self.registries[reg]
+        if isinstance(value, str):
+            return value.encode()
+
+        size = _REGISTRIES[reg][1] if reg in _REGISTRIES else max(1, (value.bit_length() + 7) // 8)
+        return value.to_bytes(size, 'big')
+
+    def set(self, reg, value):
+        """
+        :param reg: registry name
+        :param value: value as bytes (as given in API frames)
+        :return: True if the registry exists
+        """
+        if reg not in self.registries:
+            return False
+
+        if isinstance(self.registries[reg], str):
+            self.registries[reg] = bytes(value).decode(errors='replace')
+        else:
+            self.registries[reg] = int.from_bytes(value, 'big')
+        return True
+
+    def discoveryData(self):
+        """
+        :return: node identification as in ND/FN replies: MY, SH, SL, NI, parent, device type, status, profile,
+                manufacturer
+        """
+        return (b'\xFF\xFE' + self.address.bytes + self.get('NI') + b'\x00' + b'\xFF\xFE' +
+                bytes([self.registries['CE'] and 0x02, 0x00]) + b'\xC1\x05' + b'\x10\x1E')
+
+
+# ===============================================================================
+#   Emulator class
+# ===============================================================================
+class XB_Emulator:
+    """
+    XBee emulated on a pseudo-terminal, running in a background thread (see start() and stop())
+    """
+
+    def __init__(self, address=0x0013A20040E44B94, registries=None, seed=None):
+        """
+        :param address: 64-bit address of the emulated local XBee
+        :param registries: values to change from the defaults (e.g. {'AP': 2})
+        :param seed: seed for the random content of generated traffic
+        """
+        self.local = XB_EmulatedNode(address, registries)
+
+        # remote nodes by address
+        self.nodes = dict()
+
+        # generated traffic: list of [frame type, rate, source, payload size, remaining count, next time]
+        self._traffic = list()
+
+        # statistics
+        self.stats = {'rxFrames': 0,        # API frames received from the host
+                      'txFrames': 0,        # API frames sent to the host
+                      'txBytes': 0,
+                      'dropped': 0}         # frames not sent as the host is not reading
+
+        self._random = random.Random(seed)
+        self._cmdMode = False
+        self._cmdTime = 0.
+        self._cmdBuff = bytearray()
+        self._out = bytearray()
+        self._maxOut = 1024 * 1024
+        self._lock = threading.Lock()
+        self._running = threading.Event()
+        self._thread = None
+
+        self.parser = XB_FrameParser(escaped=self.local.registries['AP'] == 2)
+
+        # open the pseudo-terminal: no echo nor line processing on the slave side
+        self._master, self._slave = os.openpty()
+        tty.setraw(self._slave)
+        os.set_blocking(self._master, False)
+        self.port = os.ttyname(self._slave)
+
+    def addNode(self, address, registries=None, rssi=0x28):
+        """
+        Add a remote node to the emulated network (answering remote AT commands and network/neighbor discovery)
+
+        :return: XB_EmulatedNode object
+        """
+        node = XB_EmulatedNode(address, registries, rssi)
+        with self._lock:
+            self.nodes[node.address] = node
+        return node
+
+    def addTraffic(self, frameType, rate, source=None, payloadSize=16, count=None):
+        """
+        Generate incoming frames at a given rate
+
+        :param frameType: one of TRAFFIC_TYPES (0x8B, 0x8D, 0x90, 0x91)
+        :param rate: frames per second
+        :param source: address of the sender (if None, a random remote node, or a fixed address if none was added)
+        :param payloadSize: size of the data of 0x90/0x91 frames
+        :param count: number of frames to generate (if None, till stopped)
+        """
+        if frameType not in TRAFFIC_TYPES:
+            raise ValueError('frame type 0x{:02X} cannot be generated'.format(frameType))
+        if source is not None:
+            source = XBeeAddress(source)
+
+        with self._lock:
+            self._traffic.append([frameType, float(rate), source, payloadSize, count, time.time()])
+
+    def clearTraffic(self):
+        with self._lock:
+            del self._traffic[:]
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._running.set()
+        self._thread = threading.Thread(target=self._run, name='XB_Emulator')
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        self._running.clear()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def close(self):
+        self.stop()
+        os.close(self._master)
+        os.close(self._slave)
+
+    # ===============================================================================
+    #   Emulator thread
+    def _run(self):
+        while self._running.is_set():
+            wlist = [self._master] if self._out else []
+            readable, writable, _ = select.select([self._master], wlist, [], self._nextDue())
+
+            if readable:
+                try:
+                    data = os.read(self._master, 4096)
+                except OSError:
+                    break
+                self._receive(data)
+
+            self._generate()
+
+            if self._out:
+                try:
+                    sent = os.write(self._master, self._out)
+                except BlockingIOError:
+                    sent = 0
+                del self._out[:sent]
+
+    def _nextDue(self):
+        """
+        :return: time [s] to wait before the next generated frame is due
+        """
+        with self._lock:
+            if not self._traffic:
+                return 0.05
+            wait = min(traffic[5] for traffic in self._traffic) - time.time()
+        return min(0.05, max(0., wait))
+
+    def _receive(self, data):
+        # '+++' alone (after the guard time) enters command mode
+        if not self._cmdMode and bytes(data) == b'+++':
+            self._cmdMode = True
+            self._cmdTime = time.time()
+            self._cmdBuff = bytearray()
+            self._send(b'OK\r')
+            return
+
+        if self._cmdMode:
+            self._command(data)
+            return
+
+        if self.local.registries['AP'] == 0:
+            # transparent mode: data would be sent to DH/DL
+            return
+
+        self.parser.escaped = self.local.registries['AP'] == 2
+        for frame in self.parser.feed(data):
+            self.stats['rxFrames'] += 1
+            self._apiFrame(frame)
+
+    # ===============================================================================
+    #   Command mode
+    def _command(self, data):
+        # command mode times out after CT (in 100ms) of inactivity
+        if time.time() - self._cmdTime > self.local.registries['CT'] / 10.:
+            self._cmdMode = False
+            self._receive(data)
+            return
+        self._cmdTime = time.time()
+
+        self._cmdBuff += data
+        while b'\r' in self._cmdBuff:
+            i = self._cmdBuff.index(b'\r')
+            line = bytes(self._cmdBuff[:i]).decode(errors='replace').strip(' ,')
+            del self._cmdBuff[:i + 1]
+
+            if not line:
+                continue
+            self._send(self._atCommand(line))
+
+            if not self._cmdMode:
+                # anything after ATCN is not a command anymore
+                rest = bytes(self._cmdBuff)
+                self._cmdBuff = bytearray()
+                if rest.strip(b' ,'):
+                    self._receive(rest)
+                return
+
+    def _atCommand(self, line):
+        """
+        :param line: AT command (without carriage return)
+        :return: reply as bytes
+        """
+        if line[:2].upper() != 'AT' or len(line) < 4:
+            return b'ERROR\r'
+        reg = line[2:4].upper()
+        value = line[4:].strip()
+
+        if reg == 'CN':
+            self._cmdMode = False
+            return b'OK\r'
+        if reg == 'WR':
+            self.local.saved = dict(self.local.registries)
+            return b'OK\r'
+        if reg == 'AC':
+            return b'OK\r'
+        if reg not in self.local.registries:
+            return b'ERROR\r'
+
+        if not value:
+            current = self.local.registries[reg]
+            if isinstance(current, str):
+                return current.encode() + b'\r'
+            return '{:X}\r'.format(current).encode()
+
+        if isinstance(self.local.registries[reg], str):
+            self.local.registries[reg] = value
+        else:
+            try:
+                self.local.registries[reg] = int(value, 16)
+            except ValueError:
+                return b'ERROR\r'
+        return b'OK\r'
+
+    # ===============================================================================
+    #   API frames
+    def _apiFrame(self, frame):
+        frameType = frame[3]
+
+        if frameType == 0x08:
+            # local AT command
+            frameID = frame[4]
+            reg = bytes(frame[5:7]).decode(errors='replace')
+            value = frame[7:-1]
+            if reg in ('ND', 'FN'):
+                self._discovery(frameID, reg)
+                return
+            status, reply = self._registry(self.local, reg, value)
+            if frameID:
+                self._sendFrame(bytes([0x88, frameID]) + frame[5:7] + bytes([status]) + reply)
+
+        elif frameType == 0x17:
+            # remote AT command
+            frameID = frame[4]
+            dest = XBeeAddress.fromBytes(frame[5:13])
+            reg = bytes(frame[16:18]).decode(errors='replace')
+            node = self.nodes.get(dest)
+            if node is None:
+                # remote command transmission failed
+                status, reply = 0x04, b''
+            else:
+                status, reply = self._registry(node, reg, frame[18:-1])
+            if frameID:
+                self._sendFrame(bytes([0x97, frameID]) + dest.bytes + b'\xFF\xFE' + frame[16:18] + bytes([status]) +
+                                reply)
+
+        elif frameType in (0x10, 0x11):
+            # transmit request: delivered if broadcast or to a known node, otherwise route not found
+            frameID = frame[4]
+            dest = XBeeAddress.fromBytes(frame[5:13])
+            status = 0x00 if dest == BROADCAST or dest in self.nodes else 0x25
+            if frameID:
+                self._sendFrame(_TX_STATUS.pack(0x8B, frameID, b'\xFF\xFE', 0, status, 0))
+
+    def _registry(self, node, reg, value):
+        """
+        :return: command status and value (as bytes) to reply with
+        """
+        if value:
+            if not node.set(reg, value):
+                return 0x02, b''
+            return 0x00, b''
+
+        reply = node.get(reg)
+        if reply is None:
+            return 0x02, b''
+        return 0x00, reply
+
+    def _discovery(self, frameID, reg):
+        """
+        Reply to network (ND) or neighbor (FN) discovery with a frame per emulated remote node
+        """
+        with self._lock:
+            nodes = list(self.nodes.values())
+
+        for node in nodes:
+            data = node.discoveryData()
+            if self.local.registries['NO'] & 0x04:
+                data += bytes([node.rssi])
+            self._sendFrame(bytes([0x88, frameID]) + reg.encode() + b'\x00' + data)
+
+        # final empty reply
+        self._sendFrame(bytes([0x88, frameID]) + reg.encode() + b'\x00')
+
+    # ===============================================================================
+    #   Generated traffic
+    def _generate(self):
+        now = time.time()
+        with self._lock:
+            traffic = list(self._traffic)
+
+        for item in traffic:
+            frameType, rate, source, payloadSize, count, due = item
+            if due > now:
+                continue
+
+            # frames due since last time (bursts keep high rates despite the resolution of the timer)
+            n = int((now - due) * rate) + 1
+            if count is not None:
+                n = min(n, count)
+                item[4] = count - n
+            item[5] = due + n / rate
+
+            for _ in range(n):
+                self._sendFrame(self._trafficFrame(frameType, source, payloadSize))
+
+            if item[4] == 0:
+                with self._lock:
+                    self._traffic.remove(item)
+
+    def _trafficFrame(self, frameType, source, payloadSize):
+        """
+        :return: frame-specific data of a generated frame
+        """
+        if source is None:
+            if self.nodes:
+                source = self._random.choice(list(self.nodes))
+            else:
+                source = XBeeAddress(0x0013A20040000001)
+
+        if frameType == 0x90:
+            return _RX.pack(0x90, source.bytes, b'\xFF\xFE', 0x01) + self._payload(payloadSize)
+
+        if frameType == 0x91:
+            return _RX_EXPL.pack(0x91, source.bytes, b'\xFF\xFE', 0xE8, 0xE8, b'\x00\x11', b'\xC1\x05', 0x01) + \
+                   self._payload(payloadSize)
+
+        if frameType == 0x8B:
+            return _TX_STATUS.pack(0x8B, self._random.randrange(1, 256), b'\xFF\xFE', 0, 0, 0)
+
+        # 0x8D: route information from the source to the local XBee, as relayed by the source itself
+        return _ROUTE_INFO.pack(0x8D, 0x12, 0x2A, int(time.time() * 1e6) & 0xFFFFFFFF, 0, 0, 0,
+                                self.local.address.bytes, source.bytes, source.bytes, self.local.address.bytes)
+
+    def _payload(self, size):
+        return bytes(self._random.getrandbits(8) for _ in range(size))
+
+    # ===============================================================================
+    #   Output to host
+    def _sendFrame(self, frameData):
+        """
+        Pack the frame-specific data with header and checksum (escaped as per AP) and queue it to the host
+        """
+        frame = bytearray(_HEADER.pack(0x7E, len(frameData)))
+        frame += frameData
+        frame.append(0xFF - (sum(frameData) & 0xFF))
+
+        if self.local.registries['AP'] == 2:
+            frame = XB_Codec.escape(frame)
+
+        if len(self._out) + len(frame) > self._maxOut:
+            self.stats['dropped'] += 1
+            return
+        self._send(frame)
+        self.stats['txFrames'] += 1
+
+    def _send(self, data):
+        self._out += data
+        self.stats['txBytes'] += len(data)
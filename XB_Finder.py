@@ -1,9 +1,17 @@
 #!/usr/bin/env python
 import sys
+import os
+import json
 import glob
+import time
+import threading
+import concurrent.futures
+import serial
 import serial.tools.list_ports
 from re import search
 
+from XB_Parser import XB_FrameParser
+
 
 # authorship info
 __author__      = "Brandon Zoss, Francesco Vallegra"
@@ -11,6 +19,24 @@ __copyright__   = "Copyright 2017, MIT-SUTD"
 __license__     = "MIT"
 
 
+# USB to serial adapters used by XBee boards, as (vendor ID, product ID)
+XBEE_USB_IDS = [(0x0403, 0x6001),   # FTDI FT232R (XBee USB adapters, XBIB boards)
+                (0x0403, 0x6015),   # FTDI FT231X (XBee explorers)
+                (0x10C4, 0xEA60)]   # Silicon Labs CP210x (XBee 3 boards)
+
+# baud rates supported by the XBee, most probable first
+BAUDS = [9600, 57600, 115200, 38400, 19200, 4800, 2400, 1200]
+
+# last known good baud rate of each radio
+DEFAULT_CACHE = os.path.join(os.path.expanduser('~'), '.xbee_ports.json')
+
+# local AT command frame querying AP (never escaped), and time [s] to wait for its reply
+_API_PROBE = bytes([0x7E, 0x00, 0x04, 0x08, 0x01, 0x41, 0x50, 0x65])
+_API_WAIT = .1
+
+_cacheLock = threading.Lock()
+
+
 def serial_ports():
     """
     Lists serial port names and checks if any is connected to a serial number of a usb to XBEE device
@@ -18,6 +44,11 @@ def serial_ports():
     :raises EnvironmentError: On unsupported or unknown platforms
     :returns: the port of the found XBee or None if none found
     """
+    # USB adapters known to be used for XBee (no need to probe them)
+    ports = usb_ports()
+    if ports:
+        return ports[0].device
+
     # depending on the system, reads available ports
     if sys.platform.startswith('win'):
         ports = list(serial.tools.list_ports.comports())
@@ -25,6 +56,7 @@ def serial_ports():
             if "USB Serial Port" in str(p):
                 print(p.description)
                 return p.device
+        ports = list()
     elif sys.platform.startswith('linux') or sys.platform.startswith('cygwin'):
         # this excludes your current terminal "/dev/tty"
         ports = glob.glob('/dev/tty[A-Za-z]*')
@@ -38,16 +70,263 @@ def serial_ports():
     for ser in ports:
         # look for serial devices, which name includes either a D or a A following a hyphen (-)
         # more at https://docs.python.org/2/library/re.html
-        if bool(search('(?<=-)[DA]\w+', ser)) or 'USB0' in ser:
+        if bool(search(r'(?<=-)[DA]\w+', ser)) or 'USB0' in ser:
             XB = ser
             break
 
-    # if not XB: raise EnvironmentError('No Digi-Mesh Radio Found')
-    print("No Digi-Mesh Radio Found")
-    
+    if not XB:
+        print("No Digi-Mesh Radio Found")
+
     return XB
 
 
-if __name__ == '__main__':
-    print(serial_ports())
+# ===============================================================================
+#   Discovery of all the radios
+# ===============================================================================
+def usb_ports(usbIDs=None):
+    """
+    :param usbIDs: list of (vendor ID, product ID) of the USB adapters to look for (default XBEE_USB_IDS)
+    :return: list of serial.tools.list_ports ListPortInfo of the matching USB devices, sorted by device name
+    """
+    if usbIDs is None:
+        usbIDs = XBEE_USB_IDS
+
+    ports = [p for p in serial.tools.list_ports.comports() if (p.vid, p.pid) in usbIDs]
+    return sorted(ports, key=lambda p: p.device)
+
+
+def find_radios(ports=None, bauds=None, cachePath=DEFAULT_CACHE, commandMode=True, usbIDs=None, apiProbe=False):
+    """
+    Find all the XBee connected, probing the candidate ports concurrently (see probe()): radios already found in API
+    mode are tried first at their last known good baud rate, so finding them again only takes one API query.
+
+    :param ports: ports to probe (device names), or None for the USB adapters in usbIDs
+    :param bauds: baud rates to try (default BAUDS)
+    :param cachePath: JSON file storing the last known good baud rate of each radio (None to not use it)
+    :param commandMode: if True, try the command mode (+++) on the radios not found by their last known baud rate
+    :param usbIDs: list of (vendor ID, product ID) of the USB adapters to look for (default XBEE_USB_IDS)
+    :param apiProbe: if True, also send the API query at every baud rate (see probe())
+    :return: list of dictionaries (one per radio found, sorted by port) with: 'port', 'baud', 'AP' (None if unknown),
+            'serial_number', 'vid', 'pid' (None if not USB) and 'description'
+    """
+    if ports is None:
+        infos = usb_ports(usbIDs)
+    else:
+        byDevice = dict((p.device, p) for p in serial.tools.list_ports.comports())
+        infos = [byDevice.get(port, port) for port in ports]
+    if not infos:
+        return list()
+
+    cache = load_cache(cachePath) if cachePath is not None else dict()
+
+    candidates = list()
+    for info in infos:
+        candidate = {'port': getattr(info, 'device', info),
+                     'serial_number': getattr(info, 'serial_number', None),
+                     'vid': getattr(info, 'vid', None),
+                     'pid': getattr(info, 'pid', None),
+                     'description': getattr(info, 'description', '')}
+        known = cache.get(_radioKey(candidate), dict())
+        candidates.append((candidate, baud_order(known.get('baud'), bauds), known.get('AP')))
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=len(candidates)) as pool:
+        futures = [(candidate, pool.submit(probe, candidate['port'], order, commandMode, apiProbe=apiProbe,
+                                           knownAP=knownAP))
+                   for candidate, order, knownAP in candidates]
+
+    radios = list()
+    for candidate, future in futures:
+        try:
+            found = future.result()
+        except (serial.SerialException, OSError) as e:
+            print("ERR: cannot probe port '{}': {}".format(candidate['port'], e))
+            continue
+        if found is None:
+            continue
+        candidate.update(found)
+        radios.append(candidate)
+
+    if cachePath is not None and radios:
+        remember(radios, cachePath)
+
+    return sorted(radios, key=lambda radio: radio['port'])
+
+
+def baud_order(known=None, bauds=None):
+    """
+    :param known: last known good baud rate, tried first (if any)
+    :param bauds: baud rates to try (default BAUDS)
+    :return: list of baud rates in the order to try them
+    """
+    if bauds is None:
+        bauds = BAUDS
+    if known in bauds:
+        return [known] + [baud for baud in bauds if baud != known]
+    return list(bauds)
+
+
+def probe(port, bauds=None, commandMode=True, guardTime=1., apiProbe=False, knownAP=None):
+    """
+    Look for the baud rate of the XBee connected to the port. The XBee is left in the mode it was found.
+    An XBee in Transparent Mode transmits over the air whatever it receives, so the API query (AP) is only sent to
+    radios known to be in API mode (knownAP), at their last known good baud rate (the first one in bauds). Otherwise
+    the command mode (+++) is tried at each baud rate, reading AP as well; the API query at each baud rate (no guard
+    time needed, so all baud rates are tried within a second) is only tried if apiProbe.
+
+    :param port: serial port
+    :param bauds: baud rates to try, in order
+    :param commandMode: if True, try the command mode
+    :param guardTime: command mode guard time [s] of the XBee
+    :param apiProbe: if True, send the API query at each baud rate if the XBee is not found otherwise
+    :param knownAP: API mode the XBee was last found in (see find_radios()), or None if unknown
+    :return: dictionary with 'baud' and 'AP' (None if not read), or None if no XBee replied
+    """
+    if bauds is None:
+        bauds = BAUDS
+
+    ser = serial.Serial(port=port, baudrate=bauds[0], timeout=0)
+    try:
+        if knownAP:
+            AP = _probeAPI(ser)
+            if AP is not None:
+                return {'baud': bauds[0], 'AP': AP}
+
+        if commandMode:
+            for baud in bauds:
+                ser.baudrate = baud
+                found, AP = _probeCommandMode(ser, guardTime)
+                if found:
+                    return {'baud': baud, 'AP': AP}
+
+        if apiProbe:
+            for baud in bauds:
+                ser.baudrate = baud
+                AP = _probeAPI(ser)
+                if AP is not None:
+                    return {'baud': baud, 'AP': AP}
+    finally:
+        ser.close()
+
+    return None
 
+
+def _probeAPI(ser):
+    ser.reset_input_buffer()
+    ser.write(_API_PROBE)
+
+    parser = XB_FrameParser(escaped=True)
+    deadline = time.time() + _API_WAIT
+    while time.time() < deadline:
+        for frame in parser.feed(ser.read(ser.in_waiting or 1)):
+            # AT command response to AP, status OK
+            if frame[3] == 0x88 and frame[5:7] == b'AP' and frame[7] == 0x00 and len(frame) > 9:
+                return frame[8]
+        time.sleep(.005)
+    return None
+
+
+def _probeCommandMode(ser, guardTime):
+    """
+    :return: True if the XBee entered command mode, and its API mode (None if not read)
+    """
+    # nothing must be sent during the guard time, before and after '+++'
+    time.sleep(guardTime)
+    ser.reset_input_buffer()
+    ser.write(b'+++')
+    if not _readLine(ser, guardTime + .2).endswith(b'OK\r'):
+        return False, None
+
+    ser.write(b'ATAP\r')
+    try:
+        AP = int(_readLine(ser, .5).strip(), 16)
+    except ValueError:
+        AP = None
+
+    # exit command mode
+    ser.write(b'ATCN\r')
+    _readLine(ser, .5)
+    return True, AP
+
+
+def _readLine(ser, timeout):
+    """
+    :return: bytes received till the first carriage return (included), or till the timeout
+    """
+    received = bytearray()
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        received.extend(ser.read(ser.in_waiting or 1))
+        if received.endswith(b'\r'):
+            break
+        time.sleep(.005)
+    return bytes(received)
+
+
+# ===============================================================================
+#   Cache of the last known good baud rates
+# ===============================================================================
+def _radioKey(radio):
+    # USB serial number (stable across ports), or port if not USB
+    return radio.get('serial_number') or radio['port']
+
+
+def load_cache(cachePath=DEFAULT_CACHE):
+    """
+    :return: dictionary of the radios last found, by USB serial number (or port)
+    """
+    try:
+        with open(cachePath) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return dict()
+
+
+def remember(radios, cachePath=DEFAULT_CACHE):
+    """
+    Store port, baud rate and API mode of the radios found (list of dictionaries as returned by find_radios()),
+    forgetting the radios on ports which no longer exist (e.g. pseudo-terminals)
+    """
+    with _cacheLock:
+        cache = load_cache(cachePath)
+        existing = set(p.device for p in serial.tools.list_ports.comports())
+        for key in list(cache):
+            port = cache[key].get('port')
+            if port not in existing and not os.path.exists(str(port)):
+                del cache[key]
+
+        for radio in radios:
+            cache[_radioKey(radio)] = {'port': radio['port'],
+                                       'baud': radio['baud'],
+                                       'AP': radio.get('AP')}
+        try:
+            with open(cachePath, 'w') as f:
+                json.dump(cache, f, indent=2, sort_keys=True)
+        except OSError as e:
+            print("ERR: cannot write cache '{}': {}".format(cachePath, e))
+
+
+def _portKey(port):
+    for info in serial.tools.list_ports.comports():
+        if info.device == port:
+            return info.serial_number or port
+    return port
+
+
+def known_baud(port, cachePath=DEFAULT_CACHE):
+    """
+    :return: last known good baud rate of the radio connected to the port, or None
+    """
+    return load_cache(cachePath).get(_portKey(port), dict()).get('baud')
+
+
+def remember_port(port, baud, cachePath=DEFAULT_CACHE, AP=None):
+    """
+    Store the baud rate (and API mode, if known) of the radio connected to the port
+    """
+    key = _portKey(port)
+    remember([{'port': port, 'baud': baud, 'AP': AP, 'serial_number': key if key != port else None}], cachePath)
+
+
+if __name__ == '__main__':
+    for radio in find_radios():
+        print(radio)
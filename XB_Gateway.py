@@ -0,0 +1,209 @@
+#!/usr/bin/env python
+
+"""
+Gateway with several XBee (e.g. on different channels or network IDs), used as a single one:
+- all the radios are initialized concurrently, each with its own receiver and transmit scheduler threads;
+- messages received by any radio are merged into a single stream, tagged with the radio which received them;
+- transmissions go through the radio which can reach the destination at the lowest cost, considering the link quality
+(as per the topology of each radio) and the number of frames waiting in its scheduler.
+
+    GW = XB_Gateway()                       # all the radios found by XB_Finder
+    GW.send('0013a200', '40e44b94', 'hello')
+    radio, XBmsg = GW.receive()
+"""
+
+import concurrent.futures
+import functools
+import queue
+import threading
+
+import XB_Finder
+from XB_Topology import XB_Topology
+from XBee_API import XBee_module
+
+
+# authorship info
+__author__      = "Francesco Vallegra"
+__copyright__   = "Copyright 2017, MIT-SUTD"
+__license__     = "MIT"
+
+
+# ===============================================================================
+#   Gateway
+# ===============================================================================
+class XB_Gateway:
+    """
+    Manager of several XBee_module objects (radios)
+    """
+
+    def __init__(self, radios=None, window=4, topology=True, maxQueued=10000, **kwargs):
+        """
+        :param radios: list of the radios to use, each as port name, dictionary as returned by XB_Finder.find_radios()
+                or XBee_module object (already initialized). If None, all the radios found by XB_Finder.find_radios()
+        :param window: window of the transmit scheduler of each radio (see XB_Scheduler)
+        :param topology: if True, keep the topology of the network of each radio (see XB_Topology), used to choose the
+                radio to send through
+        :param maxQueued: max number of received messages waiting in the stream (the oldest ones are dropped)
+        :param kwargs: parameters of the XBee_module objects to create (e.g. ID, fastStartup)
+        """
+        if radios is None:
+            radios = XB_Finder.find_radios()
+            if not radios:
+                print('ERR: no XBee found')
+
+        # initialize all the radios at once (mostly waiting for the XBee)
+        with concurrent.futures.ThreadPoolExecutor(max_workers=max(1, len(radios))) as pool:
+            futures = [pool.submit(self._open, radio, kwargs) for radio in radios]
+        self.radios = list()
+        for future in futures:
+            try:
+                self.radios.append(future.result())
+            except Exception as e:
+                print('ERR: cannot open XBee: {0}'.format(e))
+
+        # statistics
+        self.stats = {'received': 0,
+                      'dropped': 0,
+                      'sent': dict((radio.port, 0) for radio in self.radios)}
+
+        self._callbacks = list()
+        self._stream = queue.Queue()
+        self._maxQueued = maxQueued
+        self._lock = threading.Lock()
+
+        for radio in self.radios:
+            if topology and radio.topology is None:
+                radio.topology = XB_Topology(radio.address)
+            radio.addCallback(functools.partial(self._onRx, radio))
+            radio.startScheduler(window)
+            radio.startReceiver()
+
+    @staticmethod
+    def _open(radio, kwargs):
+        if isinstance(radio, XBee_module):
+            return radio
+        if isinstance(radio, dict):
+            return XBee_module(port=radio['port'], baud=radio['baud'], **kwargs)
+        return XBee_module(port=radio, **kwargs)
+
+    def __len__(self):
+        return len(self.radios)
+
+    def close(self):
+        for radio in self.radios:
+            radio.close()
+
+    # ===============================================================================
+    #   Receiving
+    def addCallback(self, callback):
+        """
+        Register a function to be called (from the receiver thread of the radio) with (radio, XBmsg) for each message
+        received by any radio. Messages are then not queued in the stream (see receive())
+        """
+        self._callbacks.append(callback)
+
+    def removeCallback(self, callback):
+        try:
+            self._callbacks.remove(callback)
+        except ValueError:
+            pass
+
+    def receive(self, timeout=None):
+        """
+        Get the oldest message received by any radio
+
+        :param timeout: max time [s] to wait for a message (None to wait forever, 0 to not wait)
+        :return: (radio, XBmsg), with radio the XBee_module object which received it, or None if no message
+        """
+        try:
+            return self._stream.get(timeout != 0, timeout)
+        except queue.Empty:
+            return None
+
+    def _onRx(self, radio, XBmsg):
+        if XBmsg in radio.RxReplies:
+            # already passed to the request waiting for it
+            return
+        with self._lock:
+            self.stats['received'] += 1
+
+        if self._callbacks:
+            for callback in list(self._callbacks):
+                try:
+                    callback(radio, XBmsg)
+                except Exception as e:
+                    print('ERR: callback {0} failed on message: {1}'.format(getattr(callback, '__name__', callback), e))
+            return
+
+        with self._lock:
+            if self._stream.qsize() >= self._maxQueued:
+                try:
+                    self._stream.get_nowait()
+                    self.stats['dropped'] += 1
+                except queue.Empty:
+                    pass
+            self._stream.put_nowait((radio, XBmsg))
+
+    # ===============================================================================
+    #   Sending
+    def route(self, dest):
+        """
+        Choose the radio to send to the destination: among the radios whose topology includes a path to it (all of them
+        if none does), the one with the lowest (path cost) x (1 + frames queued or waiting for reply)
+
+        :param dest: address of the destination, as XBeeAddress (or anything accepted by it)
+        :return: XBee_module object, or None if no radio
+        """
+        best = None
+        bestScore = None
+        for reachable in (True, False):
+            for radio in self.radios:
+                cost = 1.
+                if reachable:
+                    if radio.topology is None:
+                        continue
+                    path = radio.topology.bestPath(radio.address, dest)
+                    if path is None:
+                        continue
+                    cost = sum(radio.topology.linkCost(radio.topology.rssi(a, b)) for a, b in zip(path, path[1:]))
+
+                depth = 0
+                if radio.scheduler is not None:
+                    depth = len(radio.scheduler) + radio.scheduler.inFlight
+                score = cost * (1 + depth)
+                if bestScore is None or score < bestScore:
+                    best = radio
+                    bestScore = score
+            if best is not None:
+                return best
+        return None
+
+    def send(self, destH, destL, data, **kwargs):
+        """
+        Send data to the destination through the best radio (see route())
+
+        :param destH: high address of the destination XBee, or its XBeeAddress (then destL is None)
+        :param destL: low address of the destination XBee
+        :param data: content of the transmit as bytearray (or str)
+        :param kwargs: other parameters of XBee_module.sendDataToRemote()
+        :return: XBee_msg object sent (transmit status in XBmsg.reply), or None if not sent
+        """
+        if not self.radios:
+            return None
+
+        dest = self.radios[0]._toAddress(destH, destL)
+        if dest is None:
+            return None
+
+        radio = self.route(dest)
+        with self._lock:
+            self.stats['sent'][radio.port] += 1
+        return radio.sendDataToRemote(dest, None, data, **kwargs)
+
+    def broadcast(self, data, **kwargs):
+        """
+        Broadcast data on the network of each radio
+
+        :return: list of the XBee_msg objects sent
+        """
+        return [radio.broadcastData(data, **kwargs) for radio in self.radios]
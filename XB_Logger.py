@@ -0,0 +1,205 @@
+#!/usr/bin/env python
+
+"""
+Asynchronous logger for the RAW data coming/outgoing from/to the XBee.
+Lines are queued (never blocking the caller) and written in batches by a background thread, which flushes the file at
+a given interval and rotates it when exceeding a given size.
+"""
+
+import atexit
+import os
+import queue
+import threading
+import time
+
+
+# authorship info
+__author__      = "Francesco Vallegra"
+__copyright__   = "Copyright 2017, MIT-SUTD"
+__license__     = "MIT"
+
+
+# marker to wake up the writer thread when closing
+_STOP = object()
+
+
+# ===============================================================================
+#   RAW logger class
+# ===============================================================================
+class XB_RawLogger:
+    """
+    Background RAW logger: log() only puts the line (or the message object, converted to str by the writer thread) in
+    a bounded queue. If the queue is full the line is dropped and counted in self.dropped.
+    """
+
+    def __init__(self, path, flushInterval=1., maxBytes=10 * 1024 * 1024, backupCount=5, queueSize=10000,
+                 batchSize=500):
+        """
+        :param path: log file (appended if already existing)
+        :param flushInterval: max time [s] before written lines are flushed to the file
+        :param maxBytes: size of the log file triggering the rotation (0 to never rotate)
+        :param backupCount: number of rotated files to keep (path.1, path.2, ...)
+        :param queueSize: max number of lines waiting to be written
+        :param batchSize: max number of lines written at once
+        """
+        self.path = path
+        self.flushInterval = flushInterval
+        self.maxBytes = maxBytes
+        self.backupCount = backupCount
+        self.batchSize = batchSize
+
+        # statistics
+        self.written = 0
+        self.dropped = 0
+        self.errors = 0
+
+        self._queue = queue.Queue(maxsize=queueSize)
+        self._closing = threading.Event()
+
+        self._thread = threading.Thread(target=self._run, name='XB_RawLogger')
+        self._thread.daemon = True
+        self._thread.start()
+
+        # make sure queued lines are written when the program ends
+        atexit.register(self.close)
+
+    def log(self, line):
+        """
+        Queue a line for writing; never blocks.
+
+        :param line: string or any object (converted with str() in the writer thread)
+        """
+        try:
+            self._queue.put_nowait(line)
+        except queue.Full:
+            self.dropped += 1
+
+    def close(self, timeout=5.):
+        """
+        Write all the queued lines and stop the writer thread
+        """
+        if self._closing.is_set():
+            return
+        self._closing.set()
+
+        # wake up the writer if waiting
+        try:
+            self._queue.put_nowait(_STOP)
+        except queue.Full:
+            pass
+
+        self._thread.join(timeout)
+
+    # ===============================================================================
+    #   Writer thread
+    def _run(self):
+        fileID = self._open('a')
+        lastFlush = time.time()
+
+        while True:
+            # wait for lines, but not more than the flush interval
+            batch = list()
+            try:
+                batch.append(self._queue.get(timeout=self.flushInterval))
+            except queue.Empty:
+                pass
+
+            # take everything already waiting
+            while len(batch) < self.batchSize:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            lines = [self._format(line) + '\n' for line in batch if line is not _STOP]
+            stop = self._closing.is_set() and self._queue.empty()
+
+            if fileID is None:
+                # not opened, or closed after an error: try again
+                fileID = self._open('a')
+
+            if lines:
+                try:
+                    if fileID is None:
+                        raise OSError('log file not open')
+                    fileID.write(''.join(lines))
+                    self.written += len(lines)
+                except (OSError, ValueError) as e:
+                    # lines lost, but keep logging the next ones (to the file opened again)
+                    self.errors += 1
+                    self.dropped += len(lines)
+                    print('ERR: cannot write RAW log: {0}'.format(e))
+                    fileID = self._close(fileID)
+
+            if fileID is not None:
+                try:
+                    if stop or time.time() - lastFlush >= self.flushInterval:
+                        fileID.flush()
+                        lastFlush = time.time()
+
+                    if self.maxBytes and fileID.tell() >= self.maxBytes:
+                        fileID = self._rotate(fileID)
+                except (OSError, ValueError) as e:
+                    self.errors += 1
+                    print('ERR: cannot flush RAW log: {0}'.format(e))
+                    fileID = self._close(fileID)
+
+            if stop:
+                break
+
+        self._close(fileID)
+
+    def _format(self, line):
+        try:
+            return str(line)
+        except Exception as e:
+            self.errors += 1
+            return 'ERR: cannot format {0} for the log: {1!r}'.format(type(line).__name__, e)
+
+    def _open(self, mode):
+        """
+        :return: the opened log file, or None if it cannot be opened
+        """
+        try:
+            return open(self.path, mode)
+        except OSError as e:
+            self.errors += 1
+            print('ERR: cannot open RAW log: {0}'.format(e))
+            return None
+
+    def _close(self, fileID):
+        """
+        Close the log file (if open), ignoring errors (e.g. data still buffered which cannot be written)
+
+        :return: None
+        """
+        if fileID is not None:
+            try:
+                fileID.close()
+            except (OSError, ValueError) as e:
+                self.errors += 1
+                print('ERR: cannot close RAW log: {0}'.format(e))
+        return None
+
+    def _rotate(self, fileID):
+        """
+        Rename the log files as path -> path.1 -> path.2 ... and start a new one
+
+        :return: the new opened file, or None if it cannot be opened
+        """
+        self._close(fileID)
+
+        if self.backupCount > 0:
+            try:
+                for i in range(self.backupCount - 1, 0, -1):
+                    src = '{0}.{1}'.format(self.path, i)
+                    if os.path.exists(src):
+                        os.replace(src, '{0}.{1}'.format(self.path, i + 1))
+                os.replace(self.path, self.path + '.1')
+            except OSError as e:
+                # keep appending to the same file
+                self.errors += 1
+                print('ERR: cannot rotate RAW log: {0}'.format(e))
+            return self._open('a')
+
+        return self._open('w')
@@ -0,0 +1,246 @@
+#!/usr/bin/env python
+
+"""
+Incremental parser for DigiMesh API frames.
+Bytes coming from the serial are consumed only once: the parser keeps the partial frame between calls and uses the
+2-byte length header to know when a frame is complete, removing the escape sequence on the fly if in API mode 2.
+"""
+
+import re
+
+
+# authorship info
+__author__      = "Francesco Vallegra"
+__copyright__   = "Copyright 2017, MIT-SUTD"
+__license__     = "MIT"
+
+
+# start delimiter and escape byte as per DigiMesh documentation
+START_DELIM = 0x7E
+ESCAPE = 0x7D
+
+# precompiled searches (work on bytes, bytearray and memoryview alike)
+_DELIM = re.compile(b'\x7E')
+_SPECIAL = re.compile(b'[\x7D\x7E]')
+
+# parser states
+_WAIT_DELIM = 0     # looking for the start delimiter
+_LENGTH = 1         # collecting the 2 bytes of the length
+_BODY = 2           # collecting frame-specific data and checksum
+
+
+def nextFrameStart(data, i=0, escaped=True, maxLength=512):
+    """
+    Find where the next frame starts, e.g. to split a recorded stream into chunks to be parsed independently: a start
+    delimiter followed by a valid length. In API mode 2 a start delimiter is never part of a frame; otherwise it can be a
+    data byte, so the whole frame must also fit and pass the checksum.
+
+    :param data: bytes, bytearray, memoryview or mmap
+    :param i: index from where to look
+    :return: index of the start delimiter, or len(data) if no frame starts from i on
+    """
+    n = len(data)
+    while True:
+        match = _DELIM.search(data, i)
+        if match is None:
+            return n
+        i = match.start()
+
+        if escaped:
+            # unescape the 2 bytes of the length
+            length = list()
+            j = i + 1
+            while len(length) < 2 and j < n and data[j] != START_DELIM:
+                if data[j] == ESCAPE:
+                    j += 1
+                    if j < n:
+                        length.append(data[j] ^ 0x20)
+                else:
+                    length.append(data[j])
+                j += 1
+            if len(length) < 2 or 0 < ((length[0] << 8) | length[1]) <= maxLength:
+                # (possibly truncated at the end of the data)
+                return i
+
+        elif i + 3 <= n:
+            length = (data[i + 1] << 8) | data[i + 2]
+            if 0 < length <= maxLength:
+                end = i + 4 + length
+                if end > n or sum(data[i + 3:end]) & 0xFF == 0xFF:
+                    return i
+        else:
+            return i
+
+        i += 1
+
+
+# ===============================================================================
+#   Frame parser (state machine)
+# ===============================================================================
+class XB_FrameParser:
+    """
+    Stateful DigiMesh frame parser: feed it with whatever is read from the serial and get back the complete frames.
+
+    Each returned frame is a bytearray holding the full unescaped frame (start delimiter, length, frame-specific data
+    and checksum), already validated against length and checksum.
+    """
+
+    def __init__(self, escaped=True, maxLength=512):
+        """
+        :param escaped: True if the escape sequence is used (API mode 2)
+        :param maxLength: frames declaring a longer length are considered corrupted
+        """
+        self.escaped = escaped
+        self.maxLength = maxLength
+
+        # number of discarded frames (wrong length/checksum or interrupted by a new start delimiter)
+        self.dropped = 0
+
+        # bytes of the last discarded frame to be scanned again (see _discard())
+        self._rescan = None
+
+        self.reset()
+
+    def reset(self):
+        """
+        Discard any partial frame and wait for the next start delimiter
+        """
+        self._state = _WAIT_DELIM
+        self._frame = bytearray()
+        self._need = 0
+        self._escNext = False
+
+    def pending(self):
+        """
+        :return: number of (unescaped) bytes of the partial frame currently held
+        """
+        return len(self._frame)
+
+    def feed(self, data):
+        """
+        Consume new bytes from the serial
+
+        :param data: bytes received, as bytes, bytearray or memoryview
+        :return: list of complete frames (as bytearrays), possibly empty
+        """
+        frames = list()
+
+        # when resynchronising after a corrupted frame (API mode 1 only), the bytes following its start delimiter are
+        # scanned again before going on from where it was found: buffers to scan, as (bytes, index to start from)
+        pending = [(data, 0)]
+        while pending:
+            buffer, i = pending.pop()
+            i = self._consume(buffer, i, frames)
+            if i is not None:
+                pending.append((buffer, i))
+                pending.append((self._rescan, 0))
+                self._rescan = None
+
+        return frames
+
+    def _consume(self, data, i, frames):
+        """
+        Run the state machine over data, from data[i]
+
+        :return: index of data where to go on after scanning self._rescan, or None if all data was consumed
+        """
+        n = len(data)
+        while i < n:
+            if self._state == _WAIT_DELIM:
+                match = _DELIM.search(data, i)
+                if match is None:
+                    # nothing of interest in here
+                    return None
+                self._startFrame()
+                i = match.end()
+                continue
+
+            i = self._collect(data, i, n)
+            if self._need:
+                # either data ran out, or a new frame started in the middle of this one
+                continue
+
+            if self._state == _LENGTH:
+                length = (self._frame[1] << 8) | self._frame[2]
+                if length == 0 or length > self.maxLength:
+                    if self._discard():
+                        return i
+                    continue
+                self._state = _BODY
+                self._need = length + 1     # frame-specific data + checksum
+
+            else:
+                # sum of frame-specific data and checksum must be 0xFF
+                if sum(memoryview(self._frame)[3:]) & 0xFF == 0xFF:
+                    frames.append(self._frame)
+                    self.reset()
+                elif self._discard():
+                    return i
+
+        return None
+
+    def _collect(self, data, i, n):
+        """
+        Append up to self._need unescaped bytes to the current frame, starting from data[i]
+
+        :return: index of the first byte not consumed
+        """
+        if not self.escaped:
+            end = min(n, i + self._need)
+            self._frame += data[i:end]
+            self._need -= end - i
+            return end
+
+        while self._need and i < n:
+            if self._escNext:
+                self._escNext = False
+                if data[i] == START_DELIM:
+                    # not a valid escaped byte: it is a new frame instead
+                    self.dropped += 1
+                    self._startFrame()
+                else:
+                    self._frame.append(data[i] ^ 0x20)
+                    self._need -= 1
+                i += 1
+                continue
+
+            # copy everything up to the next special byte in one go
+            end = min(n, i + self._need)
+            match = _SPECIAL.search(data, i, end)
+            j = end if match is None else match.start()
+            self._frame += data[i:j]
+            self._need -= j - i
+            i = j
+
+            if match is not None:
+                if data[j] == START_DELIM:
+                    # in API mode 2 a start delimiter can never be part of a frame: previous frame was incomplete
+                    self.dropped += 1
+                    self._startFrame()
+                else:
+                    self._escNext = True
+                i = j + 1
+
+        return i
+
+    def _startFrame(self):
+        self._state = _LENGTH
+        self._frame = bytearray([START_DELIM])
+        self._need = 2
+        self._escNext = False
+
+    def _discard(self):
+        """
+        Drop the current (corrupted) frame.
+        Without escape sequence the start delimiter could have been a data byte, so the bytes following it need to be
+        scanned again in case a real frame starts among them: they are kept in self._rescan.
+
+        :return: True if there are bytes to scan again
+        """
+        self.dropped += 1
+        rescan = None
+        if not self.escaped and len(self._frame) > 1:
+            rescan = bytes(self._frame[1:])
+        self.reset()
+        self._rescan = rescan
+        return rescan is not None
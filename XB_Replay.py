@@ -0,0 +1,165 @@
+#!/usr/bin/env python
+
+"""
+Replay of recorded XBee traffic through the receive path of XBee_module, without any serial port.
+The recording is memory-mapped and fed, chunk by chunk, to the same parsing code used by readSerial(), so to measure
+the throughput of the receive path (frames/s and bytes/s) on real traffic.
+
+Two kinds of recordings are accepted:
+- raw stream: the bytes exactly as read from the serial port
+- binary capture (see XB_Capture): incoming frames are escaped again (if in API mode 2) and fed one by one, at the
+  time they were received
+"""
+
+import mmap
+import time
+
+from XB_Capture import XB_CaptureReader, isCapture, iterRecords, IN
+from XBee_API import XBee_module
+import XB_Codec
+
+
+# authorship info
+__author__      = "Francesco Vallegra"
+__copyright__   = "Copyright 2017, MIT-SUTD"
+__license__     = "MIT"
+
+
+# replay modes
+REALTIME = 'realtime'           # same timing as recorded
+ACCELERATED = 'accelerated'     # recorded timing divided by speed
+MAX = 'max'                     # as fast as possible
+
+
+# ===============================================================================
+#   Replay class
+# ===============================================================================
+class XB_Replay:
+    """
+    Feed a recorded stream or capture to an XBee_module (by default an offline one: see XBee_module.offline())
+    """
+
+    def __init__(self, path, XB=None, mode=MAX, speed=1., chunkSize=4096, baud=9600, AP=0x02):
+        """
+        :param path: raw stream or binary capture file
+        :param XB: XBee_module object processing the data (if None, an offline module is created)
+        :param mode: REALTIME, ACCELERATED or MAX
+        :param speed: acceleration factor for ACCELERATED mode
+        :param chunkSize: bytes given at once to the parser when replaying a raw stream
+        :param baud: serial baud rate used to time a raw stream (10 bits per byte) in REALTIME/ACCELERATED modes
+        :param AP: API mode of the recorded data
+        """
+        if mode not in (REALTIME, ACCELERATED, MAX):
+            raise ValueError("replay mode '{0}' not recognized".format(mode))
+
+        if XB is None:
+            XB = XBee_module.offline(AP=AP)
+
+        self.path = path
+        self.XB = XB
+        self.mode = mode
+        self.speed = speed if mode == ACCELERATED else 1.
+        self.chunkSize = chunkSize
+        self.baud = baud
+        self.escaped = AP == 0x02
+
+        self.isCapture = isCapture(path)
+
+    def run(self, callback=None):
+        """
+        Replay the whole recording
+
+        :param callback: if given, called with the list returned by each processing step (XBee_msg objects)
+        :return: dictionary of statistics: frames, bytes, chunks, dropped (frames discarded by the parser), seconds,
+                framesPerSec, bytesPerSec
+        """
+        stats = {'frames': 0, 'bytes': 0, 'chunks': 0}
+        dropped = self.XB.RxParser.dropped
+
+        with open(self.path, 'rb') as fileID:
+            try:
+                data = mmap.mmap(fileID.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:
+                # empty file: nothing to replay
+                data = b''
+
+            view = memoryview(data)
+            try:
+                if self.isCapture:
+                    chunks = self._captureChunks(view)
+                else:
+                    chunks = self._streamChunks(view)
+
+                start = time.perf_counter()
+                for delay, chunk in chunks:
+                    if self.mode != MAX:
+                        # wait till the chunk is due
+                        wait = delay / self.speed - (time.perf_counter() - start)
+                        if wait > 0:
+                            time.sleep(wait)
+
+                    msgs = self.XB._processRx(chunk)
+
+                    stats['chunks'] += 1
+                    stats['bytes'] += len(chunk)
+                    stats['frames'] += len(msgs)
+                    if callback is not None:
+                        callback(msgs)
+                elapsed = time.perf_counter() - start
+            finally:
+                # free the map (chunks still referring to it are gone by now)
+                chunks = chunk = None
+                view.release()
+                if isinstance(data, mmap.mmap):
+                    data.close()
+
+        stats['dropped'] = self.XB.RxParser.dropped - dropped
+        stats['seconds'] = elapsed
+        stats['framesPerSec'] = stats['frames'] / elapsed if elapsed > 0 else 0.
+        stats['bytesPerSec'] = stats['bytes'] / elapsed if elapsed > 0 else 0.
+
+        return stats
+
+    def _streamChunks(self, view):
+        """
+        :return: generator of (time [s] since the start of the recording, chunk of the raw stream)
+        """
+        bytesPerSec = self.baud / 10.
+        for i in range(0, len(view), self.chunkSize):
+            yield i / bytesPerSec, view[i:i + self.chunkSize]
+
+    def _captureChunks(self, view):
+        """
+        :return: generator of (time [s] since the first record, incoming frame as sent by the XBee)
+        """
+        first = None
+        for direction, time_ns, frame in iterRecords(view):
+            if direction != IN:
+                continue
+            if first is None:
+                first = time_ns
+            if self.escaped:
+                frame = XB_Codec.escape(frame.tobytes())
+            yield (time_ns - first) / 1e9, frame
+
+
+def captureToStream(capturePath, streamPath, AP=0x02):
+    """
+    Write the incoming frames of a binary capture as a raw stream (as it was read from the serial port)
+
+    :param capturePath: binary capture file (see XB_Capture)
+    :param streamPath: raw stream file to write
+    :param AP: API mode of the stream (frames are escaped if 2)
+    :return: number of frames written
+    """
+    count = 0
+    with open(streamPath, 'wb') as fileID:
+        for direction, time_ns, frame in XB_CaptureReader(capturePath).records():
+            if direction != IN:
+                continue
+            if AP == 0x02:
+                frame = XB_Codec.escape(frame)
+            fileID.write(frame)
+            count += 1
+
+    return count
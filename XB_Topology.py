@@ -0,0 +1,347 @@
+#!/usr/bin/env python
+
+"""
+Live topology of the DigiMesh network, built from the frames received anyway:
+- 0x88 ND replies: nodes in the network;
+- 0x88 FN replies (local) and 0x97 FN replies (remote): links between the replying XBee and its neighbors, with RSSI;
+- 0x8D route information: links along the route of a transmission (hop by hop), and the route itself.
+
+so the network can be queried (neighbors, best path, stale links) without flooding it with new discoveries.
+Attach it to an XBee_module object with: XB.topology = XB_Topology(XB.address)
+"""
+
+import heapq
+import json
+import threading
+import time
+
+from XB_Address import XBeeAddress
+
+
+# authorship info
+__author__      = "Francesco Vallegra"
+__copyright__   = "Copyright 2017, MIT-SUTD"
+__license__     = "MIT"
+
+
+class _Link:
+    """
+    Link between two XBee, with the RSSI [-dBm] averaged over the discoveries (EWMA)
+    """
+    __slots__ = ('rssi', 'lastSeen')
+
+    def __init__(self, rssi, lastSeen):
+        self.rssi = rssi
+        self.lastSeen = lastSeen
+
+
+def _discoveryInfo(data):
+    """
+    :param data: data of an ND/FN reply: MY, SH, SL, NI (null terminated), parent, device type, status, profile,
+            manufacturer, then device type identifier (if NO & 0x01) and RSSI (if NO & 0x04)
+    :return: address (XBeeAddress), NI and RSSI [-dBm] (None if not included) of the node described
+    """
+    end = data.find(0x00, 10)
+    if len(data) < 10 or end < 0:
+        return None, None, None
+
+    rssi = None
+    if len(data) - end - 1 in (9, 13):
+        rssi = data[-1]
+    return XBeeAddress.fromBytes(data[2:10]), bytes(data[10:end]).decode(errors='replace'), rssi
+
+
+# ===============================================================================
+#   Topology
+# ===============================================================================
+class XB_Topology:
+    """
+    Thread-safe graph of the XBee network: nodes (with last time seen and NI) and undirected links (with RSSI and last
+    time seen). Times are given as time.time().
+    """
+
+    def __init__(self, local=None, alpha=.3, goodRSSI=60):
+        """
+        :param local: address of the local XBee (replying to local FN), as XBeeAddress or anything accepted by it
+        :param alpha: weight of the new RSSI measurements in the average (EWMA)
+        :param goodRSSI: RSSI [-dBm] below which a link costs a single hop in bestPath(); each 10dB weaker costs one
+                more hop
+        """
+        self.local = XBeeAddress(local) if local is not None else None
+        self.alpha = alpha
+        self.goodRSSI = goodRSSI
+
+        self._lock = threading.RLock()
+        # last time seen and NI, by address
+        self._nodes = dict()
+        # links, by neighbor, by address (each link in both directions)
+        self._links = dict()
+        # traced routes by (source, destination): next hop, by responder
+        self._routes = dict()
+
+    def __len__(self):
+        return len(self._nodes)
+
+    def __contains__(self, addr):
+        return XBeeAddress(addr) in self._nodes
+
+    # ===============================================================================
+    #   Updates
+    def update(self, XBmsg):
+        """
+        Update the topology with a received message (other messages are ignored)
+
+        :param XBmsg: XBee_msg object
+        :return: True if the message was used
+        """
+        if not XBmsg.valid:
+            return False
+
+        frameType = XBmsg.frame_type
+        if frameType == 0x8D:
+            self.addHop(XBmsg.srcAddr, XBmsg.destAddr, XBmsg.responderAddr, XBmsg.receiverAddr, XBmsg.time_ns / 1e9)
+            return True
+        if frameType not in (0x88, 0x97) or XBmsg.ATcmd not in ('ND', 'FN') or XBmsg.cmdStatus:
+            return False
+
+        addr, NI, rssi = _discoveryInfo(XBmsg.data)
+        if addr is None:
+            # empty reply: end of the discovery
+            return False
+        now = XBmsg.time_ns / 1e9
+
+        if XBmsg.ATcmd == 'ND':
+            self.addNode(addr, NI, now)
+        elif frameType == 0x97:
+            self.addLink(XBmsg.sourceAddr, addr, rssi, now, NI)
+        elif self.local is not None:
+            self.addLink(self.local, addr, rssi, now, NI)
+        else:
+            self.addNode(addr, NI, now)
+        return True
+
+    def addNode(self, addr, NI=None, now=None):
+        if now is None:
+            now = time.time()
+        addr = XBeeAddress(addr)
+
+        with self._lock:
+            node = self._nodes.get(addr)
+            if node is None:
+                self._nodes[addr] = [now, NI]
+                return
+            node[0] = max(node[0], now)
+            if NI is not None:
+                node[1] = NI
+
+    def addLink(self, addrA, addrB, rssi=None, now=None, NI=None):
+        """
+        Add (or refresh) the link between two XBee
+
+        :param rssi: RSSI [-dBm] measured on the link, or None if unknown
+        :param NI: node identifier of addrB (e.g. from a neighbor discovery), if known
+        """
+        if now is None:
+            now = time.time()
+        addrA = XBeeAddress(addrA)
+        addrB = XBeeAddress(addrB)
+        if addrA == addrB:
+            return
+
+        with self._lock:
+            self.addNode(addrA, None, now)
+            self.addNode(addrB, NI, now)
+
+            link = self._links.get(addrA, dict()).get(addrB)
+            if link is None:
+                link = _Link(rssi, now)
+                self._links.setdefault(addrA, dict())[addrB] = link
+                self._links.setdefault(addrB, dict())[addrA] = link
+                return
+
+            link.lastSeen = max(link.lastSeen, now)
+            if rssi is not None:
+                link.rssi = rssi if link.rssi is None else link.rssi + self.alpha * (rssi - link.rssi)
+
+    def addHop(self, source, dest, responder, receiver, now=None):
+        """
+        Add a hop of a traced route (as in route information frames): the responder relayed the transmission from
+        source to dest to the receiver
+        """
+        source, dest, responder, receiver = (XBeeAddress(addr) for addr in (source, dest, responder, receiver))
+
+        with self._lock:
+            self.addLink(responder, receiver, None, now)
+            self._routes.setdefault((source, dest), dict())[responder] = receiver
+
+    def removeNode(self, addr):
+        addr = XBeeAddress(addr)
+        with self._lock:
+            self._nodes.pop(addr, None)
+            for neighbor in self._links.pop(addr, dict()):
+                del self._links[neighbor][addr]
+                if not self._links[neighbor]:
+                    del self._links[neighbor]
+            for key in [key for key in self._routes if addr in key]:
+                del self._routes[key]
+
+    def removeLink(self, addrA, addrB):
+        addrA = XBeeAddress(addrA)
+        addrB = XBeeAddress(addrB)
+        with self._lock:
+            for a, b in ((addrA, addrB), (addrB, addrA)):
+                links = self._links.get(a)
+                if links is not None and links.pop(b, None) is not None and not links:
+                    del self._links[a]
+
+    # ===============================================================================
+    #   Queries
+    @property
+    def nodes(self):
+        """
+        :return: list of the addresses of all the nodes known
+        """
+        with self._lock:
+            return list(self._nodes)
+
+    def lastSeen(self, addr):
+        """
+        :return: last time the node was seen, or None if unknown
+        """
+        node = self._nodes.get(XBeeAddress(addr))
+        return node[0] if node is not None else None
+
+    def NI(self, addr):
+        node = self._nodes.get(XBeeAddress(addr))
+        return node[1] if node is not None else None
+
+    def rssi(self, addrA, addrB):
+        """
+        :return: average RSSI [-dBm] of the link, or None if unknown
+        """
+        link = self._links.get(XBeeAddress(addrA), dict()).get(XBeeAddress(addrB))
+        return link.rssi if link is not None else None
+
+    def neighbors(self, addr, maxAge=None):
+        """
+        :param addr: address of the node
+        :param maxAge: if given, only links seen within maxAge [s]
+        :return: list of (address, RSSI) of the neighbors of the node, strongest first (unknown RSSI last)
+        """
+        now = time.time()
+        with self._lock:
+            links = [(neighbor, link.rssi) for neighbor, link in self._links.get(XBeeAddress(addr), dict()).items()
+                     if maxAge is None or now - link.lastSeen <= maxAge]
+        return sorted(links, key=lambda item: (item[1] is None, item[1]))
+
+    def staleLinks(self, maxAge):
+        """
+        :param maxAge: max time [s] since a link was last seen
+        :return: list of (address, address, time since last seen [s]) of the links not seen for longer than maxAge,
+                oldest first
+        """
+        now = time.time()
+        with self._lock:
+            stale = [(a, b, now - link.lastSeen) for a, links in self._links.items() for b, link in links.items()
+                     if a < b and now - link.lastSeen > maxAge]
+        return sorted(stale, key=lambda item: -item[2])
+
+    def route(self, source, dest):
+        """
+        :return: list of the addresses along the last traced route (see addHop()) from source to dest, or None if not
+                (completely) traced
+        """
+        source = XBeeAddress(source)
+        dest = XBeeAddress(dest)
+        with self._lock:
+            hops = self._routes.get((source, dest))
+            if hops is None:
+                return None
+            path = [source]
+            while path[-1] != dest:
+                nextHop = hops.get(path[-1])
+                if nextHop is None or nextHop in path:
+                    return None
+                path.append(nextHop)
+        return path
+
+    def linkCost(self, rssi):
+        """
+        :return: cost of a link in bestPath(): 1 per hop, plus 1 per 10dB weaker than goodRSSI
+        """
+        if rssi is None:
+            return 1.
+        return 1. + max(0., rssi - self.goodRSSI) / 10.
+
+    def bestPath(self, source, dest, maxAge=None):
+        """
+        Path with the lowest total cost (see linkCost()) between two nodes
+
+        :param maxAge: if given, only use links seen within maxAge [s]
+        :return: list of addresses from source to dest, or None if not connected
+        """
+        source = XBeeAddress(source)
+        dest = XBeeAddress(dest)
+        now = time.time()
+
+        with self._lock:
+            costs = {source: 0.}
+            previous = dict()
+            heap = [(0., 0, source)]
+            count = 1
+            while heap:
+                cost, _, addr = heapq.heappop(heap)
+                if addr == dest:
+                    break
+                if cost > costs[addr]:
+                    continue
+                for neighbor, link in self._links.get(addr, dict()).items():
+                    if maxAge is not None and now - link.lastSeen > maxAge:
+                        continue
+                    newCost = cost + self.linkCost(link.rssi)
+                    if newCost < costs.get(neighbor, float('inf')):
+                        costs[neighbor] = newCost
+                        previous[neighbor] = addr
+                        heapq.heappush(heap, (newCost, count, neighbor))
+                        count += 1
+
+        if dest != source and dest not in previous:
+            return None
+        path = [dest]
+        while path[-1] != source:
+            path.append(previous[path[-1]])
+        return path[::-1]
+
+    # ===============================================================================
+    #   Persistence
+    def save(self, path):
+        """
+        Store the topology into a JSON file
+        """
+        with self._lock:
+            content = {'nodes': dict((str(addr), node) for addr, node in self._nodes.items()),
+                       'links': [[str(a), str(b), link.rssi, link.lastSeen]
+                                 for a, links in self._links.items() for b, link in links.items() if a < b],
+                       'routes': [[str(source), str(dest), [[str(a), str(b)] for a, b in hops.items()]]
+                                  for (source, dest), hops in self._routes.items()]}
+
+        with open(path, 'w') as f:
+            json.dump(content, f)
+
+    @classmethod
+    def load(cls, path, local=None, alpha=.3, goodRSSI=60):
+        """
+        :return: XB_Topology object as stored by save()
+        """
+        with open(path) as f:
+            content = json.load(f)
+
+        topology = cls(local, alpha, goodRSSI)
+        for addr, (lastSeen, NI) in content['nodes'].items():
+            topology.addNode(addr, NI, lastSeen)
+        for a, b, rssi, lastSeen in content['links']:
+            topology.addLink(a, b, rssi, lastSeen)
+        for source, dest, hops in content['routes']:
+            topology._routes[(XBeeAddress(source), XBeeAddress(dest))] = dict((XBeeAddress(a), XBeeAddress(b))
+                                                                              for a, b in hops)
+        return topology
@@ -0,0 +1,315 @@
+#!/usr/bin/env python
+
+"""
+Transport layer over RF transmits (0x10/0x90): payloads larger than the max RF payload of the XBee are split into
+numbered fragments and reassembled by the receiver.
+
+Each fragment carries a 12 bytes header:
+- 0-1   : magic ['\xFAT']
+- 2     : version of the header [1]
+- 3     : message number (per destination, 0..255)
+- 4-5   : fragment index (big-endian)
+- 6-7   : number of fragments (big-endian)
+- 8-11  : CRC-32 of the whole payload (big-endian)
+
+so both ends must use XB_Transport (small payloads are sent as a single fragment). The CRC tells apart messages with
+the same number (numbers wrap around within the timeout), and is checked once the message is reassembled, so RF packets
+which only look like fragments are not delivered as messages.
+"""
+
+import struct
+import threading
+import time
+import zlib
+
+
+# authorship info
+__author__      = "Francesco Vallegra"
+__copyright__   = "Copyright 2017, MIT-SUTD"
+__license__     = "MIT"
+
+
+MAGIC = b'\xFAT'
+VERSION = 1
+_HEADER = struct.Struct('>2sBBHHI')
+
+# max RF payload if it cannot be queried (NP of DigiMesh 2.4)
+DEFAULT_MAX_PAYLOAD = 0x49
+
+
+class _Partial:
+    """
+    Fragments received so far of a message
+    """
+    __slots__ = ('fragments', 'missing', 'size', 'deadline', 'crc')
+
+    def __init__(self, count, deadline, crc):
+        self.fragments = [None] * count
+        self.missing = count
+        self.size = 0
+        self.deadline = deadline
+        self.crc = crc
+
+
+# ===============================================================================
+#   Transport
+# ===============================================================================
+class XB_Transport:
+    """
+    Send and receive payloads of any size (up to 65535 fragments) through an XBee_module.
+
+    Received messages are either passed to the callback given (called by the XBee receiver thread, as
+    callback(source, payload) with source the XBeeAddress of the sender), or can be reassembled by feeding the received
+    XB_RF_IN objects to feed().
+    """
+
+    def __init__(self, XB, callback=None, maxPayload=None, timeout=10., maxBytes=1 << 20, maxBytesPerSource=1 << 18):
+        """
+        :param XB: XBee_module object
+        :param callback: function called with (source, payload) for each message reassembled. If given, the transport
+                registers itself as callback of the received RF packets (0x90) of XB
+        :param maxPayload: max RF payload [bytes] of the XBee. If None, queried from the local XBee (NP), which requires
+                replies to be read (receiver thread running, or readSerial() called meanwhile)
+        :param timeout: time [s] to wait for the missing fragments of a message, since its first fragment received
+        :param maxBytes: max memory [bytes] for the messages being reassembled (oldest ones are dropped)
+        :param maxBytesPerSource: same as maxBytes, for the messages from each source
+        """
+        self.XB = XB
+        self.callback = callback
+        self.timeout = timeout
+        self.maxBytes = maxBytes
+        self.maxBytesPerSource = maxBytesPerSource
+
+        if maxPayload is None:
+            maxPayload = self.queryMaxPayload()
+        self.maxPayload = maxPayload
+
+        # statistics
+        self.stats = {'sent': 0,
+                      'fragmentsSent': 0,
+                      'received': 0,
+                      'fragmentsReceived': 0,
+                      'duplicates': 0,
+                      'expired': 0,
+                      'dropped': 0,
+                      'corrupted': 0}
+
+        self._lock = threading.Lock()
+        # message number of the next message, by destination
+        self._msgNumbers = dict()
+        # messages being reassembled (in order of first fragment received), by (source, message number)
+        self._partials = dict()
+        # CRC and deadline of the messages completed, by (source, message number), for late duplicates
+        self._completed = dict()
+        self._bytes = 0
+        self._bytesBySource = dict()
+
+        if callback is not None:
+            XB.addCallback(self._onRx, 0x90)
+
+    def close(self):
+        if self.callback is not None:
+            self.XB.removeCallback(self._onRx, 0x90)
+
+    def queryMaxPayload(self, timeout=2.):
+        """
+        :return: max RF payload [bytes] of the local XBee (NP), or DEFAULT_MAX_PAYLOAD if it does not reply in time
+        """
+        if self.XB.serial_port is None:
+            return DEFAULT_MAX_PAYLOAD
+
+        from XBee_API import XBee_module
+        XBmsg = XBee_module.getLocalRegistry(self.XB, 'NP', timeout=timeout)
+        reply = XBee_module._waitReply(self.XB, XBmsg, timeout)
+        if reply is None or reply.reg_value is None:
+            print('ERR: max RF payload (NP) not received, using {0} bytes'.format(DEFAULT_MAX_PAYLOAD))
+            return DEFAULT_MAX_PAYLOAD
+
+        return int(reply.reg_value, 16)
+
+    # ===============================================================================
+    #   Sending
+    def send(self, destH, destL, payload, timeout=None, priority=None):
+        """
+        Send a payload of any size to the destination, as consecutive transmits sent without waiting for their transmit
+        status. For large payloads start the scheduler (XBee_module.startScheduler()), so the fragments do not overflow
+        the XBee transmit buffer.
+
+        :param destH: high address of the destination XBee, or its XBeeAddress (then destL is None)
+        :param destL: low address of the destination XBee
+        :param payload: bytes or bytearray (str is encoded as utf-8)
+        :param timeout: max time [s] to wait for the transmit status of each fragment
+        :param priority: priority of the fragments in the scheduler queues
+        :return: list of the XBee_msg objects of the fragments (transmit status in XBmsg.reply), or None if not sent
+        """
+        if type(payload) == str:
+            payload = payload.encode()
+
+        dest = self.XB._toAddress(destH, destL)
+        if dest is None:
+            return None
+
+        size = self.maxPayload - _HEADER.size
+        count = max(1, -(-len(payload) // size))
+        if count > 0xFFFF:
+            print('ERR: payload too large ({0} bytes) to be fragmented'.format(len(payload)))
+            return None
+
+        with self._lock:
+            number = self._msgNumbers.get(dest, 0)
+            self._msgNumbers[dest] = (number + 1) & 0xFF
+
+        crc = zlib.crc32(payload)
+        view = memoryview(payload)
+        msgs = list()
+        for index in range(count):
+            fragment = bytearray(_HEADER.pack(MAGIC, VERSION, number, index, count, crc))
+            fragment += view[index * size:(index + 1) * size]
+            msgs.append(self.XB.sendDataToRemote(dest, None, fragment, timeout=timeout, priority=priority))
+
+        self.stats['sent'] += 1
+        self.stats['fragmentsSent'] += count
+        return msgs
+
+    # ===============================================================================
+    #   Receiving
+    def _onRx(self, XBmsg):
+        consumed, result = self._feed(XBmsg)
+        if not consumed:
+            # not for the transport: as if no callback was registered
+            self.XB._queueMsg(XBmsg)
+        elif result is not None:
+            self.callback(*result)
+
+    @staticmethod
+    def isFragment(XBmsg):
+        """
+        :return: True if the RF packet has the header of a fragment (see the module description)
+        """
+        data = XBmsg.data
+        if len(data) < _HEADER.size or data[:2] != MAGIC:
+            return False
+        _, version, _, index, count, _ = _HEADER.unpack_from(data)
+        return version == VERSION and index < count
+
+    def feed(self, XBmsg):
+        """
+        Add a received fragment to the message it belongs to
+
+        :param XBmsg: XB_RF_IN object
+        :return: (source, payload) once all the fragments of a message are received, None otherwise
+        """
+        return self._feed(XBmsg)[1]
+
+    def _feed(self, XBmsg):
+        """
+        :return: True if the RF packet was taken as a fragment (False if not a fragment, or a single fragment failing
+                the CRC), and (source, payload) or None as feed()
+        """
+        if not XBmsg.valid or not self.isFragment(XBmsg):
+            return False, None
+
+        data = XBmsg.data
+        _, _, number, index, count, crc = _HEADER.unpack_from(data)
+        fragment = bytes(data[_HEADER.size:])
+        source = XBmsg.sourceAddr
+
+        if count == 1:
+            if zlib.crc32(fragment) != crc:
+                return False, None
+            with self._lock:
+                self.stats['fragmentsReceived'] += 1
+                self.stats['received'] += 1
+            return True, (source, fragment)
+
+        now = time.time()
+        with self._lock:
+            self._expire(now)
+            self.stats['fragmentsReceived'] += 1
+
+            key = (source, number)
+            if self._completed.get(key, (None,))[0] == crc:
+                # fragment of a message already delivered
+                self.stats['duplicates'] += 1
+                return True, None
+
+            partial = self._partials.get(key)
+            if partial is None or len(partial.fragments) != count or partial.crc != crc:
+                if partial is not None:
+                    # message number reused for another message: the previous one is incomplete
+                    self._drop(key)
+                    self.stats['dropped'] += 1
+                partial = _Partial(count, now + self.timeout, crc)
+                self._partials[key] = partial
+            elif partial.fragments[index] is not None:
+                self.stats['duplicates'] += 1
+                return True, None
+
+            partial.fragments[index] = fragment
+            partial.missing -= 1
+            partial.size += len(fragment)
+            self._bytes += len(fragment)
+            self._bytesBySource[source] = self._bytesBySource.get(source, 0) + len(fragment)
+
+            if not partial.missing:
+                self._drop(key)
+                self._completed.pop(key, None)
+                self._completed[key] = (crc, partial.deadline)
+                payload = b''.join(partial.fragments)
+                if zlib.crc32(payload) != crc:
+                    self.stats['corrupted'] += 1
+                    return True, None
+                self.stats['received'] += 1
+                return True, (source, payload)
+
+            self._enforceCaps(source, key)
+        return True, None
+
+    def _drop(self, key):
+        # with self._lock held
+        partial = self._partials.pop(key)
+        self._bytes -= partial.size
+        source = key[0]
+        left = self._bytesBySource[source] - partial.size
+        if left:
+            self._bytesBySource[source] = left
+        else:
+            del self._bytesBySource[source]
+
+    def _expire(self, now):
+        # with self._lock held: messages are in order of first fragment received, so the oldest come first
+        while self._completed:
+            key = next(iter(self._completed))
+            if self._completed[key][1] > now:
+                break
+            del self._completed[key]
+
+        while self._partials:
+            key = next(iter(self._partials))
+            if self._partials[key].deadline > now:
+                return
+            self._drop(key)
+            self.stats['expired'] += 1
+
+    def _enforceCaps(self, source, current):
+        # with self._lock held: drop the oldest messages of the source, then the oldest ones overall
+        while self._bytesBySource.get(source, 0) > self.maxBytesPerSource:
+            key = next(key for key in self._partials if key[0] == source)
+            self._drop(key)
+            self.stats['dropped'] += 1
+            if key == current:
+                return
+
+        while self._bytes > self.maxBytes:
+            key = next(iter(self._partials))
+            self._drop(key)
+            self.stats['dropped'] += 1
+            if key == current:
+                return
+
+    @property
+    def pending(self):
+        """
+        :return: number of messages being reassembled
+        """
+        return len(self._partials)
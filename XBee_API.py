@@ -1,13 +1,24 @@
 #!/usr/bin/env python
 
-from serial import Serial
+from serial import Serial, SerialException
+from collections import deque
+import concurrent.futures
+import threading
 import time
+import json
 import sys
 from datetime import datetime
 import os
 
 # import XBee_msg classes and method for finding a SBee serial device
 from XB_Finder import serial_ports
+import XB_Finder
+from XB_Parser import XB_FrameParser
+from XB_Logger import XB_RawLogger
+from XB_Capture import XB_CaptureWriter, IN, OUT
+from XB_Requests import XB_Requests
+from XB_Scheduler import XB_Scheduler
+from XB_Address import XBeeAddress, BROADCAST
 from XBee_msg import *
 
 
@@ -25,6 +36,12 @@ APIop = {0x88: ['AT Command Response', XB_locAT_IN, 1],     # name, reference to
          0x91: ['Explicit Rx Indicator (AO=1)', XB_RFexpl_IN, 1],
          0x97: ['Remote Command Response', XB_remAT_IN, 1]}
 
+# outgoing frames, as rebuilt from a binary capture
+APIopOUT = {0x08: ['AT Command', XB_locAT_OUT, 0],            # name, reference to function, print (y/n)
+            0x10: ['Transmit Request', XB_RF_OUT, 0],
+            0x11: ['Explicit Addressing Command Frame', XB_RFexpl_OUT, 0],
+            0x17: ['Remote AT Command Request', XB_remAT_OUT, 0]}
+
 
 # ===============================================================================
 # ===============================================================================
@@ -33,18 +50,25 @@ APIop = {0x88: ['AT Command Response', XB_locAT_IN, 1],     # name, reference to
 # ===============================================================================
 class XBee_module:
 
-    def __init__(self, port=None, baud=9600, ID=0x7FFF, AP=0x02, CE=0x00, NO=0x04):
+    def __init__(self, port=None, baud=9600, ID=0x7FFF, AP=0x02, CE=0x00, NO=0x04, rawLogFormat='text',
+                 fastStartup=False, configCache=None, portCache=None):
         """
         XBee initialization
+
+        :param rawLogFormat: 'text' to log frames as readable lines, 'binary' to store them in a compact capture
+                (see XB_Capture) which can be decoded back into XBee_msg objects
+        :param fastStartup: if True, read the configuration of the XBee in API mode and only write (and save to flash)
+                the registries which differ, instead of programming all of them in command mode. Falls back to command
+                mode if the XBee does not reply in API mode
+        :param configCache: path of a JSON file with the last known configuration of each XBee (by SH/SL): with
+                fastStartup, if the XBee is known to be already configured as requested, only SH/SL are read
+        :param portCache: path of the JSON file with the last known good baud rate of each XBee (see XB_Finder, e.g.
+                XB_Finder.DEFAULT_CACHE), tried first when looking for the baud rate, and updated once initialized. If
+                None, no file is read nor written
         """
-        # network ID
-        self.ID = '%x' % ID
-        # API mode enabled/disabled [0:no API; 1:API no escape seq; 2:API with escape seq]
-        self.AP = '%x' % AP
-        # Routing/Message mode [0: Router; 1:NA; 2:EndNode]
-        self.CE = '%x' % CE
-        # additional info
-        self.NO = '%x' % NO
+        # set internal state (parameters, buffers, parser)
+        self._initState(ID=ID, AP=AP, CE=CE, NO=NO)
+        self.portCache = portCache
 
         # if no port provided, try to find it between the ones available, depending on the OS being used
         self.port = port
@@ -53,43 +77,14 @@ class XBee_module:
         # baud rate to use.. may be not the one preset in the XBee
         self.baud = baud
 
-        # list where to save received transmits (as objects of class XBee_msg or children)
-        self.RxMsg = list()
-
-        # input buffer including all bytes from serial
-        self.RxBuff = bytearray()
-
-        # XBee configuration
-        self.XBconf = {'ID': self.ID,   # Network ID (between 0x0000 and 0x7FFF)
-                       'AP': self.AP,   # API mode
-                       'CE': self.CE,   # Routing/Message mode
-                       'NO': self.NO,   # include additional info when network and neighbor discovery
-                       'DL': 'FFFF',    # destination Address High to broadcast
-                       'DH': '0'}       # destination Address Low to broadcast
-
-        # enquire main parameters from local XBee (initial value is the number of bytes to use)
-        self.params = {'ID': 4,        # Network ID (between 0x0000 and 0x7FFF)
-                       'CE': 2,        # Node type
-                       'BH': 2,        # Broadcast radius
-                       'SH': 8,        # Local Address High (high 32bit RF module's address)
-                       'SL': 8,        # Local Address Low (low 32bit RF module's address)
-                       'DH': 8,        # Destination Address High
-                       'DL': 8,        # Destination Address Low
-                       'AP': 2}        # API mode [0:no API; 1:API no escape seq; 2:API with escape seq]
-
-        # diagnostic parameters
-        self.diagn = {'GD': [],         # number of good frames
-                      'EA': [],         # number of timeouts
-                      'TR': [],         # number of transmission errors
-                      'DB': []}         # RSSI (signal strength) of last received packet [-dBm]
-
         # set serial port and baud
         self.serial_port = Serial(port=self.port, baudrate=self.baud)
 
         # make sure no information is in the serial buffer
         self._flush()
-        time.sleep(0.2)
-        self._flush()
+        if not fastStartup:
+            time.sleep(0.2)
+            self._flush()
 
         # start logging RAW data from/to XBee
         path = "./Output/"
@@ -98,6 +93,16 @@ class XBee_module:
         self.rawLogFileIDstr = path + "XBeeRAW_log" + str(datetime.datetime.now()) + ".txt"
         print("Storing RAW Xbee log to: " + self.rawLogFileIDstr)
 
+        # lines are written by a background thread, so to never block serial communication
+        self.rawLogger = XB_RawLogger(self.rawLogFileIDstr)
+
+        # frames can be captured in binary form instead (other information is still logged as text)
+        self.capture = None
+        if rawLogFormat == 'binary':
+            self.captureFileIDstr = self.rawLogFileIDstr[:-len('.txt')] + '.xbc'
+            print("Storing binary Xbee capture to: " + self.captureFileIDstr)
+            self.capture = XB_CaptureWriter(self.captureFileIDstr)
+
         logStr = '\n\nXBee Communicating via ' + self.port
         print(logStr)
         self.logRAWtofile(logStr)
@@ -119,38 +124,293 @@ class XBee_module:
         print(logStr)
         self.logRAWtofile(logStr)
 
-        # set parameters' values from self.XBconf
-        ATregs = list()
-        ATvals = list()
-        for reg in self.XBconf:
-            ATregs.append(reg)
-            ATvals.append(self.XBconf[reg])
-        self.cmd_mode_set_registries(ATregs, ATvals, first_init=True)
+        if not (fastStartup and self._fastStartup(AP, configCache)):
+            # set parameters' values from self.XBconf
+            ATregs = list()
+            ATvals = list()
+            for reg in self.XBconf:
+                ATregs.append(reg)
+                ATvals.append(self.XBconf[reg])
+            self.cmd_mode_set_registries(ATregs, ATvals, first_init=True)
 
-        logStr = '\nReading Settings from XBee..'
+            logStr = '\nReading Settings from XBee..'
+            print(logStr)
+            self.logRAWtofile(logStr)
+
+            # get parameters' values from XBee memory: in API mode all at once, in command mode one by one (also for
+            # the ones not received in API mode)
+            sizes = dict(self.params)
+            values = dict()
+            if AP != 0:
+                self.params['AP'] = '%02x' % AP
+                verbose, self.verbose = self.verbose, False
+                values = self.getLocalRegistries(list(sizes))
+                self.verbose = verbose
+
+            self._setParams(sizes, values)
+
+        if configCache is not None:
+            self._saveConfigCache(configCache)
+
+        if portCache is not None:
+            # next time, look for the XBee at this baud rate first (see check_serial_baud_rate())
+            XB_Finder.remember_port(self.port, self.baud, portCache, AP)
+
+        logStr = 'XBee initialization complete!\n'
         print(logStr)
         self.logRAWtofile(logStr)
 
-        # get parameters' values from XBee memory
-        for param in self.params:
-            reg_value = self.cmd_mode_read_registry(param)
 
-            if reg_value is not None:
+    def _setParams(self, sizes, values):
+        """
+        Set self.params to the values read from the XBee (in command mode if not given)
+
+        :param sizes: number of hex digits of each parameter
+        :param values: values read, as hex strings (missing or None if not read)
+        """
+        for param in sizes:
+            reg_value = values.get(param)
+            if reg_value is None:
+                reg_value = self.cmd_mode_read_registry(param)
+                if reg_value is None:
+                    continue
                 reg_value = '%s' % reg_value.decode()
-                while len(reg_value) < self.params[param]:
-                    reg_value = '0' + reg_value
-                logStr = "\tRegistry '{}': '0x{}'".format(param, reg_value)
+
+            while len(reg_value) < sizes[param]:
+                reg_value = '0' + reg_value
+            logStr = "\tRegistry '{}': '0x{}'".format(param, reg_value)
+            print(logStr)
+            self.logRAWtofile(logStr)
+
+            # set params[AT] to the received value
+            self.params[param] = reg_value
+        print('')
+
+    def _fastStartup(self, AP, configCache=None):
+        """
+        Configure the XBee in API mode, writing (and saving to flash) only the registries which differ from self.XBconf
+
+        :param AP: API mode requested
+        :param configCache: path of the JSON file with the last known configurations (see _saveConfigCache()), or None
+        :return: True if done, False if the XBee did not reply in API mode (nothing changed then)
+        """
+        if AP == 0:
+            # parameters can only be read in command mode anyway
+            return False
+
+        # guard time as set when programming in command mode
+        config = dict(self.XBconf, GT='A')
+        sizes = dict(self.params)
+        self.params['AP'] = '%02x' % AP
+
+        verbose, self.verbose = self.verbose, False
+        try:
+            values = None
+            if configCache is not None:
+                # XBee known to be already configured as requested: parameters are the ones last read
+                serial = self.getLocalRegistries(['SH', 'SL'], timeout=.5)
+                if serial['SH'] is not None and serial['SL'] is not None:
+                    known = self._loadConfigCache(configCache).get(serial['SH'] + serial['SL'])
+                    if known is not None and known.get('config') == self._normConfig(config):
+                        values = dict(known['params'])
+
+            changed = list()
+            if values is None:
+                values = self.getLocalRegistries(sorted(set(sizes) | set(config)), timeout=.5)
+                if any(values[reg] is None for reg in config):
+                    self.params = sizes
+                    return False
+
+                changed = [reg for reg in config if int(values[reg], 16) != int(config[reg], 16)]
+            if changed:
+                logStr = 'Writing registries: {}'.format(', '.join(changed))
                 print(logStr)
                 self.logRAWtofile(logStr)
 
-                # set params[AT] to the received value
-                self.params[param] = reg_value
-        print('')
+                msgs = list()
+                for reg in changed:
+                    value = int(config[reg], 16)
+                    value = bytearray(value.to_bytes(max(1, (value.bit_length() + 7) // 8), 'big'))
+                    msgs.append(self._setgetLocalRegistry(reg, value))
+                # save to flash, then apply
+                msgs.append(self._setgetLocalRegistry('WR'))
+                msgs.append(self._setgetLocalRegistry('AC'))
+                for XBmsg in msgs:
+                    self._waitReply(XBmsg, 1.)
+                values.update((reg, config[reg]) for reg in changed)
+            else:
+                logStr = 'XBee already configured'
+                print(logStr)
+                self.logRAWtofile(logStr)
+        finally:
+            self.verbose = verbose
 
-        logStr = 'XBee initialization complete!\n'
+        logStr = '\nReading Settings from XBee..'
         print(logStr)
         self.logRAWtofile(logStr)
 
+        self.params = dict(sizes)
+        self._setParams(sizes, values)
+        return True
+
+    def _waitReply(self, XBmsg, timeout):
+        """
+        :return: reply to the request, or None if not received in time (the serial is read if the receiver thread is not
+                running)
+        """
+        if XBmsg.reply is None:
+            return None
+
+        deadline = time.monotonic() + timeout
+        while self._receiver is None and not XBmsg.reply.done() and time.monotonic() < deadline:
+            if not self.readSerial():
+                time.sleep(.001)
+
+        try:
+            return XBmsg.reply.result(max(0., deadline - time.monotonic()))
+        except concurrent.futures.TimeoutError:
+            return None
+
+    @staticmethod
+    def _normConfig(config):
+        return dict((reg, '%x' % int(value, 16)) for reg, value in config.items())
+
+    @staticmethod
+    def _loadConfigCache(path):
+        try:
+            with open(path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return dict()
+
+    def _saveConfigCache(self, path):
+        """
+        Store the configuration and the parameters of the XBee into the JSON file, by SH/SL
+        """
+        if not isinstance(self.params['SH'], str) or not isinstance(self.params['SL'], str):
+            # parameters not read
+            return
+
+        cache = self._loadConfigCache(path)
+        cache[self.params['SH'] + self.params['SL']] = {'config': self._normConfig(dict(self.XBconf, GT='A')),
+                                                        'params': self.params}
+        try:
+            with open(path, 'w') as f:
+                json.dump(cache, f, indent=2, sort_keys=True)
+        except OSError as e:
+            print('ERR: cannot write configuration cache {0}: {1}'.format(path, e))
+
+    def _initState(self, ID=0x7FFF, AP=0x02, CE=0x00, NO=0x04):
+        """
+        Set the configuration, the parameters and the receiving buffers, independently of the serial port
+        """
+        # network ID
+        self.ID = '%x' % ID
+        # API mode enabled/disabled [0:no API; 1:API no escape seq; 2:API with escape seq]
+        self.AP = '%x' % AP
+        # Routing/Message mode [0: Router; 1:NA; 2:EndNode]
+        self.CE = '%x' % CE
+        # additional info
+        self.NO = '%x' % NO
+
+        # list where to save received transmits (as objects of class XBee_msg or children)
+        self.RxMsg = list()
+        # received messages matched to requests waiting for reply (see self.requests)
+        self.RxReplies = list()
+
+        # input buffer including all bytes from serial
+        self.RxBuff = bytearray()
+
+        # incremental parser holding partial API frames between reads
+        self.RxParser = XB_FrameParser(escaped=(AP == 0x02))
+
+        # reusable buffer for bulk reads from serial (grown if ever needed)
+        self._RxChunk = bytearray(4096)
+        self._RxView = memoryview(self._RxChunk)
+
+        # XBee configuration
+        self.XBconf = {'ID': self.ID,   # Network ID (between 0x0000 and 0x7FFF)
+                       'AP': self.AP,   # API mode
+                       'CE': self.CE,   # Routing/Message mode
+                       'NO': self.NO,   # include additional info when network and neighbor discovery
+                       'DL': 'FFFF',    # destination Address High to broadcast
+                       'DH': '0'}       # destination Address Low to broadcast
+
+        # enquire main parameters from local XBee (initial value is the number of bytes to use)
+        self.params = {'ID': 4,        # Network ID (between 0x0000 and 0x7FFF)
+                       'CE': 2,        # Node type
+                       'BH': 2,        # Broadcast radius
+                       'SH': 8,        # Local Address High (high 32bit RF module's address)
+                       'SL': 8,        # Local Address Low (low 32bit RF module's address)
+                       'DH': 8,        # Destination Address High
+                       'DL': 8,        # Destination Address Low
+                       'AP': 2}        # API mode [0:no API; 1:API no escape seq; 2:API with escape seq]
+
+        # diagnostic parameters
+        self.diagn = {'GD': [],         # number of good frames
+                      'EA': [],         # number of timeouts
+                      'TR': [],         # number of transmission errors
+                      'DB': []}         # RSSI (signal strength) of last received packet [-dBm]
+
+        # print received frames (as per APIop flags)
+        self.verbose = True
+
+        # RAW log and binary capture (not used until opened)
+        self.rawLogger = None
+        self.capture = None
+
+        # requests waiting for reply, by frame ID
+        self.requests = XB_Requests()
+        # transmit scheduler (frames are written immediately unless started: see startScheduler())
+        self.scheduler = None
+        # network topology updated with the received messages, if set (see XB_Topology)
+        self.topology = None
+        # topological broadcast, if set (see XB_Swarm)
+        self.swarm = None
+        # duplicate suppression of the received RF packets, if set (see XB_Dedup)
+        self.dedup = None
+
+        # receiver thread: callbacks by (frame type, source address), None meaning any
+        self._callbacks = dict()
+        self._bySource = False
+        # received messages not handled by any callback
+        self.RxInbox = deque(maxlen=10000)
+        self._RxReady = threading.Condition()
+        self._receiver = None
+        self._receiving = threading.Event()
+
+    @classmethod
+    def offline(cls, params=None, AP=0x02, verbose=False):
+        """
+        XBee module not connected to any serial port, e.g. to feed it with recorded data (see XB_Replay).
+        Frames are neither printed (unless verbose) nor logged.
+
+        :param params: values of the local XBee parameters (e.g. {'SH': '0013a200', 'SL': '40e44b94'})
+        :param AP: API mode of the data to be processed
+        :param verbose: if True, print received frames as per APIop flags
+        :return: XBee_module object
+        """
+        XB = cls.__new__(cls)
+        XB._initState(AP=AP)
+        XB.verbose = verbose
+
+        XB.port = None
+        XB.baud = None
+        XB.serial_port = None
+
+        XB.params = {'ID': '7fff',
+                     'CE': '00',
+                     'BH': '00',
+                     'SH': '00000000',
+                     'SL': '00000000',
+                     'DH': '00000000',
+                     'DL': '0000ffff',
+                     'AP': '%02x' % AP}
+        if params is not None:
+            XB.params.update(params)
+
+        return XB
+
 
 # ===============================================================================
 #   define methods for Command Mode operations
@@ -187,8 +447,7 @@ class XBee_module:
                     print("ERR: OK not received!")
                     break
 
-                while self.serial_port.inWaiting():
-                    input_chars.extend(self.serial_port.read())
+                input_chars.extend(self._readAvailable())
                 if len(input_chars) >= 3:
                     # note that other messages could have been received while starting the command mode, but nothing
                     # can be received after the command mode is set, which is confirmed by 'OK\r' reply from XBee
@@ -283,8 +542,7 @@ class XBee_module:
                 print("ERR: OK not received!")
                 return None
 
-            while self.serial_port.inWaiting():
-                input_chars.extend(self.serial_port.read())
+            input_chars.extend(self._readAvailable())
             if len(input_chars) >= 3:
                 # here note that other messages could have been received while starting the command mode, but nothing
                 # can be received after the command mode is set, which is confirmed by 'OK\r' reply from XBee
@@ -298,8 +556,7 @@ class XBee_module:
         time_req = time.time()
         input_chars = bytearray([])
         while time.time() - time_req < 1.:
-            while self.serial_port.inWaiting():
-                input_chars.extend(self.serial_port.read())
+            input_chars.extend(self._readAvailable())
 
             if len(input_chars) >= 3:
                 # the exit command mode will reply with 'OK\r', so anything before that is the reply
@@ -322,11 +579,15 @@ class XBee_module:
             BD: 0x0006 -> 57600 bps
             BD: 0x0007 -> 115200 bps
 
-        Note that it is unlikely that slower-than-9600 bps is used, so first checking most probably ones
+        Note that it is unlikely that slower-than-9600 bps is used, so first checking most probably ones, after the last
+        known good baud rate of the XBee (if portCache is given, see XB_Finder)
 
         :return:
         """
-        bauds = [9600, 57600, 115200, 38400, 19200, 4800, 2400, 1200]
+        known = None
+        if self.portCache is not None:
+            known = XB_Finder.known_baud(self.port, self.portCache)
+        bauds = XB_Finder.baud_order(known)
         counter = 0
 
         logStr = "WARN: Looking for preset baudrate for the XBee.."
@@ -358,8 +619,7 @@ class XBee_module:
                     # print("ERR: OK not received!")
                     break
 
-                while self.serial_port.inWaiting():
-                    input_chars.extend(self.serial_port.read())
+                input_chars.extend(self._readAvailable())
                 if len(input_chars) >= 3:
                     # note that other messages could have been received while starting the command mode, but nothing
                     # can be received after the command mode is set, which is confirmed by 'OK\r' reply from XBee
@@ -382,112 +642,183 @@ class XBee_module:
 # ===============================================================================
 #   define methods for Frame-Specific Data Construction
 # ===============================================================================
-    def setLocalRegistry(self, command, value, frame_ID=0x52):
-        return self._setgetLocalRegistry(command, value, frame_ID=frame_ID)
+    def setLocalRegistry(self, command, value, frame_ID=None, timeout=None):
+        return self._setgetLocalRegistry(command, value, frame_ID=frame_ID, timeout=timeout)
 
-    def getLocalRegistry(self, command, frame_ID=0x52):
-        return self._setgetLocalRegistry(command, frame_ID=frame_ID)
+    def getLocalRegistry(self, command, frame_ID=None, timeout=None):
+        return self._setgetLocalRegistry(command, frame_ID=frame_ID, timeout=timeout)
 
-    def _setgetLocalRegistry(self, command, value=None, frame_ID=0x52):
+    def _setgetLocalRegistry(self, command, value=None, frame_ID=None, timeout=None):
         """
         Query or set module parameters on the local device.
 
         :param command: local AT command as 2 ASCII string
         :param value: if provided, value to assign.
                 If not provided, meaning a request
-        :param frame_ID: default value 0x52. Change it if you know what you are doing..
-        :return: XBee_msg object containing the created message.
+        :param frame_ID: if not provided, a free one is allocated (0 for no reply)
+        :param timeout: max time [s] to wait for the reply (see XB_Requests)
+        :return: XBee_msg object containing the created message, with the future of the reply in XBmsg.reply.
                 Can be printed using print(_setLocalRegistry(..))
         """
         # create new XB_locAT_OUT object and write to serial
-        XBmsg = XB_locAT_OUT(self.params, command, regVal=value, frame_ID=frame_ID)
-        if XBmsg.isValid():
-            self._write(XBmsg.genFrame())
+        return self._request(lambda fid: XB_locAT_OUT(self.params, command, regVal=value, frame_ID=fid),
+                             frame_ID, timeout, multi=(value is None and command in ('ND', 'FN')))
 
-            # log RAW msg
-            self.logRAWtofile(XBmsg)
+    def getLocalRegistries(self, registries, timeout=1.):
+        """
+        Query several registries of the local XBee at once (API mode only): the AT commands are all written without
+        waiting for the replies, each with its own frame ID, and the replies are collected as they arrive.
+        If the receiver thread is not running, the serial is read meanwhile.
 
-        return XBmsg
+        :param registries: list of AT commands (as 2 ASCII string)
+        :param timeout: max time [s] to wait for all the replies
+        :return: dictionary of the registry values, as hex strings (lower case), or None if not received or failed
+        """
+        msgs = [(command, self._setgetLocalRegistry(command, timeout=timeout)) for command in registries]
+
+        deadline = time.monotonic() + timeout
+        values = dict()
+        for command, XBmsg in msgs:
+            values[command] = None
+            reply = self._waitReply(XBmsg, max(0., deadline - time.monotonic()))
+            if reply is not None and reply.cmdStatus == 0 and reply.reg_value is not None:
+                values[command] = reply.reg_value.lower()
+
+        return values
 
-    def setRemoteRegistry(self, destH, destL, command, value, frame_ID=0x01):
-        return self._setgetRemoteRegistry(destH, destL, command, value, frame_ID=frame_ID)
+    def setRemoteRegistry(self, destH, destL, command, value, frame_ID=None, timeout=None):
+        return self._setgetRemoteRegistry(destH, destL, command, value, frame_ID=frame_ID, timeout=timeout)
 
-    def getRemoteRegistry(self, destH, destL, command, frame_ID=0x01):
-        return self._setgetRemoteRegistry(destH, destL, command, frame_ID=frame_ID)
+    def getRemoteRegistry(self, destH, destL, command, frame_ID=None, timeout=None):
+        return self._setgetRemoteRegistry(destH, destL, command, frame_ID=frame_ID, timeout=timeout)
 
-    def _setgetRemoteRegistry(self, destH, destL, command, value=None, frame_ID=0x01):
+    def _setgetRemoteRegistry(self, destH, destL, command, value=None, frame_ID=None, timeout=None):
         """
         Query or set module parameters on a remote device.
 
+        :param destH: high address of the remote XBee, or its XBeeAddress (then destL is None)
+        :param destL: low address of the remote XBee
         :param command: remote AT command as 2 ASCII string
         :param value: if provided, value to assign.
                 If not provided, meaning a request
-        :param frame_ID: default value 0x52. Change it if you know what you are doing..
-        :return: XBee_msg object containing the created message.
+        :param frame_ID: if not provided, a free one is allocated (0 for no reply)
+        :param timeout: max time [s] to wait for the reply (see XB_Requests)
+        :return: XBee_msg object containing the created message, with the future of the reply in XBmsg.reply.
                 Can be printed using print(setRemoteRegistry(..))
         """
-        self.params['DH'] = destH
-        self.params['DL'] = destL
-
-        # create new XB_remAT_OUT object and write to serial
-        XBmsg = XB_remAT_OUT(self.params, command, regVal=value, frame_ID=frame_ID)
-        if XBmsg.isValid():
-            self._write(XBmsg.genFrame())
-
-            # log RAW msg
-            self.logRAWtofile(XBmsg)
-
-        return XBmsg
+        dest = self._toAddress(destH, destL)
+        if dest is None:
+            return None
+        # create new XB_remAT_OUT object and write to serial (destination given to the message itself, not through the
+        # shared params, as requests can be sent from several threads)
+        return self._request(lambda fid: XB_remAT_OUT(self.params, command, regVal=value, frame_ID=fid, dest=dest),
+                             frame_ID, timeout, multi=(value is None and command == 'FN'))
 
-    def sendDataToRemote(self, destH, destL, data, frame_ID=0x01, option=0x00, reserved='fffe'):
+    def sendDataToRemote(self, destH, destL, data, frame_ID=None, option=0x00, reserved='fffe', timeout=None,
+                         priority=None):
         """
         Send data as an RF packet to the specified destination.
 
-        :param destH: high address of the destination XBee
+        :param destH: high address of the destination XBee, or its XBeeAddress (then destL is None)
         :param destL: low address of the destination XBee
         :param data: content of the transmit as bytearray
-        :param frame_ID: default value 0x01. Change it if you know what you are doing..
+        :param frame_ID: if not provided, a free one is allocated (0 for no transmit status)
         :param option: default value 0x00. can be changed to 0x08 for trace routing
         :param reserved: should be 'FFFE' unless for trace routing = 'FFFF'
-        :return: XBee_msg object containing the created message.
-                Can be printed using print(sendDataToRemote(..))
+        :param timeout: max time [s] to wait for the transmit status (see XB_Requests)
+        :param priority: if the scheduler is running, priority of the transmit (default XB_Scheduler.BULK)
+        :return: XBee_msg object containing the created message, with the future of the transmit status in
+                XBmsg.reply. Can be printed using print(sendDataToRemote(..))
         """
         # check data consistency
         if type(data) == str:
             # change it to bytearray
             data = bytearray(data.encode())
 
-        self.params['DH'] = destH
-        self.params['DL'] = destL
-
-        # create new XB_RF_OUT object and write to serial
-        XBmsg = XB_RF_OUT(self.params, data, frame_ID=frame_ID, option=option, reserved=reserved)
-        if XBmsg.isValid():
-            self._write(XBmsg.genFrame())
-
-            # log RAW msg
-            self.logRAWtofile(XBmsg)
-
-        return XBmsg
+        dest = self._toAddress(destH, destL)
+        if dest is None:
+            return None
+        # create new XB_RF_OUT object and write to serial (destination given to the message itself, not through the
+        # shared params, as transmits can be sent from several threads)
+        return self._request(lambda fid: XB_RF_OUT(self.params, data, frame_ID=fid, option=option, reserved=reserved,
+                                                   dest=dest),
+                             frame_ID, timeout, priority=priority)
 
-    def broadcastData(self, data, frame_ID=0x01, option=0x00, reserved='fffe'):
+    def broadcastData(self, data, frame_ID=None, option=0x00, reserved='fffe', timeout=None, priority=None):
         """
-        Send data as an RF packet to the specified destination.
+        Send data as an RF packet to all the XBee in the network.
 
-        :param destH: high address of the destination XBee
-        :param destL: low address of the destination XBee
         :param data: content of the transmit as bytearray
-        :param frame_ID: default value 0x01. Change it if you know what you are doing..
+        :param frame_ID: if not provided, a free one is allocated (0 for no transmit status)
         :param option: default value 0x00. can be changed to 0x08 for trace routing
         :param reserved: should be 'FFFE' unless for trace routing = 'FFFF'
+        :param timeout: max time [s] to wait for the transmit status (see XB_Requests)
+        :param priority: if the scheduler is running, priority of the transmit (default XB_Scheduler.BULK)
         :return: XBee_msg object containing the created message.
                 Can be printed using print(sendDataToRemote(..))
         """
-        destH = '00000000'
-        destL = '0000ffff'
+        # same as sendDataToRemote() with the broadcast address
+        return self.sendDataToRemote(BROADCAST, None, data, frame_ID=frame_ID, option=option, reserved=reserved,
+                                     timeout=timeout, priority=priority)
+
+    def _request(self, newMsg, frame_ID, timeout=None, multi=False, priority=None):
+        """
+        Send a request, registered as waiting for reply (see XB_Requests) so several requests can be in flight.
+        If the scheduler is running, the request is queued instead (see XB_Scheduler)
+
+        :param newMsg: function creating the XBee_msg object (OUT) given the frame ID
+        :param frame_ID: frame ID to use (if None, the next free one is allocated)
+        :param timeout: max time [s] to wait for the reply
+        :param multi: if True, collect all the replies (e.g. network discovery)
+        :param priority: priority in the scheduler queues (default by frame type)
+        :return: XBee_msg object, with the future of the reply in XBmsg.reply
+        """
+        if self.scheduler is not None:
+            # frame ID set by the scheduler when written
+            XBmsg = newMsg(frame_ID or 0)
+            if XBmsg.isValid():
+                XBmsg.reply = self.scheduler.submit(XBmsg, frame_ID, timeout, multi, priority)
+            return XBmsg
+
+        # register before sending, as the reply can be received by another thread as soon as sent
+        frame_ID, reply = self.requests.register(frame_ID, timeout, multi)
+
+        XBmsg = newMsg(frame_ID)
+        XBmsg.reply = reply
+        if XBmsg.isValid():
+            self._sendMsg(XBmsg)
+        else:
+            self.requests.cancel(frame_ID)
+
+        return XBmsg
+
+
+    def startScheduler(self, window=4):
+        """
+        Pace the transmissions so the XBee transmit buffer never overflows: at most `window` requests are written and
+        waiting for reply, the others are queued by priority (see XB_Scheduler). Replies must be read meanwhile
+        (receiver thread or readSerial())
 
-        # same as sendDataToRemote() with defined destH and destL
-        return self.sendDataToRemote(destH, destL, data, frame_ID=frame_ID, option=option, reserved=reserved)
+        :param window: max number of requests written and still waiting for reply
+        :return: None
+        """
+        if self.scheduler is not None:
+            self.scheduler.window = window
+            return
+
+        self.scheduler = XB_Scheduler(self, window)
+        self.scheduler.start()
+
+    def stopScheduler(self):
+        """
+        Write frames immediately again. Requests still queued are dropped (their reply resolving to None)
+        """
+        if self.scheduler is None:
+            return
+
+        scheduler = self.scheduler
+        self.scheduler = None
+        scheduler.stop()
 
 
 # ===============================================================================
@@ -502,8 +833,8 @@ class XBee_module:
         self.serial_port.flushInput()
         self.serial_port.flushOutput()
 
-        while self.serial_port.inWaiting():
-            self.serial_port.read()
+        while self._readAvailable():
+            pass
 
     def _write(self, msg):
         """
@@ -514,6 +845,35 @@ class XBee_module:
         """
         self.serial_port.write(msg)
 
+    def _sendMsg(self, XBmsg):
+        """
+        Write the frame of the message to the serial and log it
+
+        :param XBmsg: XBee_msg object (OUT)
+        :return: None
+        """
+        self._write(XBmsg.genFrame())
+
+        # log RAW msg
+        self._logMsg(XBmsg, OUT)
+
+    def _readAvailable(self):
+        """
+        Read all the bytes waiting in the serial with a single call, into a reusable buffer
+
+        :return: memoryview on the bytes read (possibly empty). Only valid till next call!
+        """
+        n = self.serial_port.inWaiting()
+        if not n:
+            return self._RxView[:0]
+
+        if n > len(self._RxChunk):
+            self._RxChunk = bytearray(n)
+            self._RxView = memoryview(self._RxChunk)
+
+        n = self.serial_port.readinto(self._RxView[:n])
+        return self._RxView[:n]
+
     def readSerial(self):
         """
         Receives data from serial.
@@ -521,14 +881,19 @@ class XBee_module:
 
         :return: list of byte received as bytearray or list of API packets as bytearrays if in API mode
         """
-        # read incoming buffer and pack it into the RxStream
-        while self.serial_port.inWaiting():
-            incoming = self.serial_port.read()
-            self.RxBuff.extend(incoming)
-            # time.sleep(0.001)
+        # read everything waiting in the incoming buffer at once
+        return self._processRx(self._readAvailable())
 
+    def _processRx(self, incoming):
+        """
+        Process bytes received from serial (or from any other source, e.g. a recorded stream: see XB_Replay)
+
+        :param incoming: bytes received, as bytes, bytearray or memoryview
+        :return: as readSerial()
+        """
         # if in Transparent Mode, just return everything read and clear the buffer
         if self.params['AP'] == '00':
+            self.RxBuff.extend(incoming)
             data = self.RxBuff
             self.RxBuff = bytearray([])
             return data
@@ -536,22 +901,25 @@ class XBee_module:
         # clear received correct message as API object list
         self.RxMsg = list()
 
-        # split the Rx stream by XBee Start byte (0x7E). OBS: byte 0x7E is stripped away!
-        msgs = self.RxBuff.split(bytes(b'\x7E'))
+        # feed the parser with the new bytes only: partial frames are kept inside the parser till completed
+        self.RxParser.escaped = self.params['AP'] == '02'
+        frames = self.RxParser.feed(incoming)
 
         # add the good messages to the Rx Frames buffer
-        self._stack_frame(msgs)
-
-        # hold on to remaining bytes that may have not validated
-        if len(self.RxMsg) > 0 and not self.RxMsg[-1].isValid():
-            # discard last obj and put msg back in buffer
-            self.RxMsg.pop(-1)
-            self.RxBuff = msgs[-1][1:]
-        elif not XBee_msg.validate(XBee_msg.unescape(msgs[-1]))[0]:
-            self.RxBuff = msgs[-1][1:]
-        else:
-            # clear the buffer
-            self.RxBuff = bytearray([])
+        self._stack_frame(frames)
+
+        if self.dedup is not None:
+            # drop the RF packets already received (they are still logged)
+            self.RxMsg = [XBmsg for XBmsg in self.RxMsg if XBmsg.frame_type not in (0x90, 0x91) or not XBmsg.valid or
+                          not self.dedup.isDuplicate(XBmsg)]
+
+        if self.topology is not None:
+            for XBmsg in self.RxMsg:
+                self.topology.update(XBmsg)
+
+        # match replies to the requests waiting for them
+        self.RxReplies = [XBmsg for XBmsg in self.RxMsg if self.requests.resolve(XBmsg)]
+        self.requests.expire()
 
         return self.RxMsg
 
@@ -561,30 +929,21 @@ class XBee_module:
 # ===============================================================================
     def _stack_frame(self, msgs):
         """
-        Validate incoming messages.  If message
-        is valid, stack into inbox of frames to
+        Stack validated frames (as given by the frame parser) into inbox of frames to
         be executed
         """
         for msg in msgs:
-            # put back previously removed start delimiter
-            msg.insert(0, 0x7E)
-
-            # use static methods from XBee_msg class to validate the msg
-            msg = XBee_msg.unescape(msg)
-            if not XBee_msg.validate(msg)[0]:
-                continue
-
             # create XB_msg object depending on the frame_type
             try:
                 # use frame_type info (msg[3]) to get the relative function from APIop dictionary
-                recXB = APIop[msg[3]][1](self.params, msg)
+                recXB = APIop[msg[3]][1](self.params, msg, unescaped=True)
                 # print(recXB.getHexCmd())
                 # check validity
                 if recXB.isValid():
                     # log msg
-                    self.logRAWtofile(recXB)
+                    self._logMsg(recXB, IN)
                     # if print flag on, then print on screen
-                    if APIop[msg[3]][2]:
+                    if self.verbose and APIop[msg[3]][2]:
                         print(recXB)
                 # else:
                 #     print('failed frame validation on: {0}'.format(''.join('{:02x}'.format(byte) for byte in msg)))
@@ -602,59 +961,197 @@ class XBee_module:
                 # except: pass
 
 
+# ===============================================================================
+#   Receiver thread and callbacks
+# ===============================================================================
+    def addCallback(self, callback, frameType=None, source=None):
+        """
+        Register a function to be called (from the receiver thread) for each received message matching frame type and
+        source address. Messages matching no callback are queued in self.RxInbox (see getMessage()).
+        In Transparent Mode, callbacks registered with no frame type nor source receive the data as bytearray.
+
+        :param callback: function taking the XBee_msg object as only argument
+        :param frameType: frame type (e.g. 0x90), or None for any
+        :param source: address of the sender (XBeeAddress or 16 hex string), or None for any
+        :return: None
+        """
+        if source is not None:
+            source = XBeeAddress(source)
+            self._bySource = True
+        self._callbacks.setdefault((frameType, source), list()).append(callback)
+
+    def removeCallback(self, callback, frameType=None, source=None):
+        if source is not None:
+            source = XBeeAddress(source)
+        try:
+            self._callbacks[(frameType, source)].remove(callback)
+        except (KeyError, ValueError):
+            return
+        if not self._callbacks[(frameType, source)]:
+            del self._callbacks[(frameType, source)]
+            self._bySource = any(key[1] is not None for key in self._callbacks)
+
+    def getMessage(self, timeout=None):
+        """
+        Get the oldest received message not handled by any callback
+
+        :param timeout: max time [s] to wait for a message (None to wait forever, 0 to not wait)
+        :return: XBee_msg object (bytearray in Transparent Mode), or None if no message
+        """
+        with self._RxReady:
+            if not self.RxInbox and timeout != 0:
+                self._RxReady.wait(timeout)
+            if self.RxInbox:
+                return self.RxInbox.popleft()
+        return None
+
+    def startReceiver(self):
+        """
+        Start the thread reading from serial and dispatching received messages.
+        The thread blocks on the serial till the first byte arrives, then reads everything available at once, so each
+        frame is handled as soon as it is complete. Do not call readSerial() while the receiver is running.
+        """
+        if self._receiver is not None:
+            return
+
+        self._receiving.set()
+        self._receiver = threading.Thread(target=self._receiverLoop, name='XB_Receiver')
+        self._receiver.daemon = True
+        self._receiver.start()
+
+    def stopReceiver(self, timeout=2.):
+        if self._receiver is None:
+            return
+
+        self._receiving.clear()
+        if self._receiver is not threading.current_thread():
+            self._receiver.join(timeout)
+        self._receiver = None
+
+    def _receiverLoop(self):
+        # wake up periodically to check if stopped (only when nothing is received)
+        serialTimeout = self.serial_port.timeout
+        self.serial_port.timeout = .5
+
+        try:
+            while self._receiving.is_set():
+                first = self.serial_port.read(1)
+                if not first:
+                    self.requests.expire()
+                    continue
+
+                # take whatever else already arrived with the first byte
+                self._dispatch(self._processRx(first + bytes(self._readAvailable())))
+        except (SerialException, OSError, TypeError) as e:
+            # serial closed or disconnected
+            if self._receiving.is_set():
+                print('ERR: receiver stopped: {0}'.format(e))
+        finally:
+            try:
+                self.serial_port.timeout = serialTimeout
+            except (SerialException, OSError):
+                pass
+
+    def _dispatch(self, msgs):
+        """
+        Call the callbacks matching each message (as returned by _processRx()), or queue it into self.RxInbox
+        """
+        if self.params['AP'] == '00':
+            # Transparent Mode: received data as a whole
+            if not msgs:
+                return
+            msgs = [msgs]
+
+        for XBmsg in msgs:
+            frameType = getattr(XBmsg, 'frame_type', None)
+            source = None
+            if self._bySource:
+                source = getattr(XBmsg, 'sourceAddr', None)
+
+            # from the most specific registration to the most generic
+            keys = [(frameType, None)]
+            if frameType is not None:
+                keys.append((None, None))
+            if source is not None:
+                keys = [(frameType, source), (None, source)] + keys
+
+            handled = False
+            for key in keys:
+                for callback in self._callbacks.get(key, ()):
+                    handled = True
+                    try:
+                        callback(XBmsg)
+                    except Exception as e:
+                        print('ERR: callback {0} failed on message: {1}'.format(getattr(callback, '__name__', callback),
+                                                                                e))
+
+            if not handled:
+                self._queueMsg(XBmsg)
+
+    def _queueMsg(self, XBmsg):
+        """
+        Queue a received message not handled by any callback into self.RxInbox
+        """
+        with self._RxReady:
+            self.RxInbox.append(XBmsg)
+            self._RxReady.notify()
+
+
 # ===============================================================================
 #   Custom methods for swarming
 # ===============================================================================
-#     def swarmTopologicalBroadcast(self):
-#         # TODO: here create a function which, before broadcasting, first looks and
-#         # finds the neighbors, put a limit on them (topology), and then makes single
-#         # communication to them, expecting the ACK.
-#         # this is because when using the XBee broadcast, every device sends the info
-#         # MT+1 times to every other device within its RF range. Furthermore, since
-#         # each device in our project is a router (not endpoint), then each device
-#         # will then re-broadcast MT+1 times the same info.
-#         # Considering our RF range is now pretty big (~400m) to total communications
-#         # initiated by 1 broadcast is huge (MT+1)*n, where n=num devices
-#
-#         # problem here is however how to know when, if received something, if need to
-#         # broadcast or not.. (if it was alr received before)
-#
-#         return
-
-    def findNeighbors(self, destH, destL):
+    def swarmTopologicalBroadcast(self, data, k=None, ttl=None):
+        """
+        Send data to all the XBee in the swarm without broadcasting: when using the XBee broadcast, every device sends
+        the info MT+1 times to every other device within its RF range, and since each device is a router, each one
+        re-broadcasts it MT+1 times as well. Here the data is sent (with ACK) to k neighbors only (as per self.topology),
+        spread from the strongest to the weakest RSSI so that the message also reaches farther clusters, which forward
+        it the same way, each device handling it only once (see XB_Swarm).
+
+        :param data: content of the message as bytearray
+        :param k: max number of neighbors each device sends the message to (default self.swarm.k)
+        :param ttl: max number of hops (default self.swarm.ttl)
+        :return: list of XBee_msg objects sent, or None if the swarm is not set (self.swarm = XB_Swarm(self, ...))
+        """
+        if self.swarm is None:
+            print('ERR: swarm not set! (see XB_Swarm)')
+            return None
+
+        return self.swarm.broadcast(data, k=k, ttl=ttl)
+
+    def findNeighbors(self, destH, destL=None):
         """
         XBee provides a feature to discover and report all RF modules found within
         immediate RF range
 
-        :param destH: high address of link receiving device
+        :param destH: high address of link receiving device, or its XBeeAddress (then destL is None)
         :param destL: low address of link receiving device
         :return:
         """
-        if destH.upper() == 'LOCAL' or destL.upper() == 'LOCAL':
+        if self._isKeyword(destH, 'LOCAL') or self._isKeyword(destL, 'LOCAL'):
             print(self.getLocalRegistry('FN'))
 
             return
-        elif destH.upper() == 'GLOBAL' or destL.upper() == 'GLOBAL':
+        elif self._isKeyword(destH, 'GLOBAL') or self._isKeyword(destL, 'GLOBAL'):
             print('Attempting to broadcast findNeighbors! not allowed :(')
             return
 
         # check consistency of the input address
-        destH = self._checkAddrConsistency(destH)
-        destL = self._checkAddrConsistency(destL)
-        if not destH or not destL:
+        dest = self._toAddress(destH, destL)
+        if dest is None:
             return
 
         # if address equal to local XBee, then use local registry methods
-        if destH.lower() == self.params['SH'] and destL.lower() == self.params['SL']:
+        if dest == self.address:
             print(self.getLocalRegistry('FN'))
 
             return
         # if address is for broadcast, then stop! not allowed
-        elif destH.lower() == '00000000' and destL.lower() == '0000ffff':
+        elif dest.isBroadcast():
             print('Attempting to broadcast findNeighbors! not allowed :(')
             return
 
-        print(self.getRemoteRegistry(destH, destL, 'FN'))
+        print(self.getRemoteRegistry(dest, None, 'FN'))
 
 
 # ===============================================================================
@@ -665,39 +1162,29 @@ class XBee_module:
         XBee provided features, which allows to test the link between the local
         device and a remote one. Note is not possible to broadcast this information
 
-        :param senderH: high address of link starting device
+        :param senderH: high address of link starting device, or its XBeeAddress (then senderL is None)
         :param senderL: low address of link starting device
-        :param destH: high address of link receiving device
+        :param destH: high address of link receiving device, or its XBeeAddress (then destL is None)
         :param destL: low address of link receiving device
         :param byteToTest: number of bytes to test in each iteration
         :param iterationsToTest: number of iterations for repeating the test.
         :return: None
         """
         # check data consistency
-        senderH = self._checkAddrConsistency(senderH)
-        if not senderH:
-            return
-        senderL = self._checkAddrConsistency(senderL)
-        if not senderL:
-            return
-        destH = self._checkAddrConsistency(destH)
-        if not destH:
+        sender = self._toAddress(senderH, senderL)
+        if sender is None:
             return
-        destL = self._checkAddrConsistency(destL)
-        if not destL:
+        dest = self._toAddress(destH, destL)
+        if dest is None:
             return
 
-        # set high and low destination address to local address: this is from where to start the linkTest
-        self.params['DH'] = senderH
-        self.params['DL'] = senderL
-
         # define test data as bytearray as: destination address, payload size (2bytes), iterations (max 4000)
-        testData = bytearray.fromhex(destH) + bytearray.fromhex(destL) \
-                   + bytearray.fromhex('{:04x}'.format(byteToTest)) \
-                   + bytearray.fromhex('{:04x}'.format(iterationsToTest))
-        XBmsg = XB_RFexpl_OUT(self.params, testData, 0xE6, 0xE6, '0014')
+        testData = bytearray(dest.bytes) + bytearray(byteToTest.to_bytes(2, 'big')) \
+                   + bytearray(iterationsToTest.to_bytes(2, 'big'))
+        # the frame is sent to the sender of the test: this is from where to start the linkTest
+        XBmsg = self._request(lambda fid: XB_RFexpl_OUT(self.params, testData, 0xE6, 0xE6, '0014', frame_ID=fid,
+                                                        dest=sender), None)
         if XBmsg.isValid():
-            self._write(XBmsg.genFrame())
             print(XBmsg)
             # print(XBmsg.getHexCmd())
 
@@ -711,13 +1198,54 @@ class XBee_module:
         :return: the formatted address or None if not correct
         """
         if type(addr) is bytearray and len(addr) == 4:
-            return ''.join('{:02x}'.format(byte for byte in addr))
+            return addr.hex()
         elif type(addr) is str and len(addr) == 8:
             return addr
         else:
             print("Address must be provided as string, length 8!")
             return None
 
+    def _toAddress(self, addrH, addrL=None):
+        """
+        Get the XBeeAddress given either the high and low addresses, or the full address
+
+        :param addrH: high address (str, length 8, or bytearray, length 4), or full address if addrL is None, as
+                XBeeAddress (or int, 8 bytes, or str, length 16)
+        :param addrL: low address (str, length 8, or bytearray, length 4)
+        :return: XBeeAddress or None if not correct
+        """
+        if addrL is None:
+            try:
+                return XBeeAddress(addrH)
+            except (ValueError, TypeError):
+                print("Address must be provided as XBeeAddress, int, 8 bytes or string length 16!")
+                return None
+
+        addrH = self._checkAddrConsistency(addrH)
+        addrL = self._checkAddrConsistency(addrL)
+        if not addrH or not addrL:
+            return None
+
+        try:
+            return XBeeAddress.fromHex(addrH, addrL)
+        except ValueError:
+            print("Address must be provided in hex!")
+            return None
+
+    @staticmethod
+    def _isKeyword(addr, keyword):
+        """
+        :return: True if the address is given as the keyword (e.g. 'LOCAL' or 'GLOBAL') instead of an actual address
+        """
+        return type(addr) is str and addr.upper() == keyword
+
+    @property
+    def address(self):
+        """
+        :return: 64-bit address of the local XBee, as XBeeAddress
+        """
+        return XBeeAddress.fromHex(self.params['SH'], self.params['SL'])
+
     def networkDiscover(self):
         """
         XBee provides a feature to discover and report all RF modules found using
@@ -727,37 +1255,36 @@ class XBee_module:
         """
         print(self.getLocalRegistry('ND'))
 
-    def traceRoute(self, destH, destL):
+    def traceRoute(self, destH, destL=None):
         """
         Attempt a route tracing when sending data to the defined XBee.
         Not acceptable to trace local XBee or broadcast
 
-        :param destH: high address of link receiving device
+        :param destH: high address of link receiving device, or its XBeeAddress (then destL is None)
         :param destL: low address of link receiving device
         :return:
         """
-        if destH.upper() == 'LOCAL' or destH.upper() == 'LOCAL':
+        if self._isKeyword(destH, 'LOCAL') or self._isKeyword(destL, 'LOCAL'):
             print('Attempting to trace routing the local XBee! not allowed :(')
             return
-        elif destH.upper() == 'GLOBAL' or destH.upper() == 'GLOBAL':
+        elif self._isKeyword(destH, 'GLOBAL') or self._isKeyword(destL, 'GLOBAL'):
             print('Attempting to broadcast trace routing! not allowed :(')
             return
 
         # check consistency of the input address
-        destH = self._checkAddrConsistency(destH)
-        destL = self._checkAddrConsistency(destL)
-        if not destH or not destL:
+        dest = self._toAddress(destH, destL)
+        if dest is None:
             return
 
         # if address is local or for broadcast, then stop! not allowed
-        if destH.lower() == self.params['SH'] and destL.lower() == self.params['SL']:
+        if dest == self.address:
             print('Attempting to trace routing the local XBee! not allowed :(')
             return
-        elif destH.lower() == '00000000' and destL.lower() == '0000ffff':
+        elif dest.isBroadcast():
             print('Attempting to broadcast trace routing! not allowed :(')
             return
 
-        msg = self.sendDataToRemote(destH, destL, bytearray([1, 2, 3]), option=0x08, reserved='ffff')
+        msg = self.sendDataToRemote(dest, None, bytearray([1, 2, 3]), option=0x08, reserved='ffff')
         # print(msg.getHexCmd())
         print(msg)
 
@@ -766,11 +1293,39 @@ class XBee_module:
 # ===============================================================================
     def logRAWtofile(self, line):
         """
-        Write RAW data streams to a file for post-processing and logging
+        Write RAW data streams to a file for post-processing and logging.
+        Line (or message object) is only queued: see XB_RawLogger
+
+        :param line: string or object with __str__ method (e.g. XBee_msg)
+        """
+        if self.rawLogger is not None:
+            self.rawLogger.log(line)
+
+    def _logMsg(self, XBmsg, direction):
         """
-        with open(self.rawLogFileIDstr, 'a') as fileID:
-            fileID.write(str(line) + '\n')
-            fileID.flush()
+        Log a message sent/received, either to the binary capture (if enabled) or as line of the RAW log
+
+        :param XBmsg: XBee_msg object
+        :param direction: IN or OUT (see XB_Capture)
+        """
+        if self.capture is not None:
+            self.capture.write(XBmsg.rawFrame, direction, XBmsg.time_ns)
+        else:
+            self.logRAWtofile(XBmsg)
+
+    def close(self):
+        """
+        Close serial communication with the XBee, and write all pending lines to the RAW log (and capture)
+        """
+        self.stopScheduler()
+        self.stopReceiver()
+        self.requests.cancelAll()
+        if self.serial_port is not None:
+            self.serial_port.close()
+        if self.rawLogger is not None:
+            self.rawLogger.close()
+        if self.capture is not None:
+            self.capture.close()
 
 # ===============================================================================
 #   Establish Print Method
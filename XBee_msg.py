@@ -7,6 +7,11 @@ Adding children classes for frame-specific data
 """
 
 import datetime     # timestamp all messages (incoming and outgoing)
+import time
+import struct       # precompiled layouts for outgoing frames
+
+import XB_Codec     # escape sequence codec
+from XB_Address import XBeeAddress
 
 
 # authorship info
@@ -27,6 +32,44 @@ RFstatus = {0: 'OK', 1: 'MAC ACK failed', 21: 'Invalid dest', 33: 'Network ACK f
 # dictionary to interpret RF discovery status code
 RFdiscSt = {0: 'No overhead', 2: 'broadcast'}
 
+# precompiled frame layouts (big endian, as per DigiMesh documentation)
+_HEADER = struct.Struct('>BH')                  # start delimiter, length
+_NO_FIELDS = struct.Struct('>')
+_LOC_AT = struct.Struct('>BB2s')                # type, ID, AT command
+_REM_AT = struct.Struct('>BB8s2sB2s')           # type, ID, destination, reserved, options, AT command
+_RF = struct.Struct('>BB8s2sBB')                # type, ID, destination, reserved, radius, options
+_RF_EXPL = struct.Struct('>BB8s2sBB2s2sBB')     # type, ID, destination, reserved, endpoints (src, dest), cluster,
+                                                # profile, radius, options
+
+
+# ===============================================================================
+#   Lazy attributes
+# ===============================================================================
+class _lazy(object):
+    """
+    Attribute computed only when first accessed (e.g. decoded from the raw frame) and then cached in the object.
+    The value is stored under the same name with a leading underscore (to be listed in __slots__), and can also be
+    assigned directly.
+    """
+
+    def __init__(self, compute):
+        self.compute = compute
+        self.name = '_' + compute.__name__
+        self.__doc__ = compute.__doc__
+
+    def __get__(self, obj, objtype=None):
+        if obj is None:
+            return self
+        try:
+            return getattr(obj, self.name)
+        except AttributeError:
+            value = self.compute(obj)
+            setattr(obj, self.name, value)
+            return value
+
+    def __set__(self, obj, value):
+        setattr(obj, self.name, value)
+
 
 # ===============================================================================
 #   General class (superclass)
@@ -38,26 +81,64 @@ class XBee_msg:
     every object is automatically time-stamped (local time, not UTC) when created
     """
 
+    # keep objects compact: no per-instance __dict__ (many objects can be kept in memory)
+    __slots__ = ('AP', 'SL', '_created', 'length', 'frame_type', 'checksum', 'valid', '_frame', '_data', '_hexMsg',
+                 'reply')
+
     # create general class prototype
     def __init__(self, XBparams):
-        self.XBparams = XBparams
+        # only keep the parameters actually needed: API mode and local address
+        self.AP = XBparams.get('AP')
+        self.SL = XBparams.get('SL', '')
 
-        # immediately timestamp during creation in local time!! (not UTC)
-        # self.time_stmp = str(datetime.datetime.now()).split('.')[0]
-        self.time_stmp = str(datetime.datetime.now())
+        # immediately timestamp during creation as integer nanoseconds (only formatted, in local time, when needed)
+        self._created = time.time_ns()
 
         self.length = 0
 
         self.frame_type = 0x00
-        self.data = bytearray()
 
         self.checksum = 0x00
-        self.hexMsg = ''
         self.valid = True
 
+        # raw (unescaped) frame
+        self._frame = b''
+
+        # for requests: future of the reply (see XB_Requests)
+        self.reply = None
+
+    @property
+    def time_ns(self):
+        # creation time as integer nanoseconds since epoch
+        return self._created
+
+    @time_ns.setter
+    def time_ns(self, value):
+        # e.g. when rebuilding the object from a capture
+        self._created = value
+
+    @property
+    def time_stmp(self):
+        # local time!! (not UTC)
+        return str(datetime.datetime.fromtimestamp(self._created // 1000000000).replace(
+            microsecond=(self._created // 1000) % 1000000))
+
+    @_lazy
+    def data(self):
+        return bytearray()
+
+    @property
+    def rawFrame(self):
+        # full unescaped frame (empty until generated, for OUT messages)
+        return self._frame
+
+    @_lazy
+    def hexMsg(self):
+        return bytes(self._frame).hex().upper()
+
     # ===============================================================================
     #   Pack the message content with the DigiMesh header and trail
-    def _genDigiMeshFrame(self, frameData):
+    def _packFrame(self, layout, fields, payload=b''):
         """
         DigiMesh frame is structured as follow (in bytes):
         - 0         : Start Delimiter [0x7E]
@@ -65,28 +146,41 @@ class XBee_msg:
         - 3-(3+n-1) : Frame-Specific Data
         - (3+n)     : Checksum (2's complement)
 
-        :param frameData: Frame-Specific data, given as bytearray
+        Header, frame-specific data and checksum are written into a single preallocated buffer.
+
+        :param layout: struct.Struct describing the fixed fields of the Frame-Specific data
+        :param fields: values for the fixed fields
+        :param payload: variable length part of the Frame-Specific data (appended after the fixed fields)
         :return: DigiMesh compliant full frame, as bytearray
         """
+        self.length = layout.size + len(payload)
+        frame = bytearray(self.length + 4)
 
-        # define frame header
-        strt_delim = '7E'                                   # = '{:02X}'.format(0x7E)
-        self.length = len(frameData)
-        header = strt_delim + '{:04X}'.format(self.length)  # length is defined as 2 bytes
+        # define frame header, fixed fields, and payload
+        _HEADER.pack_into(frame, 0, 0x7E, self.length)
+        layout.pack_into(frame, 3, *fields)
+        frame[3 + layout.size:-1] = payload
 
-        # Calculate Check Sum and format frame (as 2's complements)
-        self.checksum = 0xFF - ((sum(frameData)) & 0xFF)
+        # Calculate Check Sum and format frame (as 2's complements): exclude header (checksum byte is still 0)
+        self.checksum = 0xFF - ((sum(frame) - 0x7E - (self.length >> 8) - (self.length & 0xFF)) & 0xFF)
+        frame[-1] = self.checksum
 
-        # Sandwich frame with header, frameData, and checksum
-        frame = bytearray.fromhex(header) + frameData
-        frame.append(self.checksum)
+        # keep the unescaped frame (e.g. for binary captures)
+        self._frame = frame
 
         # Note we are using XBee series 1, which is limiting the actual frame size to 100bytes.
-        if len(frameData) >= 100:
+        if self.length >= 100:
             print('XBee frame larger than 100bytes! XBee Series 1 does not support this..')
 
         return frame
 
+    def _genDigiMeshFrame(self, frameData):
+        """
+        :param frameData: Frame-Specific data, given as bytearray
+        :return: DigiMesh compliant full frame, as bytearray
+        """
+        return self._packFrame(_NO_FIELDS, (), frameData)
+
     # ===============================================================================
     #   Frame Validation
     def isValid(self):
@@ -138,19 +232,7 @@ class XBee_msg:
         Escape reserved characters to ensure accurate
         message transmission and reception
         """
-        reserved = bytearray('\x7E\x7D\x11\x13'.encode())
-        escaped = bytearray()
-        escaped.append(msg[0])
-
-        for byte in msg[1:]:
-
-            if byte in reserved:
-                escaped.append(0x7D)
-                escaped.append(byte ^ 0x20)
-            else:
-                escaped.append(byte)
-
-        return escaped
+        return XB_Codec.escape(msg)
 
     @staticmethod
     def unescape(msg):
@@ -158,23 +240,7 @@ class XBee_msg:
         Retrieve unescaped message from escaped message
         in order to understand intended message
         """
-        skip = False
-        unescaped = bytearray()
-
-        for i in range(len(msg)):
-
-            if not skip and msg[i] is 0x7D:
-
-                if not (i + 1) >= len(msg):
-                    unescaped.append(msg[i + 1] ^ 0x20)
-                    skip = True
-
-            elif not skip:
-                unescaped.append(msg[i])
-            else:
-                skip = False
-
-        return unescaped
+        return XB_Codec.unescape(msg)
 
     # ===============================================================================
     #   Stringify message and get method
@@ -182,7 +248,7 @@ class XBee_msg:
         return self.hexMsg
 
     def _hexStr(self, frame):
-        self.hexMsg = ''.join('{:02X}'.format(byte) for byte in frame)
+        self.hexMsg = bytes(frame).hex().upper()
 
 
 # ===============================================================================
@@ -193,6 +259,8 @@ class XB_locAT_OUT(XBee_msg):
     Query or set parameters on the local XBee
     """
 
+    __slots__ = ('frame_ID', 'ATcmd', 'reg_value')
+
     def __init__(self, XBparams, ATcmd, regVal=None, frame_ID=0x52):
         # take attributes already defined for the general class
         XBee_msg.__init__(self, XBparams)
@@ -229,6 +297,19 @@ class XB_locAT_OUT(XBee_msg):
                 self.valid = False
                 return
 
+    @classmethod
+    def fromFrame(cls, XBparams, frame):
+        """
+        Rebuild the message from its full unescaped frame (e.g. read back from a capture)
+        """
+        frame_type, frame_ID, ATcmd = _LOC_AT.unpack_from(frame, 3)
+        value = frame[3 + _LOC_AT.size:-1]
+
+        XBmsg = cls(XBparams, ATcmd.decode(), regVal=bytearray(value) if value else None, frame_ID=frame_ID)
+        XBmsg._frame = frame
+
+        return XBmsg
+
     def _genFrameData(self):
         """
         Frame-specific Data Construct for 'AT Command' (0x08):
@@ -238,28 +319,21 @@ class XB_locAT_OUT(XBee_msg):
                        (0xXX) - Second letter
             Parameter Value (optional)
 
-        :return: bytearray with frame-specific data
+        :return: layout, values of fixed fields and payload of frame-specific data
         """
-        # create content of the message
-        frameData = bytearray([self.frame_type, self.frame_ID]) + bytearray(self.ATcmd.encode())
-
         # is the registry value is provided, append it
+        value = b''
         if self.reg_value is not None:
             value = self.reg_value
-            frameData += value
 
-        return frameData
+        return _LOC_AT, (self.frame_type, self.frame_ID, self.ATcmd.encode()), value
 
     def genFrame(self):
         """
-        Generate DigiMesh compliant full frame, by first creating the Frame-specific data
+        Generate DigiMesh compliant full frame, by packing the Frame-specific data with header and checksum
         :return: full frame in bytearray
         """
-        # generate frame-specific data
-        frameData = self._genFrameData()
-
-        # call parent function to create the complete frame (as bytearray)
-        frame = self._genDigiMeshFrame(frameData)
+        frame = self._packFrame(*self._genFrameData())
 
         # OBS: never escape-sequence local msg
         return frame
@@ -286,16 +360,22 @@ class XB_remAT_OUT(XBee_msg):
     Query or set parameters on the remote XBee
     """
 
-    def __init__(self, XBparams, ATcmd, regVal=None, frame_ID=0x01, applyChanges=True):
+    __slots__ = ('frame_ID', 'destAddrHigh', 'destAddrLow', 'applyCh', 'ATcmd', 'reg_value')
+
+    def __init__(self, XBparams, ATcmd, regVal=None, frame_ID=0x01, applyChanges=True, dest=None):
         # take attributes already defined for the general class
         XBee_msg.__init__(self, XBparams)
 
         self.frame_type = 0x17
         self.frame_ID = frame_ID
 
-        # destination address is contained in DH and DL params
-        self.destAddrHigh = XBparams['DH']
-        self.destAddrLow = XBparams['DL']
+        # destination address as given, otherwise contained in DH and DL params
+        if dest is None:
+            self.destAddrHigh = XBparams['DH']
+            self.destAddrLow = XBparams['DL']
+        else:
+            self.destAddrHigh = dest.high
+            self.destAddrLow = dest.low
 
         # if want to apply changes immediately
         self.applyCh = 0x00
@@ -331,6 +411,21 @@ class XB_remAT_OUT(XBee_msg):
                 self.valid = False
                 return
 
+    @classmethod
+    def fromFrame(cls, XBparams, frame):
+        """
+        Rebuild the message from its full unescaped frame (e.g. read back from a capture)
+        """
+        frame_type, frame_ID, dest, _, applyCh, ATcmd = _REM_AT.unpack_from(frame, 3)
+        value = frame[3 + _REM_AT.size:-1]
+
+        dest = XBeeAddress.fromBytes(dest)
+        XBmsg = cls(XBparams, ATcmd.decode(), regVal=bytearray(value) if value else None, frame_ID=frame_ID,
+                    applyChanges=bool(applyCh & 0x02), dest=dest)
+        XBmsg._frame = frame
+
+        return XBmsg
+
     def _genFrameData(self):
         """
         Frame-specific Data Construct for 'Remote Command Request' (0x17):
@@ -343,32 +438,25 @@ class XB_remAT_OUT(XBee_msg):
                        (0xXX) - Second letter
             Parameter Value (optional)
 
-        :return: bytearray with frame-specific data
+        :return: layout, values of fixed fields and payload of frame-specific data
         """
-        # create content of the message
-        frameData = bytearray([self.frame_type, self.frame_ID]) \
-                    + bytearray.fromhex(self.destAddrHigh) \
-                    + bytearray.fromhex(self.destAddrLow) \
-                    + bytearray([0xFF, 0xFE]) \
-                    + bytearray([self.applyCh]) \
-                    + bytearray(self.ATcmd.encode())
-
         # is the registry value is provided, append it
+        value = b''
         if self.reg_value is not None:
-            value = bytearray.fromhex(self.reg_value)
-            frameData += value
+            value = self.reg_value
 
-        return frameData
+        # binary form of the destination is cached in the (interned) address object
+        dest = XBeeAddress.fromHex(self.destAddrHigh, self.destAddrLow)
 
-    def genFrame(self):
-        # generate frame-specific data
-        frameData = self._genFrameData()
+        return _REM_AT, (self.frame_type, self.frame_ID, dest.bytes,
+                         b'\xFF\xFE', self.applyCh, self.ATcmd.encode()), value
 
-        # call parent function to create the complete frame (as bytearray)
-        frame = self._genDigiMeshFrame(frameData)
+    def genFrame(self):
+        # pack frame-specific data with header and checksum (as bytearray)
+        frame = self._packFrame(*self._genFrameData())
 
         # use escape sequence if API mode is 2
-        if self.XBparams['AP'] == '02':
+        if self.AP == '02':
             frame = self._escape(frame)
 
         return frame
@@ -395,16 +483,22 @@ class XB_RF_OUT(XBee_msg):
     Send data as an RF packet to the specified destination.
     """
 
-    def __init__(self, XBparams, data, frame_ID=0x01, radius=0x00, option=0x00, reserved='FFFE'):
+    __slots__ = ('frame_ID', 'destAddrHigh', 'destAddrLow', 'reserved', 'radius', 'option')
+
+    def __init__(self, XBparams, data, frame_ID=0x01, radius=0x00, option=0x00, reserved='FFFE', dest=None):
         # take attributes already defined for the general class
         XBee_msg.__init__(self, XBparams)
 
         self.frame_type = 0x10
         self.frame_ID = frame_ID
 
-        # destination address is contained in DH and DL params
-        self.destAddrHigh = XBparams['DH']
-        self.destAddrLow = XBparams['DL']
+        # destination address as given, otherwise contained in DH and DL params
+        if dest is None:
+            self.destAddrHigh = XBparams['DH']
+            self.destAddrLow = XBparams['DL']
+        else:
+            self.destAddrHigh = dest.high
+            self.destAddrLow = dest.low
 
         # reserved
         if type(reserved) is bytearray and len(reserved) == 2:
@@ -429,6 +523,20 @@ class XB_RF_OUT(XBee_msg):
             return
         self.data = data
 
+    @classmethod
+    def fromFrame(cls, XBparams, frame):
+        """
+        Rebuild the message from its full unescaped frame (e.g. read back from a capture)
+        """
+        frame_type, frame_ID, dest, reserved, radius, option = _RF.unpack_from(frame, 3)
+
+        dest = XBeeAddress.fromBytes(dest)
+        XBmsg = cls(XBparams, bytearray(frame[3 + _RF.size:-1]),
+                    frame_ID=frame_ID, radius=radius, option=option, reserved=bytearray(reserved), dest=dest)
+        XBmsg._frame = frame
+
+        return XBmsg
+
     def _genFrameData(self):
         """
         Frame-specific Data Construct for 'RF transmit' (0x10):
@@ -440,27 +548,20 @@ class XB_RF_OUT(XBee_msg):
             Options
             Data -> as bytearray
 
-        :return: bytearray with frame-specific data
+        :return: layout, values of fixed fields and payload of frame-specific data
         """
-        # create content of the message
-        frameData = bytearray([self.frame_type, self.frame_ID]) \
-                    + bytearray.fromhex(self.destAddrHigh) \
-                    + bytearray.fromhex(self.destAddrLow) \
-                    + self.reserved \
-                    + bytearray([self.radius, self.option]) \
-                    + self.data
+        # binary form of the destination is cached in the (interned) address object
+        dest = XBeeAddress.fromHex(self.destAddrHigh, self.destAddrLow)
 
-        return frameData
+        return _RF, (self.frame_type, self.frame_ID, dest.bytes,
+                     self.reserved, self.radius, self.option), self.data
 
     def genFrame(self):
-        # generate frame-specific data
-        frameData = self._genFrameData()
-
-        # call parent function to create the complete frame (as bytearray)
-        frame = self._genDigiMeshFrame(frameData)
+        # pack frame-specific data with header and checksum (as bytearray)
+        frame = self._packFrame(*self._genFrameData())
 
         # use escape sequence if API mode is 2
-        if self.XBparams['AP'] == '02':
+        if self.AP == '02':
             frame = self._escape(frame)
 
         return frame
@@ -488,17 +589,24 @@ class XB_RFexpl_OUT(XBee_msg):
     Send data as an explicit RF packet to the specified destination.
     """
 
+    __slots__ = ('frame_ID', 'destAddrHigh', 'destAddrLow', 'srcEP', 'destEP', 'clusterID', 'profileID', 'radius',
+                 'option')
+
     def __init__(self, XBparams, data, srcEP, destEP, clusterID, profileID='C105',
-                 frame_ID=0x01, radius=0x00, option=0x00):
+                 frame_ID=0x01, radius=0x00, option=0x00, dest=None):
         # take attributes already defined for the general class
         XBee_msg.__init__(self, XBparams)
 
         self.frame_type = 0x11
         self.frame_ID = frame_ID
 
-        # destination address is contained in DH and DL params
-        self.destAddrHigh = XBparams['DH']
-        self.destAddrLow = XBparams['DL']
+        # destination address as given, otherwise contained in DH and DL params
+        if dest is None:
+            self.destAddrHigh = XBparams['DH']
+            self.destAddrLow = XBparams['DL']
+        else:
+            self.destAddrHigh = dest.high
+            self.destAddrLow = dest.low
 
         # endpoints
         self.srcEP = srcEP
@@ -566,6 +674,22 @@ class XB_RFexpl_OUT(XBee_msg):
             return
         self.data = data
 
+    @classmethod
+    def fromFrame(cls, XBparams, frame):
+        """
+        Rebuild the message from its full unescaped frame (e.g. read back from a capture)
+        """
+        frame_type, frame_ID, dest, _, srcEP, destEP, clusterID, profileID, radius, option = \
+            _RF_EXPL.unpack_from(frame, 3)
+
+        dest = XBeeAddress.fromBytes(dest)
+        XBmsg = cls(XBparams, bytearray(frame[3 + _RF_EXPL.size:-1]),
+                    srcEP, destEP, bytearray(clusterID), bytearray(profileID),
+                    frame_ID=frame_ID, radius=radius, option=option, dest=dest)
+        XBmsg._frame = frame
+
+        return XBmsg
+
     def _genFrameData(self):
         """
         Frame-specific Data Construct for 'RF transmit' (0x10):
@@ -581,29 +705,21 @@ class XB_RFexpl_OUT(XBee_msg):
             Options
             Data -> as bytearray
 
-        :return: bytearray with frame-specific data
+        :return: layout, values of fixed fields and payload of frame-specific data
         """
-        # create content of the message
-        frameData = bytearray([self.frame_type, self.frame_ID]) \
-                    + bytearray.fromhex(self.destAddrHigh) \
-                    + bytearray.fromhex(self.destAddrLow) \
-                    + bytearray([0xFF, 0xFE]) \
-                    + bytearray([self.srcEP, self.destEP]) \
-                    + self.clusterID + self.profileID \
-                    + bytearray([self.radius, self.option]) \
-                    + self.data
-
-        return frameData
+        # binary form of the destination is cached in the (interned) address object
+        dest = XBeeAddress.fromHex(self.destAddrHigh, self.destAddrLow)
 
-    def genFrame(self):
-        # generate frame-specific data
-        frameData = self._genFrameData()
+        return _RF_EXPL, (self.frame_type, self.frame_ID, dest.bytes,
+                          b'\xFF\xFE', self.srcEP, self.destEP, self.clusterID, self.profileID,
+                          self.radius, self.option), self.data
 
-        # call parent function to create the complete frame (as bytearray)
-        frame = self._genDigiMeshFrame(frameData)
+    def genFrame(self):
+        # pack frame-specific data with header and checksum (as bytearray)
+        frame = self._packFrame(*self._genFrameData())
 
         # use escape sequence if API mode is 2
-        if self.XBparams['AP'] == '02':
+        if self.AP == '02':
             frame = self._escape(frame)
 
         return frame
@@ -616,7 +732,7 @@ class XB_RFexpl_OUT(XBee_msg):
 
     def __str__(self):
         addr = self.destAddrLow.lower()
-        if addr == self.XBparams['SL'].lower():
+        if addr == self.SL.lower():
             addr = ' local  '
         elif self.destAddrHigh == '00000000' and addr == '0000ffff':
             addr = ' GLOBAL '
@@ -633,7 +749,9 @@ class XB_locAT_IN(XBee_msg):
     Decode AT (registry) commands from local XBee
     """
 
-    def __init__(self, XBparams, frame):
+    __slots__ = ('frame_ID', 'ATcmd', 'cmdStatus', '_reg_value')
+
+    def __init__(self, XBparams, frame, unescaped=False):
         # take attributes already defined for the general class
         XBee_msg.__init__(self, XBparams)
 
@@ -641,21 +759,26 @@ class XB_locAT_IN(XBee_msg):
         self.frame_ID = 0x01
         self.ATcmd = ''
         self.cmdStatus = 0x00
-        self.reg_value = None
 
         # if escape sequence used in the msg, remove it (if not, then nothing is done)
-        frameun = self.unescape(frame)
+        frameun = frame
+        if not unescaped:
+            frameun = self.unescape(frame)
 
         # validate frame
         self.valid, self.length, self.checksum = self.validate(frameun)
 
-        # convert input from bytearray to hex str
-        self._hexStr(frameun)
+        # keep the raw frame: data and hex strings are only decoded if accessed
+        self._frame = frameun
 
         # decode frame
         if self.valid:
             self.decodeFrame(frameun)
 
+            # set params[AT] to the received value -> note this will change the original too in XBee_API class!!
+            if self.reg_value is not None:
+                XBparams[self.ATcmd] = self.reg_value.lower()
+
     def decodeFrame(self, frame):
         """
         Frame-specific Data Construct for 'AT Command response' (0x88):
@@ -672,16 +795,18 @@ class XB_locAT_IN(XBee_msg):
         self.ATcmd = frame[5:7].decode("ascii")
         self.cmdStatus = frame[7]
 
-        # if length is greater than 9bytes, we have data
-        if len(frame) > 9:
-            self.data = frame[8:-1]
-            self.reg_value = ''.join('{:02X}'.format(byte) for byte in frame[8:-1])
+    @_lazy
+    def data(self):
+        if not self.valid:
+            return bytearray()
+        return bytearray(self._frame[8:-1])
 
-            # set params[AT] to the received value -> note this will change the original too in XBee_API class!!
-            try:
-                self.XBparams[self.ATcmd] = self.reg_value.lower()
-            except KeyError:
-                pass
+    @_lazy
+    def reg_value(self):
+        # if length is greater than 9bytes, we have data
+        if not self.valid or len(self._frame) <= 9:
+            return None
+        return self._frame[8:-1].hex().upper()
 
     def __str__(self):
         if self.reg_value is None:
@@ -710,7 +835,9 @@ class XB_remAT_IN(XBee_msg):
     Decode AT (registry) commands from remote XBee
     """
 
-    def __init__(self, XBparams, frame):
+    __slots__ = ('frame_ID', 'ATcmd', 'cmdStatus', '_sourceAddr', '_destAddrHigh', '_destAddrLow', '_reg_value')
+
+    def __init__(self, XBparams, frame, unescaped=False):
         # take attributes already defined for the general class
         XBee_msg.__init__(self, XBparams)
 
@@ -718,20 +845,18 @@ class XB_remAT_IN(XBee_msg):
         self.frame_ID = 0x55
         self.ATcmd = ''
 
-        self.destAddrHigh = ''
-        self.destAddrLow = ''
-
         self.cmdStatus = 0x00
-        self.reg_value = None
 
         # if escape sequence used in the msg, remove it (if not, then nothing is done)
-        frameun = self.unescape(frame)
+        frameun = frame
+        if not unescaped:
+            frameun = self.unescape(frame)
 
         # validate frame
         self.valid, self.length, self.checksum = self.validate(frameun)
 
-        # convert input from bytearray to hex str
-        self._hexStr(frameun)
+        # keep the raw frame: addresses, data and hex strings are only decoded if accessed
+        self._frame = frameun
 
         # decode frame
         if self.valid:
@@ -752,15 +877,33 @@ class XB_remAT_IN(XBee_msg):
         :return: none
         """
         self.frame_ID = frame[4]
-        self.destAddrHigh = ''.join('{:02x}'.format(byte) for byte in frame[5:9])
-        self.destAddrLow = ''.join('{:02x}'.format(byte) for byte in frame[9:13])
         self.ATcmd = frame[15:17].decode("ascii")
         self.cmdStatus = frame[17]
 
-        # if length is greater than 9bytes, we have data
-        if len(frame) > 19:
-            self.data = frame[18:-1]
-            self.reg_value = ''.join('{:02X}'.format(byte) for byte in frame[18:-1])
+    @_lazy
+    def sourceAddr(self):
+        return XBeeAddress.fromBytes(self._frame[5:13]) if self.valid else None
+
+    @_lazy
+    def destAddrHigh(self):
+        return self.sourceAddr.high if self.valid else ''
+
+    @_lazy
+    def destAddrLow(self):
+        return self.sourceAddr.low if self.valid else ''
+
+    @_lazy
+    def data(self):
+        if not self.valid:
+            return bytearray()
+        return bytearray(self._frame[18:-1])
+
+    @_lazy
+    def reg_value(self):
+        # if length is greater than 19bytes, we have data
+        if not self.valid or len(self._frame) <= 19:
+            return None
+        return self._frame[18:-1].hex().upper()
 
     def __str__(self):
         if self.reg_value is None:
@@ -789,26 +932,27 @@ class XB_RF_IN(XBee_msg):
     Decode RF frame from remote XBee
     """
 
-    def __init__(self, XBparams, frame):
+    __slots__ = ('frame_ID', 'option', '_sourceAddr', '_destAddrHigh', '_destAddrLow')
+
+    def __init__(self, XBparams, frame, unescaped=False):
         # take attributes already defined for the general class
         XBee_msg.__init__(self, XBparams)
 
         self.frame_type = 0x90
         self.frame_ID = 0x00
 
-        self.destAddrHigh = ''
-        self.destAddrLow = ''
-
         self.option = 0x01  # [1: toMe; 2: broadcast]
 
         # if escape sequence used in the msg, remove it (if not, then nothing is done)
-        frameun = self.unescape(frame)
+        frameun = frame
+        if not unescaped:
+            frameun = self.unescape(frame)
 
         # validate frame
         self.valid, self.length, self.checksum = self.validate(frameun)
 
-        # convert input from bytearray to hex str
-        self._hexStr(frameun)
+        # keep the raw frame: addresses, data and hex strings are only decoded if accessed
+        self._frame = frameun
 
         # decode frame
         if self.valid:
@@ -827,19 +971,34 @@ class XB_RF_IN(XBee_msg):
         :return: none
         """
         self.frame_ID = frame[4]
-        # OBS: here the high addr is just 3bytes (last)!!
-        self.destAddrHigh = ''.join('{:02x}'.format(byte) for byte in frame[5:8])
-        self.destAddrLow = ''.join('{:02x}'.format(byte) for byte in frame[8:12])
         self.option = frame[14] & 0x02  # mask is necessary, cause other bits are reserved
-        self.data = frame[15:-1]
+
+    @_lazy
+    def sourceAddr(self):
+        return XBeeAddress.fromBytes(self._frame[4:12]) if self.valid else None
+
+    @_lazy
+    def destAddrHigh(self):
+        # OBS: here the high addr is just 3bytes (last)!!
+        return self.sourceAddr.high[2:] if self.valid else ''
+
+    @_lazy
+    def destAddrLow(self):
+        return self.sourceAddr.low if self.valid else ''
+
+    @_lazy
+    def data(self):
+        if not self.valid:
+            return bytearray()
+        return bytearray(self._frame[15:-1])
 
     def __str__(self):
         try:
             strin = "{0}  IN (addr: {1}) data: hex'{2}'; [{3}]".format(self.time_stmp[:-3], self.destAddrLow,
-                                ''.join('{:02X}'.format(byte) for byte in self.data), RFoption[self.option])
+                                self.data.hex().upper(), RFoption[self.option])
         except KeyError:
             strin = "{0}  IN (addr: {1}) data: hex'{2}'; [status: {3}]".format(self.time_stmp[:-3], self.destAddrLow,
-                ''.join('{:02X}'.format(byte) for byte in self.data), self.option)
+                self.data.hex().upper(), self.option)
 
         return strin
 
@@ -852,31 +1011,30 @@ class XB_RFexpl_IN(XBee_msg):
     Decode explicit RF frame from remote XBee
     """
 
-    def __init__(self, XBparams, frame):
+    __slots__ = ('srcEP', 'destEP', 'option', '_sourceAddr', '_destAddrHigh', '_destAddrLow', '_clusteID',
+                 '_profileID')
+
+    def __init__(self, XBparams, frame, unescaped=False):
         # take attributes already defined for the general class
         XBee_msg.__init__(self, XBparams)
 
         self.frame_type = 0x91
 
-        self.destAddrHigh = ''
-        self.destAddrLow = ''
-
         self.srcEP = 0x00
         self.destEP = 0x00
 
-        self.clusteID = ''
-        self.profileID = ''
-
         self.option = 0x01  # [1: toMe; 2: broadcast]
 
         # if escape sequence used in the msg, remove it (if not, then nothing is done)
-        frameun = self.unescape(frame)
+        frameun = frame
+        if not unescaped:
+            frameun = self.unescape(frame)
 
         # validate frame
         self.valid, self.length, self.checksum = self.validate(frameun)
 
-        # convert input from bytearray to hex str
-        self._hexStr(frameun)
+        # keep the raw frame: addresses, IDs, data and hex strings are only decoded if accessed
+        self._frame = frameun
 
         # decode frame
         if self.valid:
@@ -894,25 +1052,46 @@ class XB_RFexpl_IN(XBee_msg):
 
         :return: none
         """
-        self.destAddrHigh = ''.join('{:02x}'.format(byte) for byte in frame[4:8])
-        self.destAddrLow = ''.join('{:02x}'.format(byte) for byte in frame[8:12])
         self.srcEP = frame[14]
         self.destEP = frame[15]
-        self.clusteID = frame[16:18]
-        self.profileID = frame[18:20]
         self.option = frame[20] & 0x02  # mask is necessary, cause other bits are reserved
-        self.data = frame[21:-1]
+
+    @_lazy
+    def sourceAddr(self):
+        return XBeeAddress.fromBytes(self._frame[4:12]) if self.valid else None
+
+    @_lazy
+    def destAddrHigh(self):
+        return self.sourceAddr.high if self.valid else ''
+
+    @_lazy
+    def destAddrLow(self):
+        return self.sourceAddr.low if self.valid else ''
+
+    @_lazy
+    def clusteID(self):
+        return bytearray(self._frame[16:18]) if self.valid else ''
+
+    @_lazy
+    def profileID(self):
+        return bytearray(self._frame[18:20]) if self.valid else ''
+
+    @_lazy
+    def data(self):
+        if not self.valid:
+            return bytearray()
+        return bytearray(self._frame[21:-1])
 
     def __str__(self):
         addr = self.destAddrLow.lower()
-        if addr == self.XBparams['SL'].lower():
+        if addr == self.SL.lower():
             addr = ' local  '
         try:
             strin = "{0}  IN (addr: {1}) explicit transmit data: hex'{2}'; [{3}]".format(self.time_stmp[:-3],
-                addr, ''.join('{:02X}'.format(byte) for byte in self.data), RFoption[self.option])
+                addr, self.data.hex().upper(), RFoption[self.option])
         except KeyError:
             strin = "{0}  IN (addr: {1}) explicit transmit data: hex'{2}'; [status: {3}]".format(self.time_stmp[:-3],
-                addr, ''.join('{:02X}'.format(byte) for byte in self.data), self.option)
+                addr, self.data.hex().upper(), self.option)
 
         return strin
 
@@ -925,7 +1104,9 @@ class XB_RFstatus_IN(XBee_msg):
     RF status frame from XBee network
     """
 
-    def __init__(self, XBparams, frame):
+    __slots__ = ('frame_ID', 'tries', 'status', 'discovSt')
+
+    def __init__(self, XBparams, frame, unescaped=False):
         # take attributes already defined for the general class
         XBee_msg.__init__(self, XBparams)
 
@@ -937,13 +1118,15 @@ class XB_RFstatus_IN(XBee_msg):
         self.discovSt = 0x00
 
         # if escape sequence used in the msg, remove it (if not, then nothing is done)
-        frameun = self.unescape(frame)
+        frameun = frame
+        if not unescaped:
+            frameun = self.unescape(frame)
 
         # validate frame
         self.valid, self.length, self.checksum = self.validate(frameun)
 
-        # convert input from bytearray to hex str
-        self._hexStr(frameun)
+        # keep the raw frame: hex string is only created if accessed
+        self._frame = frameun
 
         # decode frame
         if self.valid:
@@ -985,27 +1168,25 @@ class XB_RouteInfo_IN(XBee_msg):
     RF route information frame from XBee network
     """
 
-    def __init__(self, XBparams, frame):
+    __slots__ = ('sourceEve', '_time', '_destAddr', '_srcAddr', '_responderAddr', '_receiverAddr')
+
+    def __init__(self, XBparams, frame, unescaped=False):
         # take attributes already defined for the general class
         XBee_msg.__init__(self, XBparams)
 
         self.frame_type = 0x8D
         self.sourceEve = 0x12
 
-        self.time = bytearray()
-        self.destAddr = ''
-        self.srcAddr = ''
-        self.responderAddr = ''
-        self.receiverAddr = ''
-
         # if escape sequence used in the msg, remove it (if not, then nothing is done)
-        frameun = self.unescape(frame)
+        frameun = frame
+        if not unescaped:
+            frameun = self.unescape(frame)
 
         # validate frame
         self.valid, self.length, self.checksum = self.validate(frameun)
 
-        # convert input from bytearray to hex str
-        self._hexStr(frameun)
+        # keep the raw frame: addresses and hex strings are only decoded if accessed
+        self._frame = frameun
 
         # decode frame
         if self.valid:
@@ -1024,12 +1205,33 @@ class XB_RouteInfo_IN(XBee_msg):
         :return: none
         """
         self.sourceEve = frame[4]
-        self.time = frame[6:10]
-        self.destAddr = ''.join('{:02x}'.format(byte) for byte in frame[13:21])
-        self.srcAddr = ''.join('{:02x}'.format(byte) for byte in frame[21:29])
-        self.responderAddr = ''.join('{:02x}'.format(byte) for byte in frame[29:37])
-        self.receiverAddr = ''.join('{:02x}'.format(byte) for byte in frame[37:45])
+
+    @_lazy
+    def time(self):
+        return bytearray(self._frame[6:10]) if self.valid else bytearray()
+
+    @_lazy
+    def destAddr(self):
+        return XBeeAddress.fromBytes(self._frame[13:21]) if self.valid else None
+
+    @_lazy
+    def srcAddr(self):
+        return XBeeAddress.fromBytes(self._frame[21:29]) if self.valid else None
+
+    @_lazy
+    def responderAddr(self):
+        return XBeeAddress.fromBytes(self._frame[29:37]) if self.valid else None
+
+    @_lazy
+    def receiverAddr(self):
+        return XBeeAddress.fromBytes(self._frame[37:45]) if self.valid else None
+
+    @staticmethod
+    def _low(addr):
+        # low address to print ('' if not decoded, as for invalid frames)
+        return addr.low if addr is not None else ''
 
     def __str__(self):
         return "{0}  IN (addr: {1}) Route Info '{2}' to '{3}'; receiver: {4}".format(self.time_stmp[:-3],
-            self.responderAddr[8:], self.srcAddr[8:], self.destAddr[8:], self.receiverAddr[8:])
+            self._low(self.responderAddr), self._low(self.srcAddr), self._low(self.destAddr),
+            self._low(self.receiverAddr))
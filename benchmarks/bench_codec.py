@@ -0,0 +1,104 @@
+#!/usr/bin/env python
+
+"""
+Benchmark of the escape sequence codec (XB_Codec) against the original byte-by-byte implementation, on 100-byte frames
+without reserved bytes (clean), with random content (noisy: one or two reserved bytes) and with a quarter of reserved
+bytes (dense). The codec costs a few C-level passes per reserved byte value found, so the speedup is lower on dense
+frames, where it is bounded by the fixed chain of replace().
+
+Usage (from the repository root):
+    python benchmarks/bench_codec.py
+"""
+
+import os
+import random
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import XB_Codec
+
+
+# authorship info
+__author__      = "Francesco Vallegra"
+__copyright__   = "Copyright 2017, MIT-SUTD"
+__license__     = "MIT"
+
+
+# ===============================================================================
+#   Original implementation (reference)
+# ===============================================================================
+def legacy_escape(msg):
+    reserved = bytearray('\x7E\x7D\x11\x13'.encode())
+    escaped = bytearray()
+    escaped.append(msg[0])
+
+    for byte in msg[1:]:
+        if byte in reserved:
+            escaped.append(0x7D)
+            escaped.append(byte ^ 0x20)
+        else:
+            escaped.append(byte)
+
+    return escaped
+
+
+def legacy_unescape(msg):
+    skip = False
+    unescaped = bytearray()
+
+    for i in range(len(msg)):
+        if not skip and msg[i] == 0x7D:
+            if not (i + 1) >= len(msg):
+                unescaped.append(msg[i + 1] ^ 0x20)
+                skip = True
+        elif not skip:
+            unescaped.append(msg[i])
+        else:
+            skip = False
+
+    return unescaped
+
+
+# ===============================================================================
+#   Benchmark
+# ===============================================================================
+def make_frames(size=100, seed=0):
+    """
+    :return: a frame with no reserved byte, one with random content (likely to need escaping) and one where a quarter
+            of the bytes are reserved (worst case, e.g. a payload of XON/XOFF)
+    """
+    rnd = random.Random(seed)
+    clean = bytearray([0x7E]) + bytearray(rnd.choice(b'0123456789ABCDEF') for _ in range(size - 1))
+    noisy = bytearray([0x7E]) + bytearray(rnd.randrange(256) for _ in range(size - 1))
+    dense = bytearray([0x7E]) + bytearray(rnd.choice(b'\x7E\x7D\x11\x13' if rnd.random() < 0.25 else b'0123456789ABCDEF')
+                                          for _ in range(size - 1))
+    return clean, noisy, dense
+
+
+def run(size=100, number=20000):
+    """
+    :return: list of (name, legacy us/frame, codec us/frame, speedup)
+    """
+    results = list()
+    for label, frame in zip(('clean', 'noisy', 'dense'), make_frames(size)):
+        escaped = legacy_escape(frame)
+
+        # sanity check: same output as the original implementation
+        assert XB_Codec.escape(frame) == escaped
+        assert XB_Codec.unescape(escaped) == legacy_unescape(escaped)
+
+        for name, legacy, codec, arg in (('escape', legacy_escape, XB_Codec.escape, frame),
+                                         ('unescape', legacy_unescape, XB_Codec.unescape, escaped)):
+            t_old = min(timeit.repeat(lambda: legacy(arg), number=number, repeat=7)) / number * 1e6
+            t_new = min(timeit.repeat(lambda: codec(arg), number=number, repeat=7)) / number * 1e6
+            results.append(('{}/{}'.format(name, label), t_old, t_new, t_old / t_new))
+
+    return results
+
+
+if __name__ == '__main__':
+    print('{:<16} {:>12} {:>12} {:>9}'.format('case (100B)', 'legacy [us]', 'codec [us]', 'speedup'))
+    for name, t_old, t_new, speedup in run():
+        print('{:<16} {:>12.2f} {:>12.2f} {:>8.1f}x'.format(name, t_old, t_new, speedup))
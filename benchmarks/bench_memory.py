@@ -0,0 +1,231 @@
+#!/usr/bin/env python
+
+"""
+Memory footprint of the message objects kept in memory (e.g. for replay and analytics).
+
+For each class, a number of objects is created from synthetic frames (or data), the attributes mostly used by the
+consumers are accessed, and the memory retained per object (frame buffer included) is measured with tracemalloc, for
+both the original implementation (objects with a __dict__, kept here as reference) and the current one (__slots__).
+
+Usage (from the repository root):
+    python benchmarks/bench_memory.py
+"""
+
+import datetime
+import gc
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import XB_Codec
+from XBee_msg import *
+
+
+# authorship info
+__author__      = "Francesco Vallegra"
+__copyright__   = "Copyright 2017, MIT-SUTD"
+__license__     = "MIT"
+
+
+# ===============================================================================
+#   Original implementation (reference)
+# ===============================================================================
+class _legacy_lazy(object):
+    def __init__(self, compute):
+        self.compute = compute
+        self.name = '_' + compute.__name__
+
+    def __get__(self, obj, objtype=None):
+        if obj is None:
+            return self
+        try:
+            return getattr(obj, self.name)
+        except AttributeError:
+            value = self.compute(obj)
+            setattr(obj, self.name, value)
+            return value
+
+    def __set__(self, obj, value):
+        setattr(obj, self.name, value)
+
+
+class legacy_XBee_msg:
+    def __init__(self, XBparams):
+        self.XBparams = XBparams
+        self._created = time.time()
+        self.length = 0
+        self.frame_type = 0x00
+        self.checksum = 0x00
+        self.valid = True
+        self._frame = memoryview(b'')
+
+    @_legacy_lazy
+    def time_stmp(self):
+        return str(datetime.datetime.fromtimestamp(self._created))
+
+    @_legacy_lazy
+    def data(self):
+        return bytearray()
+
+    @_legacy_lazy
+    def hexMsg(self):
+        return self._frame.hex().upper()
+
+    @staticmethod
+    def validate(msg):
+        if not msg or len(msg) < 4:
+            return False, -1, -1
+
+        checksum = msg[-1]
+        length = int(''.join('{:02X}'.format(byte) for byte in msg[1:3]), 16)
+        validlen = len(msg[3:-1])
+        validsum = 0xFF - ((sum(msg[3:-1])) & 0xFF)
+
+        return (checksum == validsum) and (length == validlen), length, checksum
+
+    @staticmethod
+    def unescape(msg):
+        return XB_Codec.unescape(msg)
+
+
+class legacy_XB_RF_OUT(legacy_XBee_msg):
+    def __init__(self, XBparams, data, frame_ID=0x01, radius=0x00, option=0x00, reserved='FFFE'):
+        legacy_XBee_msg.__init__(self, XBparams)
+
+        self.frame_type = 0x10
+        self.frame_ID = frame_ID
+        self.destAddrHigh = XBparams['DH']
+        self.destAddrLow = XBparams['DL']
+        self.reserved = bytearray.fromhex(reserved)
+        self.radius = radius
+        self.option = option
+        self.data = data
+
+
+class legacy_XB_RF_IN(legacy_XBee_msg):
+    def __init__(self, XBparams, frame, unescaped=False):
+        legacy_XBee_msg.__init__(self, XBparams)
+
+        self.frame_type = 0x90
+        self.frame_ID = 0x00
+        self.option = 0x01
+
+        frameun = frame
+        if not unescaped:
+            frameun = self.unescape(frame)
+
+        self.valid, self.length, self.checksum = self.validate(frameun)
+        self._frame = memoryview(frameun)
+
+        if self.valid:
+            self.frame_ID = frameun[4]
+            self.option = frameun[14] & 0x02
+
+    @_legacy_lazy
+    def destAddrHigh(self):
+        return self._frame[5:8].hex() if self.valid else ''
+
+    @_legacy_lazy
+    def destAddrLow(self):
+        return self._frame[8:12].hex() if self.valid else ''
+
+    @_legacy_lazy
+    def data(self):
+        if not self.valid:
+            return bytearray()
+        return bytearray(self._frame[15:-1])
+
+
+class legacy_XB_RFstatus_IN(legacy_XBee_msg):
+    def __init__(self, XBparams, frame, unescaped=False):
+        legacy_XBee_msg.__init__(self, XBparams)
+
+        self.frame_type = 0x8B
+        self.frame_ID = 0x47
+        self.tries = 0x00
+        self.status = 0x00
+        self.discovSt = 0x00
+
+        frameun = frame
+        if not unescaped:
+            frameun = self.unescape(frame)
+
+        self.valid, self.length, self.checksum = self.validate(frameun)
+        self._frame = memoryview(frameun)
+
+        if self.valid:
+            self.frame_ID = frameun[4]
+            self.tries = frameun[7]
+            self.status = frameun[8]
+            self.discovSt = frameun[9]
+
+
+# ===============================================================================
+#   Benchmark
+# ===============================================================================
+PARAMS = {'SL': '40e44ba9', 'SH': '0013a200', 'AP': '02', 'DH': '0013a200', 'DL': '40d4b3e7'}
+
+
+def make_frame(frameData):
+    """
+    :return: full unescaped frame as bytearray (as given by the frame parser)
+    """
+    frame = bytearray([0x7E, len(frameData) >> 8, len(frameData) & 0xFF]) + frameData
+    frame.append(0xFF - (sum(frameData) & 0xFF))
+    return frame
+
+
+def rf_in(cls):
+    msg = cls(PARAMS, make_frame(bytearray.fromhex('900013a20040d4b3e7fffe01') + bytearray(32)), unescaped=True)
+    return msg, (msg.data, msg.destAddrLow)
+
+
+def status_in(cls):
+    msg = cls(PARAMS, make_frame(bytearray.fromhex('8b01fffe000000')), unescaped=True)
+    return msg, (msg.status, )
+
+
+def rf_out(cls):
+    msg = cls(PARAMS, bytearray(32))
+    return msg, (msg.data, )
+
+
+# (name, factory, original class, current class)
+CASES = (('XB_RF_IN (32B)', rf_in, legacy_XB_RF_IN, XB_RF_IN),
+         ('XB_RFstatus_IN', status_in, legacy_XB_RFstatus_IN, XB_RFstatus_IN),
+         ('XB_RF_OUT (32B)', rf_out, legacy_XB_RF_OUT, XB_RF_OUT))
+
+
+def measure(factory, cls, n=20000):
+    """
+    :return: retained bytes per object
+    """
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    objs = [factory(cls)[0] for _ in range(n)]
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del objs
+    return (after - before) / float(n)
+
+
+def run(n=20000):
+    """
+    :return: list of (name, legacy bytes per object, current bytes per object, reduction [%])
+    """
+    results = list()
+    for name, factory, legacy, current in CASES:
+        size_old = measure(factory, legacy, n)
+        size_new = measure(factory, current, n)
+        results.append((name, size_old, size_new, 100. * (1 - size_new / size_old)))
+    return results
+
+
+if __name__ == '__main__':
+    print('{:<18} {:>14} {:>15} {:>10}'.format('class', 'legacy [B/obj]', 'current [B/obj]', 'reduction'))
+    for name, size_old, size_new, reduction in run():
+        print('{:<18} {:>14.0f} {:>15.0f} {:>9.0f}%'.format(name, size_old, size_new, reduction))
@@ -0,0 +1,323 @@
+#!/usr/bin/env python
+
+"""
+Benchmark suite of the XBee API: frame validation, escape codec, decoding of incoming frames, generation of outgoing
+frames, processing of received streams with different fragmentation patterns, batch decoding of recordings by a process
+pool, and round-trip latency (transmit request to transmit status) against the emulated XBee (XB_Emulator, Unix only).
+
+Results are printed and written as JSON, to be compared across releases.
+
+Usage (from the repository root):
+    python benchmarks/run.py [--output results.json] [--quick] [--only section [section ...]]
+"""
+
+import argparse
+import contextlib
+import datetime
+import io
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from XBee_msg import *
+from XBee_API import XBee_module
+from bench_memory import make_frame, PARAMS
+from bench_memory import run as memory_run
+
+
+# authorship info
+__author__      = "Francesco Vallegra"
+__copyright__   = "Copyright 2017, MIT-SUTD"
+__license__     = "MIT"
+
+
+SECTIONS = ('validate', 'codec', 'decode', 'encode', 'stream', 'memory', 'roundtrip', 'batch')
+
+SOURCE = '0013a20040d4b3e7'
+
+
+# ===============================================================================
+#   Synthetic frames
+# ===============================================================================
+def in_frames(payload=32):
+    """
+    :return: dictionary of incoming frames (full, unescaped) by class
+    """
+    data = bytes(random.Random(0).randrange(256) for _ in range(payload))
+    return {XB_locAT_IN: make_frame(bytearray.fromhex('8852534c0040e44ba9')),
+            XB_remAT_IN: make_frame(bytearray.fromhex('9701' + SOURCE + 'fffe4e4900') + b'node1'),
+            XB_RF_IN: make_frame(bytearray.fromhex('90' + SOURCE + 'fffe01') + data),
+            XB_RFexpl_IN: make_frame(bytearray.fromhex('91' + SOURCE + 'fffee8e80011c10501') + data),
+            XB_RFstatus_IN: make_frame(bytearray.fromhex('8b01fffe000000')),
+            XB_RouteInfo_IN: make_frame(bytearray.fromhex('8d122a0000000000000000' + SOURCE * 4))}
+
+
+def out_msgs(payload=32):
+    """
+    :return: list of outgoing messages (ready to generate their frame)
+    """
+    data = bytearray(random.Random(1).randrange(256) for _ in range(payload))
+    return [XB_locAT_OUT(PARAMS, 'ID', regVal=0x7FFF),
+            XB_remAT_OUT(PARAMS, 'NI'),
+            XB_RF_OUT(PARAMS, data),
+            XB_RFexpl_OUT(PARAMS, data, 0xE8, 0xE8, '0011')]
+
+
+def stream(n=2000, seed=0):
+    """
+    :return: escaped stream of n incoming frames (mixed types, random payloads) as received from the serial, and
+            list of the frame boundaries in the stream
+    """
+    rnd = random.Random(seed)
+    frames = in_frames()
+    kinds = [XB_RF_IN, XB_RF_IN, XB_RF_IN, XB_RFexpl_IN, XB_RFstatus_IN, XB_RouteInfo_IN]
+
+    data = bytearray()
+    bounds = list()
+    for _ in range(n):
+        kind = rnd.choice(kinds)
+        if kind in (XB_RF_IN, XB_RFexpl_IN):
+            head = frames[kind][3:-1 - 32]
+            frame = make_frame(head + bytes(rnd.randrange(256) for _ in range(rnd.randrange(1, 64))))
+        else:
+            frame = frames[kind]
+        data += XBee_msg._escape(frame)
+        bounds.append(len(data))
+    return bytes(data), bounds
+
+
+# ===============================================================================
+#   Benchmarks
+# ===============================================================================
+def _time(func, number, repeat=5):
+    """
+    :return: best time per call [us]
+    """
+    return min(timeit.repeat(func, number=number, repeat=repeat)) / number * 1e6
+
+
+def bench_validate(number):
+    results = list()
+    for size in (16, 64, 100):
+        frame = make_frame(bytearray(range(size)))
+        results.append(('validate/{}B'.format(size), 'us', _time(lambda: XBee_msg.validate(frame), number)))
+    return results
+
+
+def bench_codec(number):
+    results = list()
+    rnd = random.Random(0)
+    clean = make_frame(bytearray(rnd.choice(b'0123456789ABCDEF') for _ in range(96)))
+    noisy = make_frame(bytearray(rnd.randrange(256) for _ in range(96)))
+    dense = make_frame(bytearray(rnd.choice(b'\x7E\x7D\x11\x13' if rnd.random() < 0.25 else b'0123456789ABCDEF')
+                                 for _ in range(96)))
+    for label, frame in (('clean', clean), ('noisy', noisy), ('dense', dense)):
+        escaped = XBee_msg._escape(frame)
+        results.append(('escape/{}'.format(label), 'us', _time(lambda: XBee_msg._escape(frame), number)))
+        results.append(('unescape/{}'.format(label), 'us', _time(lambda: XBee_msg.unescape(escaped), number)))
+    return results
+
+
+def bench_decode(number):
+    results = list()
+    for cls, frame in in_frames().items():
+        escaped = XBee_msg._escape(frame)
+        results.append(('decode/{}'.format(cls.__name__), 'us',
+                        _time(lambda: cls(PARAMS, bytearray(frame), unescaped=True), number)))
+        results.append(('decode/{}/escaped'.format(cls.__name__), 'us',
+                        _time(lambda: cls(PARAMS, escaped), number)))
+    return results
+
+
+def bench_encode(number):
+    results = list()
+    for msg in out_msgs():
+        results.append(('genFrame/{}'.format(type(msg).__name__), 'us', _time(msg.genFrame, number)))
+    return results
+
+
+def bench_stream(frames):
+    """
+    Processing of a received stream by XBee_module (as done by readSerial() after reading from the serial), with the
+    stream split in different ways
+    """
+    data, bounds = stream(frames)
+    view = memoryview(data)
+    rnd = random.Random(2)
+
+    patterns = {'byte': list(range(1, len(data) + 1)),
+                'chunk16': list(range(16, len(data), 16)) + [len(data)],
+                'chunk4096': list(range(4096, len(data), 4096)) + [len(data)],
+                'frame': bounds,
+                'random': list()}
+    end = 0
+    while end < len(data):
+        end = min(len(data), end + rnd.randrange(1, 512))
+        patterns['random'].append(end)
+
+    results = list()
+    for name, ends in patterns.items():
+        chunks = [view[start:end] for start, end in zip([0] + ends[:-1], ends)]
+        XB = XBee_module.offline()
+
+        received = 0
+        start = time.perf_counter()
+        for chunk in chunks:
+            received += len(XB._processRx(chunk))
+        elapsed = time.perf_counter() - start
+
+        if received != frames:
+            print('stream/{}: {} frames received out of {}!'.format(name, received, frames))
+        results.append(('stream/{}/frames'.format(name), 'frames/s', received / elapsed))
+        results.append(('stream/{}/bytes'.format(name), 'bytes/s', len(data) / elapsed))
+    return results
+
+
+def bench_memory(number):
+    results = list()
+    for name, size_old, size_new, _ in memory_run(number):
+        results.append(('memory/{}/legacy'.format(name), 'bytes/object', size_old))
+        results.append(('memory/{}'.format(name), 'bytes/object', size_new))
+    return results
+
+
+def bench_roundtrip(number):
+    """
+    Time from sending a transmit request (0x10) to receiving its transmit status (0x8B), against XB_Emulator
+    """
+    try:
+        from XB_Emulator import XB_Emulator
+    except ImportError:
+        # no pseudo-terminals on this system
+        print('roundtrip: XB_Emulator not available, skipped')
+        return list()
+
+    emu = XB_Emulator()
+    emu.addNode(SOURCE)
+    emu.start()
+
+    # quiet initialization (it still writes its RAW log to ./Output)
+    with contextlib.redirect_stdout(io.StringIO()):
+        XB = XBee_module(port=emu.port)
+    XB.verbose = False
+
+    latency = list()
+    data = bytearray(32)
+    try:
+        for i in range(number):
+            frame_ID = i % 255 + 1
+            start = time.perf_counter()
+            XB.sendDataToRemote(SOURCE[:8], SOURCE[8:], data, frame_ID=frame_ID)
+            acked = False
+            while not acked and time.perf_counter() - start < 1.:
+                for msg in XB.readSerial():
+                    if msg.frame_type == 0x8B and msg.frame_ID == frame_ID:
+                        acked = True
+            if acked:
+                latency.append((time.perf_counter() - start) * 1e6)
+    finally:
+        XB.close()
+        emu.close()
+
+    if not latency:
+        return [('roundtrip/lost', 'frames', number)]
+
+    latency.sort()
+    return [('roundtrip/p50', 'us', latency[len(latency) // 2]),
+            ('roundtrip/p90', 'us', latency[int(len(latency) * .9)]),
+            ('roundtrip/p99', 'us', latency[int(len(latency) * .99)]),
+            ('roundtrip/mean', 'us', sum(latency) / len(latency)),
+            ('roundtrip/lost', 'frames', number - len(latency))]
+
+
+def bench_batch(frames):
+    """
+    Decoding of a recorded stream into columns (XB_Batch) by a single process and by a pool of one process per core
+    """
+    import XB_Batch
+
+    data, _ = stream(frames)
+    fileID, path = tempfile.mkstemp(suffix='.bin')
+    with os.fdopen(fileID, 'wb') as f:
+        f.write(data)
+
+    results = list()
+    try:
+        for workers in sorted({1, os.cpu_count() or 1}):
+            start = time.perf_counter()
+            columns = XB_Batch.decodeFile(path, workers=workers)
+            elapsed = time.perf_counter() - start
+
+            decoded = len(columns['frameType'])
+            if decoded != frames:
+                print('batch/{}: {} frames decoded out of {}!'.format(workers, decoded, frames))
+            results.append(('batch/{}proc/frames'.format(workers), 'frames/s', decoded / elapsed))
+    finally:
+        os.remove(path)
+    return results
+
+
+# ===============================================================================
+#   Suite
+# ===============================================================================
+def _commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], stderr=subprocess.DEVNULL,
+                                       cwd=os.path.dirname(os.path.abspath(__file__))).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(sections=SECTIONS, quick=False):
+    """
+    :return: dictionary with info on the run ('meta') and list of results ('results'), each as dictionary with name,
+            unit and value
+    """
+    number = 2000 if quick else 20000
+    benches = {'validate': lambda: bench_validate(number),
+               'codec': lambda: bench_codec(number),
+               'decode': lambda: bench_decode(number),
+               'encode': lambda: bench_encode(number),
+               'stream': lambda: bench_stream(500 if quick else 5000),
+               'memory': lambda: bench_memory(number),
+               'roundtrip': lambda: bench_roundtrip(200 if quick else 2000),
+               'batch': lambda: bench_batch(20000 if quick else 200000)}
+
+    results = list()
+    for section in sections:
+        for name, unit, value in benches[section]():
+            results.append({'name': name, 'unit': unit, 'value': value})
+
+    meta = {'date': datetime.datetime.now().isoformat(),
+            'commit': _commit(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'quick': quick}
+
+    return {'meta': meta, 'results': results}
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='XBee API benchmark suite')
+    parser.add_argument('--output', default='benchmark_results.json', help='JSON file to write the results to')
+    parser.add_argument('--quick', action='store_true', help='fewer iterations (less accurate)')
+    parser.add_argument('--only', nargs='+', choices=SECTIONS, default=SECTIONS, help='sections to run')
+    args = parser.parse_args()
+
+    report = run(args.only, args.quick)
+
+    print('{:<36} {:>16} {:<12}'.format('benchmark', 'value', 'unit'))
+    for result in report['results']:
+        print('{:<36} {:>16.2f} {:<12}'.format(result['name'], result['value'], result['unit']))
+
+    with open(args.output, 'w') as fileID:
+        json.dump(report, fileID, indent=2)
+    print('\nResults written to ' + args.output)
@@ -1,6 +1,5 @@
 #!/usr/bin/env python
 
-import threading
 import time
 
 import XBee_API
@@ -21,10 +20,8 @@ x_bee = XBee_API.XBee_module(AP=2)
 # - XBee Type: CE=[0: Router; 2: EndPoint]
 # - Network ID: ID=hex number from 0x0000 to 0xffff [default 0x7fff]
 
-# thread for the incoming XBee messages
-comm_thread = threading.Thread(target=read_comm.read_comm, args=(x_bee,))
-comm_thread.setDaemon(True)
-comm_thread.start()
+# handle incoming XBee messages (in the XBee receiver thread)
+read_comm.read_comm(x_bee)
 
 # keep the program alive till stopped by user
 while 1:
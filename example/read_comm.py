@@ -1,11 +1,9 @@
 #!/usr/bin/env python
 
-import sys
-import threading
 import time
-import select       # for event-control the serial communication with the XBee  # NOTE: NOT WORKING ON WINDOWS!!
 
 import XBee_API
+from XB_Address import XBeeAddress
 
 
 # authorship info
@@ -46,7 +44,7 @@ def api_message_type(x_bee, XBmsg):
         data = XBmsg.data
 
         # identify node:
-        sender = ''.join('{:02x}'.format(byte) for byte in data[6:10])
+        sender = XBeeAddress(data[2:10]).low
 
         # if XBmsg.paa
         RSSI = float(-data[-1])
@@ -59,7 +57,7 @@ def api_message_type(x_bee, XBmsg):
         data = XBmsg.data
 
         # identify node:
-        sender = ''.join('{:02x}'.format(byte) for byte in data[6:10])
+        sender = XBeeAddress(data[2:10]).low
 
         # if XBmsg.paa
         RSSI = float(-data[-1])
@@ -70,16 +68,8 @@ def api_message_type(x_bee, XBmsg):
     # received Route Information frame
     elif XBmsg.frame_type == 0x8D:
 
-        # hop's sender
-        senderH = XBmsg.responderAddr[:8]
-        senderL = XBmsg.responderAddr[8:]
-
-        # hop's receiver
-        receiverH = XBmsg.receiverAddr[:8]
-        receiverL = XBmsg.receiverAddr[8:]
-
-        # test link quality
-        x_bee.networkLinkTest(senderH, senderL, receiverH, receiverL)
+        # test link quality between hop's sender and hop's receiver
+        x_bee.linkQualityTest(XBmsg.responderAddr, None, XBmsg.receiverAddr, None)
 
     # received explicit RX -> network link test
     elif XBmsg.frame_type == 0x91:
@@ -87,7 +77,7 @@ def api_message_type(x_bee, XBmsg):
         # sender
         sender = XBmsg.destAddrLow.lower()
         # receiver
-        dest = ''.join('{:02x}'.format(byte) for byte in XBmsg.data[4:8])
+        dest = XBeeAddress(XBmsg.data[0:8]).low
 
         # paylod size
         paySize = int(''.join('{:02x}'.format(byte) for byte in XBmsg.data[8:10]), 16)
@@ -111,48 +101,35 @@ def api_message_type(x_bee, XBmsg):
 
 def read_comm(x_bee_obj):
     """
-    # buoy read comm with interrupt if on unix system
+    Register the handlers of the received messages and start the receiver thread of the XBee object (returns
+    immediately: messages are handled by the receiver thread as soon as they are received)
 
     :param x_bee_obj: object of XBee_module class
     :return:
     """
-    print("Starting read_comm thread")
-    if not sys.platform.startswith('win'):
-        x_bee_obj.serial_port.nonblocking()  # needed when using "select"
-
-    while 1:
-        try:
-            if sys.platform.startswith('win'):
-                # select does not work on windows, so just sleep instead (more cpu usage)
-                time.sleep(.1)
-            else:
-                # put a select on the serial with a maximum waiting of 10 sec
-                select.select([x_bee_obj.serial_port], [], [], 10)
-
-            # check for incoming messages reading from serial
-            xbee_msg_list = x_bee_obj.readSerial()
-
-        except:
-            # could not read serial, then.. just try again
-            xbee_msg_list = []
-
-        if x_bee_obj.params['AP'] == '01' or x_bee_obj.params['AP'] == '02':
-            # API mode without escape chars (AP=0x01) or with escape chars (AP=0x02)
-            while xbee_msg_list:
-                # get first element in the list
-                try:
-                    logStr = api_message_type(x_bee_obj, xbee_msg_list.pop(0))
-                    if logStr:
-                        x_bee_obj.logRAWtofile(logStr)
-                except:
-                    print("ERR: major error while decoding the message")
-        elif x_bee_obj.params['AP'] == '00':
-            # transparent mode
-            if xbee_msg_list:
-                print(xbee_msg_list.decode())
-        else:
-            # cannot be anything else.. notify user and ask to reboot
-            print("ERR: wrong initialisation of the xbee.. please relaunch the program\n\r")
+    print("Starting XBee receiver thread")
+
+    if x_bee_obj.params['AP'] == '01' or x_bee_obj.params['AP'] == '02':
+        # API mode without escape chars (AP=0x01) or with escape chars (AP=0x02)
+        def handle(XBmsg):
+            try:
+                logStr = api_message_type(x_bee_obj, XBmsg)
+                if logStr:
+                    x_bee_obj.logRAWtofile(logStr)
+            except:
+                print("ERR: major error while decoding the message")
+
+        for frame_type in (0x88, 0x8D, 0x90, 0x91, 0x97):
+            x_bee_obj.addCallback(handle, frame_type)
+    elif x_bee_obj.params['AP'] == '00':
+        # transparent mode
+        x_bee_obj.addCallback(lambda data: print(data.decode(errors='replace')))
+    else:
+        # cannot be anything else.. notify user and ask to reboot
+        print("ERR: wrong initialisation of the xbee.. please relaunch the program\n\r")
+        return
+
+    x_bee_obj.startReceiver()
 
 
 if __name__ == '__main__':
@@ -160,10 +137,8 @@ if __name__ == '__main__':
     # x_bee = XBee_API.XBee_module()
     x_bee = XBee_API.XBee_module(baud=57600, AP=0, CE=2)
 
-    # thread for the incoming XBee messages
-    comm_thread = threading.Thread(target=read_comm, args=(x_bee,))
-    comm_thread.setDaemon(True)
-    comm_thread.start()
+    # handle incoming XBee messages (in the XBee receiver thread)
+    read_comm(x_bee)
 
     # keep the program alive till stopped by user
     while 1: